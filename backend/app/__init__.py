@@ -22,6 +22,24 @@ def get_real_ip():
     # Fallback to remote_addr
     return request.remote_addr
 
+def get_site_rate_key():
+    """Rate limit key for site API requests: a hash of the API key, not the client IP."""
+    import hashlib
+    from flask import request
+    api_key = request.headers.get('X-API-Key')
+    if not api_key:
+        return get_real_ip()
+    return 'site:' + hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+def get_user_rate_key():
+    """Rate limit key for user requests: a hash of the bearer token, not the client IP."""
+    import hashlib
+    from flask import request
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return get_real_ip()
+    return 'user:' + hashlib.sha256(auth_header.encode('utf-8')).hexdigest()[:16]
+
 limiter = Limiter(
     key_func=get_real_ip,
     default_limits=["200 per day", "50 per hour"]
@@ -50,7 +68,26 @@ def create_app(config_name='default'):
     db.init_app(app)
     CORS(app, origins=app.config['CORS_ORIGINS'])
     
+    # On-demand profiling (registered first so it wraps the other hooks)
+    from app.utils.profiling import init_profiling
+    init_profiling(app)
+    
+    # Fast JSON encoding and compression for large responses
+    from app.utils.json_provider import init_json_provider
+    from app.utils.compression import init_compression
+    init_json_provider(app)
+    init_compression(app)
+    
+    # Per-request SQL query counts and timings
+    from app.utils.query_stats import init_query_stats
+    init_query_stats(app)
+    
+    # Prometheus metrics (/metrics)
+    from app.utils.metrics import init_metrics
+    init_metrics(app)
+    
     if app.config['RATE_LIMIT_ENABLED']:
+        app.config.setdefault('RATELIMIT_STORAGE_URI', app.config['RATE_LIMIT_STORAGE_URL'])
         limiter.init_app(app)
     
     # Register blueprints
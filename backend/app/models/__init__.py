@@ -55,6 +55,12 @@ class Site(db.Model):
     is_active = db.Column(db.Boolean, default=False)  # Requires admin approval
     is_approved = db.Column(db.Boolean, default=False)
     
+    # Notification history retention in days (None = NOTIFICATION_RETENTION_DAYS, 0 = keep forever)
+    retention_days = db.Column(db.Integer)
+    
+    # Recipients per quota window (None = SITE_RECIPIENT_QUOTA, 0 = unlimited)
+    recipient_quota = db.Column(db.Integer)
+    
     # Metadata
     creator_keyn_id = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -82,7 +88,7 @@ class UserPreference(db.Model):
     __tablename__ = 'user_preferences'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     
     # Channel preferences
     email_enabled = db.Column(db.Boolean, default=True)
@@ -149,9 +155,10 @@ class SitePreference(db.Model):
     user = db.relationship('User', back_populates='site_preferences')
     site = db.relationship('Site', back_populates='preferences')
     
-    # Unique constraint
+    # Unique constraint (also serves user_id lookups); site_id index for per-site audiences
     __table_args__ = (
         db.UniqueConstraint('user_id', 'site_id', name='unique_user_site'),
+        db.Index('ix_site_preferences_site_id', 'site_id'),
     )
     
     def to_dict(self):
@@ -186,6 +193,7 @@ class Notification(db.Model):
     message = db.Column(db.Text, nullable=False)
     notification_type = db.Column(db.String(50))  # e.g., 'info', 'warning', 'success'
     category_key = db.Column(db.String(100))  # site-defined category key (e.g., 'reminder')
+    collapse_key = db.Column(db.String(100))  # site-defined key; newer notifications replace older ones
     
     # Delivery channels
     sent_via_email = db.Column(db.Boolean, default=False)
@@ -203,6 +211,14 @@ class Notification(db.Model):
     user = db.relationship('User', back_populates='notifications')
     site = db.relationship('Site', back_populates='notifications')
     
+    # Indexes matching the history (per user, optionally per site, newest first)
+    # and admin per-site listing query shapes
+    __table_args__ = (
+        db.Index('ix_notifications_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_notifications_user_site_created', 'user_id', 'site_id', 'created_at', 'id'),
+        db.Index('ix_notifications_site_created', 'site_id', 'created_at'),
+    )
+    
     def to_dict(self):
         """Convert notification to dictionary."""
         return {
@@ -242,6 +258,10 @@ class PendingNotification(db.Model):
     notification_type = db.Column(db.String(50), default='info')
     category_key = db.Column(db.String(100), nullable=True, index=True)
     
+    # Coalescing: a newer notification with the same key replaces this one while pending
+    collapse_key = db.Column(db.String(100), nullable=True)
+    collapsed_count = db.Column(db.Integer, default=1)  # Notifications merged into this one
+    
     # Additional metadata (JSON stored as text)
     metadata_json = db.Column(db.Text, nullable=True)
     
@@ -258,6 +278,13 @@ class PendingNotification(db.Model):
     user = db.relationship('User')
     site = db.relationship('Site')
     
+    # Indexes for the per-site pending listing and the scheduler's due/cleanup scans
+    __table_args__ = (
+        db.Index('ix_pending_site_cancelled_scheduled', 'site_id', 'cancelled_at', 'scheduled_for'),
+        db.Index('ix_pending_cancelled_scheduled', 'cancelled_at', 'scheduled_for'),
+        db.Index('ix_pending_user_site', 'user_id', 'site_id'),
+    )
+    
     def to_dict(self):
         """Convert pending notification to dictionary."""
         import json
@@ -269,6 +296,8 @@ class PendingNotification(db.Model):
             'html_message': self.html_message,
             'type': self.notification_type,
             'category': self.category_key,
+            'collapse_key': self.collapse_key,
+            'collapsed_count': self.collapsed_count,
             'scheduled_for': self.scheduled_for.isoformat() if self.scheduled_for else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'cancelled_at': self.cancelled_at.isoformat() if self.cancelled_at else None,
@@ -279,12 +308,160 @@ class PendingNotification(db.Model):
         return f'<PendingNotification id={self.id} user_id={self.user_id} site_id={self.site_id}>'
 
 
+class UnreadCounter(db.Model):
+    """Maintained count of unread notifications per user per site."""
+    __tablename__ = 'unread_counters'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    site_id = db.Column(db.Integer, db.ForeignKey('sites.id'), nullable=False, index=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'site_id', name='unique_unread_user_site'),
+    )
+
+    def __repr__(self):
+        return f'<UnreadCounter user_id={self.user_id} site_id={self.site_id} count={self.count}>'
+
+
+class NotificationStat(db.Model):
+    """Hourly rollup of logged notifications per site and delivery channel.
+
+    channel is one of 'all' (every logged notification), 'email', 'web_push',
+    'discord' or 'webhook' (notifications delivered via that channel).
+    """
+    __tablename__ = 'notification_stats'
+
+    id = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.DateTime, nullable=False)  # Start of the hour (UTC)
+    site_id = db.Column(db.Integer, db.ForeignKey('sites.id'), nullable=False, index=True)
+    channel = db.Column(db.String(20), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('bucket', 'site_id', 'channel', name='unique_stat_bucket_site_channel'),
+    )
+
+    def __repr__(self):
+        return f'<NotificationStat {self.bucket} site_id={self.site_id} {self.channel}={self.count}>'
+
+
+class IdempotencyKey(db.Model):
+    """Stored response for an Idempotency-Key sent with a site request.
+
+    status_code is NULL while the original request is still being processed.
+    """
+    __tablename__ = 'idempotency_keys'
+
+    id = db.Column(db.Integer, primary_key=True)
+    site_id = db.Column(db.Integer, db.ForeignKey('sites.id'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the request body
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('site_id', 'key', name='unique_idempotency_site_key'),
+    )
+
+    def __repr__(self):
+        return f'<IdempotencyKey site_id={self.site_id} key={self.key}>'
+
+
+class StreamTicket(db.Model):
+    """Short-lived, single-use credential for opening a live notification stream.
+
+    EventSource cannot send an Authorization header, so browsers exchange their
+    token for a ticket and pass that in the stream URL instead. Only a hash of
+    the ticket is stored.
+    """
+    __tablename__ = 'stream_tickets'
+
+    id = db.Column(db.Integer, primary_key=True)
+    ticket_hash = db.Column(db.String(64), unique=True, nullable=False)  # SHA-256 of the ticket
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<StreamTicket user_id={self.user_id}>'
+
+
+class BroadcastJob(db.Model):
+    """Admin broadcast processed in chunks by the background worker."""
+    __tablename__ = 'broadcast_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Site the notifications are attributed to
+    site_id = db.Column(db.Integer, db.ForeignKey('sites.id'), nullable=False)
+    created_by_keyn_id = db.Column(db.String(100))
+
+    # Notification content
+    title = db.Column(db.String(200), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    html_message = db.Column(db.Text, nullable=True)
+    notification_type = db.Column(db.String(50), default='info')
+
+    # Audience: 'all' or 'site_users' (users with preferences for target_site_id)
+    target = db.Column(db.String(20), nullable=False, default='all')
+    target_site_id = db.Column(db.Integer, db.ForeignKey('sites.id'), nullable=True)
+
+    # Progress
+    # status: 'queued' | 'running' | 'completed' | 'cancelled' | 'failed'
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    cursor = db.Column(db.Integer, nullable=False, default=0)  # Last processed users.id
+    total = db.Column(db.Integer, nullable=False, default=0)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    successful = db.Column(db.Integer, nullable=False, default=0)
+    scheduled = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+
+    # Worker currently sending a chunk; others skip the job until the lease ends
+    claimed_by = db.Column(db.String(32), nullable=True)
+    claimed_until = db.Column(db.DateTime, nullable=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    site = db.relationship('Site', foreign_keys=[site_id])
+    target_site = db.relationship('Site', foreign_keys=[target_site_id])
+
+    def to_dict(self):
+        """Convert broadcast job to dictionary."""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'type': self.notification_type,
+            'target': self.target,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'successful': self.successful,
+            'scheduled': self.scheduled,
+            'failed': self.failed,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<BroadcastJob id={self.id} status={self.status}>'
+
+
 class WebPushSubscription(db.Model):
     """Web Push subscriptions for users."""
     __tablename__ = 'web_push_subscriptions'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     
     # Push subscription details
     endpoint = db.Column(db.String(500), nullable=False, unique=True)
@@ -372,8 +549,11 @@ class UserCategoryPreference(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Unique constraint covers the (user, site, category) lookups; category_id
+    # index supports per-category scans
     __table_args__ = (
         db.UniqueConstraint('user_id', 'site_id', 'category_id', name='unique_user_site_category'),
+        db.Index('ix_user_category_preferences_category_id', 'category_id'),
     )
 
     def to_dict(self):
@@ -1,10 +1,19 @@
 """Admin routes for site and notification management."""
-from flask import Blueprint, request, jsonify
-from sqlalchemy import func, desc
+from flask import Blueprint, request, jsonify, send_file, current_app
+from sqlalchemy import func, desc, case
+from datetime import datetime
 from app import db
-from app.models import Site, Notification, User, SiteNotificationCategory
+from app.models import (
+    Site, Notification, User, SiteNotificationCategory, UnreadCounter, NotificationStat,
+    PendingNotification, SitePreference, BroadcastJob, IdempotencyKey, UserCategoryPreference
+)
 from app.utils.auth import require_admin_auth
-from app.services.notification_service import NotificationService
+from app.services.stats_service import StatsService
+from app.services.broadcast_service import BroadcastService
+from app.services.retention_service import RetentionService
+from app.services.quota_service import QuotaService
+from app.utils.serializers import notification_rows, serialize_notification
+from app.utils import profiling, query_stats
 
 bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
@@ -13,52 +22,205 @@ bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 @require_admin_auth
 def get_dashboard(user):
     """Get admin dashboard overview."""
-    total_notifications = Notification.query.count()
     total_users = User.query.count()
-    total_sites = Site.query.count()
-    active_sites = Site.query.filter_by(is_active=True).count()
-    pending_sites = Site.query.filter_by(is_approved=False).count()
+    total_sites, active_sites, pending_sites = db.session.query(
+        func.count(Site.id),
+        func.sum(case((Site.is_active == True, 1), else_=0)),  # noqa: E712
+        func.sum(case((Site.is_approved == False, 1), else_=0))  # noqa: E712
+    ).one()
     
-    # Notifications by channel
-    email_count = Notification.query.filter_by(sent_via_email=True).count()
-    web_push_count = Notification.query.filter_by(sent_via_web_push=True).count()
-    discord_count = Notification.query.filter_by(sent_via_discord=True).count()
-    webhook_count = Notification.query.filter_by(sent_via_webhook=True).count()
+    # Notification totals (overall and by channel) come from the hourly rollup
+    totals = StatsService.get_totals()
     
     # Recent activity
-    recent_notifications = Notification.query.order_by(
+    recent_notifications = notification_rows(Notification.query).order_by(
         Notification.created_at.desc()
     ).limit(10).all()
     
     return jsonify({
         'stats': {
-            'notifications': total_notifications,
+            'notifications': totals['all'],
             'users': total_users,
             'sites': total_sites,
-            'active_sites': active_sites,
-            'pending_sites': pending_sites
+            'active_sites': int(active_sites or 0),
+            'pending_sites': int(pending_sites or 0)
         },
         'channels': {
-            'email': email_count,
-            'web_push': web_push_count,
-            'discord': discord_count,
-            'webhook': webhook_count
+            'email': totals['email'],
+            'web_push': totals['web_push'],
+            'discord': totals['discord'],
+            'webhook': totals['webhook']
         },
-        'recent_notifications': [n.to_dict() for n in recent_notifications]
+        'recent_notifications': [serialize_notification(n) for n in recent_notifications]
     }), 200
 
 
+@bp.route('/analytics', methods=['GET'])
+@require_admin_auth
+def get_analytics(user):
+    """
+    Get hourly notification volume per channel.
+    
+    Query parameters:
+    - hours: Trailing window in hours (default: 24, max: 720)
+    - site_id: Filter by site (optional)
+    """
+    hours = max(1, min(int(request.args.get('hours', 24)), 720))
+    site_id = request.args.get('site_id')
+    
+    internal_site_id = None
+    if site_id:
+        site = Site.query.filter_by(site_id=site_id).first()
+        if not site:
+            return jsonify({'error': 'Site not found'}), 404
+        internal_site_id = site.id
+    
+    return jsonify({
+        'hours': hours,
+        'site_id': site_id,
+        'totals': StatsService.get_totals(internal_site_id),
+        'series': StatsService.get_timeseries(hours, internal_site_id)
+    }), 200
+
+
+@bp.route('/query-stats', methods=['GET'])
+@require_admin_auth
+def get_query_stats(user):
+    """
+    Get SQL query counts and timings per endpoint for the worker serving the request.
+    
+    Query parameters:
+    - reset: If 'true', clear the aggregates after reading them
+    """
+    endpoints = query_stats.snapshot()
+    if request.args.get('reset', 'false').lower() == 'true':
+        query_stats.reset()
+    
+    return jsonify({'endpoints': endpoints}), 200
+
+
+@bp.route('/profiles', methods=['GET'])
+@require_admin_auth
+def list_profiles(user):
+    """List saved request profiles, newest first."""
+    return jsonify({
+        'enabled': current_app.config['PROFILING_ENABLED'],
+        'sample_rate': current_app.config['PROFILE_SAMPLE_RATE'],
+        'profiles': profiling.list_profiles(current_app.config['PROFILE_DIR'])
+    }), 200
+
+
+@bp.route('/profiles/<name>', methods=['GET'])
+@require_admin_auth
+def get_profile(user, name):
+    """
+    Download a saved request profile.
+    
+    Query parameters:
+    - format: 'prof' (pstats file, default) or 'text' (top functions)
+    - sort: Sort key for text output (default: cumulative)
+    - limit: Functions listed in text output (default: 50)
+    """
+    try:
+        path = profiling.profile_path(current_app.config['PROFILE_DIR'], name)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'calls', 'ncalls'):
+            return jsonify({'error': 'Invalid sort. Must be one of: cumulative, tottime, calls, ncalls'}), 400
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+        return current_app.response_class(
+            profiling.render_profile(path, sort, limit), mimetype='text/plain'
+        )
+    
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True, download_name=name)
+
+
 @bp.route('/sites', methods=['GET'])
 @require_admin_auth
 def list_all_sites(user):
-    """List all sites with detailed information."""
-    sites = Site.query.order_by(Site.created_at.desc()).all()
+    """
+    List all sites with detailed information.
+    
+    Per-site counts are computed with one grouped aggregate per table
+    (notification counts come from the stats rollup), joined onto the
+    site listing in a single query.
+    
+    Query parameters:
+    - sort: created_at, name, notifications, categories, pending or subscribers
+      (default: created_at)
+    - order: asc or desc (default: desc)
+    - limit: Number of sites to return (default: 100, max: 500)
+    - offset: Pagination offset (default: 0)
+    """
+    limit = min(int(request.args.get('limit', 100)), 500)
+    offset = int(request.args.get('offset', 0))
+    sort = request.args.get('sort', 'created_at')
+    order = request.args.get('order', 'desc')
+    
+    notification_counts = db.session.query(
+        NotificationStat.site_id.label('site_id'),
+        func.sum(NotificationStat.count).label('count')
+    ).filter(NotificationStat.channel == 'all').group_by(NotificationStat.site_id).subquery()
+    
+    category_counts = db.session.query(
+        SiteNotificationCategory.site_id.label('site_id'),
+        func.count(SiteNotificationCategory.id).label('count')
+    ).group_by(SiteNotificationCategory.site_id).subquery()
+    
+    pending_counts = db.session.query(
+        PendingNotification.site_id.label('site_id'),
+        func.count(PendingNotification.id).label('count')
+    ).filter(PendingNotification.cancelled_at == None).group_by(PendingNotification.site_id).subquery()  # noqa: E711
+    
+    subscriber_counts = db.session.query(
+        SitePreference.site_id.label('site_id'),
+        func.count(SitePreference.id).label('count')
+    ).group_by(SitePreference.site_id).subquery()
+    
+    notification_count = func.coalesce(notification_counts.c.count, 0)
+    category_count = func.coalesce(category_counts.c.count, 0)
+    pending_count = func.coalesce(pending_counts.c.count, 0)
+    subscriber_count = func.coalesce(subscriber_counts.c.count, 0)
+    
+    sort_columns = {
+        'created_at': Site.created_at,
+        'name': Site.name,
+        'notifications': notification_count,
+        'categories': category_count,
+        'pending': pending_count,
+        'subscribers': subscriber_count
+    }
+    if sort not in sort_columns:
+        return jsonify({'error': f'Invalid sort. Must be one of: {", ".join(sort_columns)}'}), 400
+    sort_column = sort_columns[sort]
+    sort_column = sort_column.asc() if order == 'asc' else sort_column.desc()
+    
+    query = db.session.query(
+        Site,
+        notification_count.label('notification_count'),
+        category_count.label('category_count'),
+        pending_count.label('pending_count'),
+        subscriber_count.label('subscriber_count')
+    ).outerjoin(
+        notification_counts, notification_counts.c.site_id == Site.id
+    ).outerjoin(
+        category_counts, category_counts.c.site_id == Site.id
+    ).outerjoin(
+        pending_counts, pending_counts.c.site_id == Site.id
+    ).outerjoin(
+        subscriber_counts, subscriber_counts.c.site_id == Site.id
+    )
+    
+    total = Site.query.count()
+    rows = query.order_by(sort_column, Site.id.desc()).limit(limit).offset(offset).all()
     
     sites_data = []
-    for site in sites:
-        notification_count = Notification.query.filter_by(site_id=site.id).count()
-        category_count = SiteNotificationCategory.query.filter_by(site_id=site.id).count()
-        
+    for site, notifications, categories, pending, subscribers in rows:
         sites_data.append({
             'id': site.id,
             'site_id': site.site_id,
@@ -69,11 +231,20 @@ def list_all_sites(user):
             'is_active': site.is_active,
             'api_key': site.api_key,
             'created_at': site.created_at.isoformat(),
-            'notification_count': notification_count,
-            'category_count': category_count
+            'retention_days': RetentionService.retention_days(site),
+            'recipient_quota': QuotaService.limit_for(site),
+            'notification_count': int(notifications),
+            'category_count': int(categories),
+            'pending_count': int(pending),
+            'subscriber_count': int(subscribers)
         })
     
-    return jsonify({'sites': sites_data}), 200
+    return jsonify({
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'sites': sites_data
+    }), 200
 
 
 @bp.route('/sites', methods=['POST'])
@@ -138,6 +309,16 @@ def update_site(user, site_id):
         site.name = data['name']
     if 'description' in data:
         site.description = data['description']
+    if 'retention_days' in data:
+        retention_days = data['retention_days']
+        if retention_days is not None and (not isinstance(retention_days, int) or retention_days < 0):
+            return jsonify({'error': 'retention_days must be a non-negative integer or null'}), 400
+        site.retention_days = retention_days
+    if 'recipient_quota' in data:
+        recipient_quota = data['recipient_quota']
+        if recipient_quota is not None and (not isinstance(recipient_quota, int) or recipient_quota < 0):
+            return jsonify({'error': 'recipient_quota must be a non-negative integer or null'}), 400
+        site.recipient_quota = recipient_quota
     
     db.session.commit()
     
@@ -146,11 +327,68 @@ def update_site(user, site_id):
         'site': {
             'site_id': site.site_id,
             'name': site.name,
-            'description': site.description
+            'description': site.description,
+            'retention_days': RetentionService.retention_days(site),
+            'recipient_quota': QuotaService.limit_for(site)
         }
     }), 200
 
 
+@bp.route('/sites/<site_id>/archives', methods=['GET'])
+@require_admin_auth
+def list_site_archives(user, site_id):
+    """List a site's archived notification months."""
+    site = Site.query.filter_by(site_id=site_id).first()
+    
+    if not site:
+        return jsonify({'error': 'Site not found'}), 404
+    
+    return jsonify({
+        'site_id': site.site_id,
+        'retention_days': RetentionService.retention_days(site),
+        'archives': RetentionService.list_archives(site)
+    }), 200
+
+
+@bp.route('/sites/<site_id>/archives/<month>', methods=['GET'])
+@require_admin_auth
+def read_site_archive(user, site_id, month):
+    """
+    Read archived notifications for a site and month (YYYY-MM).
+    
+    Query parameters:
+    - user_id: Filter by KeyN user ID (optional)
+    - limit: Max results (default 100, max 1000)
+    - offset: Pagination offset (default 0)
+    """
+    site = Site.query.filter_by(site_id=site_id).first()
+    
+    if not site:
+        return jsonify({'error': 'Site not found'}), 404
+    
+    limit = min(int(request.args.get('limit', 100)), 1000)
+    offset = int(request.args.get('offset', 0))
+    
+    try:
+        result = RetentionService.read_archive(
+            site, month, keyn_user_id=request.args.get('user_id'), limit=limit, offset=offset
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if result is None:
+        return jsonify({'error': 'Archive not found'}), 404
+    
+    notifications, total = result
+    return jsonify({
+        'month': month,
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'notifications': notifications
+    }), 200
+
+
 @bp.route('/sites/<site_id>', methods=['DELETE'])
 @require_admin_auth
 def delete_site(user, site_id):
@@ -162,11 +400,29 @@ def delete_site(user, site_id):
     
     # Delete all associated data
     Notification.query.filter_by(site_id=site.id).delete()
+    PendingNotification.query.filter_by(site_id=site.id).delete()
+    UnreadCounter.query.filter_by(site_id=site.id).delete()
+    NotificationStat.query.filter_by(site_id=site.id).delete()
+    IdempotencyKey.query.filter_by(site_id=site.id).delete()
+    BroadcastJob.query.filter_by(site_id=site.id).delete()
+    UserCategoryPreference.query.filter_by(site_id=site.id).delete()
     SiteNotificationCategory.query.filter_by(site_id=site.id).delete()
     
+    # Broadcasts to this site's users lose their audience: stop active ones, keep the history
+    BroadcastJob.query.filter(
+        BroadcastJob.target_site_id == site.id,
+        BroadcastJob.status.in_(BroadcastService.ACTIVE_STATUSES)
+    ).update({'status': 'cancelled', 'finished_at': datetime.utcnow()}, synchronize_session=False)
+    BroadcastJob.query.filter_by(target_site_id=site.id).update(
+        {'target_site_id': None}, synchronize_session=False
+    )
+    
     db.session.delete(site)
     db.session.commit()
     
+    # Internal IDs can be reused, so a later site must not inherit these
+    RetentionService.delete_archives(site)
+    
     return jsonify({'message': 'Site deleted successfully'}), 200
 
 
@@ -319,7 +575,7 @@ def list_notifications(user):
             query = query.filter_by(site_id=site.id)
     
     total = query.count()
-    notifications = query.order_by(
+    notifications = notification_rows(query).order_by(
         Notification.created_at.desc()
     ).limit(limit).offset(offset).all()
     
@@ -327,7 +583,7 @@ def list_notifications(user):
         'total': total,
         'limit': limit,
         'offset': offset,
-        'notifications': [n.to_dict() for n in notifications]
+        'notifications': [serialize_notification(n) for n in notifications]
     }), 200
 
 
@@ -358,13 +614,18 @@ def list_users(user):
 @bp.route('/broadcast', methods=['POST'])
 @require_admin_auth
 def broadcast(user):
-    """Broadcast a notification to all users (admin only).
+    """Queue a broadcast notification to all users (admin only).
+
+    The broadcast is persisted as a job and sent in chunks by the background
+    worker (scripts/scheduler.py); poll GET /api/admin/broadcasts/<id> for progress.
 
     Body JSON:
     - title (required)
     - message (required)
     - type (optional, default 'info')
     - html_message (optional)
+    - target (optional): 'all' (default) or 'site_users'
+    - site_id (required when target is 'site_users')
     """
     data = request.get_json() or {}
 
@@ -394,31 +655,71 @@ def broadcast(user):
     # Optional targeting
     target = data.get('target', 'all')  # 'all' or 'site_users'
     target_site_id = data.get('site_id')
+    target_site = None
 
-    user_ids = []
+    if target not in ('all', 'site_users'):
+        return jsonify({'error': "target must be 'all' or 'site_users'"}), 400
 
-    if target == 'site_users' and target_site_id:
+    if target == 'site_users':
+        if not target_site_id:
+            return jsonify({'error': "site_id is required when target is 'site_users'"}), 400
         target_site = Site.query.filter_by(site_id=target_site_id).first()
         if not target_site:
             return jsonify({'error': 'Target site not found'}), 404
 
-        # Users with explicit site preferences for that site
-        from app.models import SitePreference
-        prefs = SitePreference.query.filter_by(site_id=target_site.id).all()
-        user_ids = [User.query.get(p.user_id).keyn_user_id for p in prefs if User.query.get(p.user_id)]
-    else:
-        # Default: all users
-        user_ids = [u.keyn_user_id for u in User.query.with_entities(User.keyn_user_id).all()]
-
-    # If no users, return early
-    if not user_ids:
-        return jsonify({'message': 'No users to send to'}), 200
-
-    # Use NotificationService to send in bulk
-    results = NotificationService.send_bulk_notification(
-        admin_site, user_ids, title, message, notification_type,
-        html_message=html_message
+    job = BroadcastService.create_job(
+        admin_site, title, message, notification_type,
+        html_message=html_message, target=target, target_site=target_site,
+        created_by_keyn_id=user.keyn_user_id
     )
 
-    return jsonify({'message': 'Broadcast dispatched', 'results': results}), 200
+    # If no users, there is nothing to queue
+    if job.total == 0:
+        job.status = 'completed'
+        db.session.commit()
+        return jsonify({'message': 'No users to send to', 'job': job.to_dict()}), 200
+
+    return jsonify({'message': 'Broadcast queued', 'job': job.to_dict()}), 202
 
+
+@bp.route('/broadcasts', methods=['GET'])
+@require_admin_auth
+def list_broadcasts(user):
+    """List recent broadcast jobs, newest first."""
+    limit = min(int(request.args.get('limit', 20)), 100)
+    jobs = BroadcastJob.query.order_by(BroadcastJob.id.desc()).limit(limit).all()
+    return jsonify({'broadcasts': [job.to_dict() for job in jobs]}), 200
+
+
+@bp.route('/broadcasts/<int:job_id>', methods=['GET'])
+@require_admin_auth
+def get_broadcast(user, job_id):
+    """Get progress of a broadcast job."""
+    job = BroadcastJob.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Broadcast not found'}), 404
+    return jsonify({'job': job.to_dict()}), 200
+
+
+@bp.route('/broadcasts/<int:job_id>/cancel', methods=['POST'])
+@require_admin_auth
+def cancel_broadcast(user, job_id):
+    """Cancel a queued or running broadcast job."""
+    job = BroadcastJob.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Broadcast not found'}), 404
+    if not BroadcastService.cancel(job):
+        return jsonify({'error': f'Broadcast is {job.status} and cannot be cancelled'}), 400
+    return jsonify({'message': 'Broadcast cancelled', 'job': job.to_dict()}), 200
+
+
+@bp.route('/broadcasts/<int:job_id>/resume', methods=['POST'])
+@require_admin_auth
+def resume_broadcast(user, job_id):
+    """Resume a cancelled or failed broadcast job from where it stopped."""
+    job = BroadcastJob.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Broadcast not found'}), 404
+    if not BroadcastService.resume(job):
+        return jsonify({'error': f'Broadcast is {job.status} and cannot be resumed'}), 400
+    return jsonify({'message': 'Broadcast resumed', 'job': job.to_dict()}), 200
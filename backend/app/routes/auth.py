@@ -1,8 +1,10 @@
 """Authentication routes."""
 from flask import Blueprint, request, jsonify, current_app
 import requests
+import time
 from app import db
 from app.models import User
+from app.utils.metrics import KEYN_VERIFY_SECONDS
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -20,6 +22,8 @@ def verify_keyn_token(token):
     Raises:
         Exception: If token is invalid or request fails
     """
+    started = time.monotonic()
+    outcome = 'error'
     try:
         response = requests.get(
             f"{current_app.config['KEYN_BASE_URL']}/api/user-scoped",
@@ -29,12 +33,16 @@ def verify_keyn_token(token):
         )
         
         if response.status_code == 200:
+            outcome = 'valid'
             return response.json()
         else:
+            outcome = 'invalid' if response.status_code == 401 else 'error'
             raise Exception(f"Invalid token: {response.status_code}")
             
     except requests.RequestException as e:
         raise Exception(f"Failed to verify token with KeyN: {str(e)}")
+    finally:
+        KEYN_VERIFY_SECONDS.labels(outcome).observe(time.monotonic() - started)
 
 
 def get_or_create_user(keyn_data):
@@ -1,8 +1,10 @@
 """Site notification category management routes (admin)."""
 from flask import Blueprint, request, jsonify
+from sqlalchemy import func
 from app import db
 from app.models import Site, SiteNotificationCategory
 from app.utils.auth import require_admin_auth
+from app.utils.http import make_etag, conditional_response, PUBLIC_CACHE_CONTROL
 
 bp = Blueprint('categories', __name__, url_prefix='/api')
 
@@ -51,8 +53,16 @@ def get_categories(site_id):
     site = Site.query.filter_by(site_id=site_id, is_active=True, is_approved=True).first()
     if not site:
         return jsonify({'error': 'Site not found'}), 404
-    cats = SiteNotificationCategory.query.filter_by(site_id=site.id).all()
-    return jsonify({'categories': [c.to_dict() for c in cats]}), 200
+    version = db.session.query(
+        func.count(SiteNotificationCategory.id), func.max(SiteNotificationCategory.updated_at)
+    ).filter(SiteNotificationCategory.site_id == site.id).one()
+    etag = make_etag('categories', site.id, tuple(version))
+
+    def build():
+        cats = SiteNotificationCategory.query.filter_by(site_id=site.id).all()
+        return jsonify({'categories': [c.to_dict() for c in cats]}), 200
+
+    return conditional_response(etag, build, PUBLIC_CACHE_CONTROL)
 
 
 @bp.route('/sites/<site_id>/categories/<key>', methods=['PUT'])
@@ -1,17 +1,36 @@
 """Notification sending routes."""
-from flask import Blueprint, request, jsonify, current_app
-from app import db, limiter
-from app.models import User, Site, PendingNotification
-from app.utils.auth import require_site_auth
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from sqlalchemy import and_, or_, func, update
+from app import db, limiter, get_site_rate_key, get_user_rate_key
+from app.models import User, Site, Notification, PendingNotification, UnreadCounter
+from app.utils.auth import require_site_auth, require_auth
+from app.utils.pagination import keyset_page, decode_cursor, InvalidCursorError
+from app.utils.http import make_etag, conditional_response
+from app.utils.serializers import (
+    notification_rows, serialize_notification,
+    pending_notification_rows, serialize_pending_notification,
+    parse_fields, project, NOTIFICATION_FIELDS, PENDING_NOTIFICATION_FIELDS
+)
 from app.services.notification_service import NotificationService
+from app.services.unread_service import UnreadCounterService
+from app.services.events import broker
+from app.services.idempotency_service import idempotent
+from app.services.quota_service import QuotaService
+from app.services.stream_ticket_service import StreamTicketService
+from app.services.dispatch_lanes import LANES
 from datetime import datetime
+import json
+import queue
+import time
+import pytz
 
 bp = Blueprint('notifications', __name__, url_prefix='/api')
 
 
 @bp.route('/sites/<site_id>/notify', methods=['POST'])
 @require_site_auth
-@limiter.limit("100 per hour")
+@limiter.limit(lambda: current_app.config['NOTIFY_RATE_LIMIT'], key_func=get_site_rate_key)
+@idempotent
 def send_notification(site, site_id):
     """
     Send a notification from a registered site.
@@ -23,6 +42,16 @@ def send_notification(site, site_id):
     - type: Notification type (optional, default: 'info')
     - html_message: HTML version of message (optional, for email)
     - metadata: Additional data (optional, dict)
+    - collapse_key: Coalescing key (optional); repeats replace a pending
+      notification with the same key instead of stacking
+    - priority: 'high', 'normal' or 'bulk' (optional; 'error' notifications
+      default to high, bulk sends to bulk)
+    
+    An Idempotency-Key header makes retries safe: repeats of the same key
+    and body return the original response without sending again.
+    
+    Each recipient is charged to the site's quota; requests that would
+    exceed it get 429 with Retry-After.
     """
     # Verify site_id matches the authenticated site
     if site.site_id != site_id:
@@ -43,6 +72,14 @@ def send_notification(site, site_id):
     category_key = data.get('category')  # Optional category for scheduling
     html_message = data.get('html_message')
     metadata = data.get('metadata')
+    collapse_key = data.get('collapse_key')
+    priority = data.get('priority')
+    
+    if priority is not None and priority not in LANES:
+        return jsonify({'error': f'Invalid priority. Must be one of: {", ".join(LANES)}'}), 400
+    
+    if collapse_key is not None and (not isinstance(collapse_key, str) or not 0 < len(collapse_key) <= 100):
+        return jsonify({'error': 'collapse_key must be a string of 1-100 characters'}), 400
     
     # Validate notification type
     valid_types = ['info', 'success', 'warning', 'error']
@@ -63,9 +100,14 @@ def send_notification(site, site_id):
         if len(user_ids) > 1000:
             return jsonify({'error': 'Maximum 1000 users per bulk notification'}), 400
         
+        quota_exceeded = _charge_quota(site, len(user_ids))
+        if quota_exceeded:
+            return quota_exceeded
+        
         results = NotificationService.send_bulk_notification(
             site, user_ids, title, message, notification_type,
-            category_key=category_key, html_message=html_message, metadata=metadata
+            category_key=category_key, html_message=html_message, metadata=metadata,
+            collapse_key=collapse_key, priority=priority
         )
         
         return jsonify(results), 200
@@ -79,9 +121,14 @@ def send_notification(site, site_id):
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        status = NotificationService.send_notification(
+        quota_exceeded = _charge_quota(site, 1)
+        if quota_exceeded:
+            return quota_exceeded
+        
+        status = NotificationService.send_in_lane(
             user, site, title, message, notification_type,
-            category_key=category_key, html_message=html_message, metadata=metadata
+            category_key=category_key, html_message=html_message, metadata=metadata,
+            collapse_key=collapse_key, priority=priority
         )
         
         return jsonify({
@@ -94,6 +141,23 @@ def send_notification(site, site_id):
         return jsonify({'error': 'Either user_id or user_ids must be provided'}), 400
 
 
+def _charge_quota(site, recipients):
+    """Charge recipients to the site's quota; returns a 429 response if over quota."""
+    quota = QuotaService.consume(site, recipients)
+    if quota['allowed']:
+        return None
+    
+    response = jsonify({
+        'error': 'Recipient quota exceeded',
+        'limit': quota['limit'],
+        'remaining': quota['remaining'],
+        'retry_after': quota['retry_after']
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(quota['retry_after'])
+    return response
+
+
 @bp.route('/notifications', methods=['GET'])
 def get_notification_history():
     """
@@ -101,8 +165,10 @@ def get_notification_history():
     
     Query parameters:
     - limit: Number of notifications to return (default: 50, max: 100)
-    - offset: Pagination offset (default: 0)
+    - cursor: Opaque cursor from a previous page's next_cursor (optional)
     - site_id: Filter by site (optional)
+    - include_total: Also return the total count (optional, default: false)
+    - fields: Comma-separated fields to return per notification (optional)
     """
     from app.utils.auth import require_auth
     from app.models import Notification
@@ -127,9 +193,14 @@ def get_notification_history():
         return jsonify({'error': 'Authentication failed'}), 401
     
     # Parse query parameters
-    limit = min(int(request.args.get('limit', 50)), 100)
-    offset = int(request.args.get('offset', 0))
+    limit = max(1, min(int(request.args.get('limit', 50)), 100))
+    cursor = request.args.get('cursor')
     site_id = request.args.get('site_id')
+    include_total = request.args.get('include_total', 'false').lower() == 'true'
+    try:
+        fields = parse_fields(request.args.get('fields'), NOTIFICATION_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # Build query
     query = Notification.query.filter_by(user_id=user.id)
@@ -139,18 +210,137 @@ def get_notification_history():
         if site:
             query = query.filter_by(site_id=site.id)
     
-    # Get total count
-    total = query.count()
+    # New notifications move max(id), deletions move min(id) and reads move the unread total
+    id_range = db.session.query(func.min(Notification.id), func.max(Notification.id)).filter(
+        Notification.user_id == user.id
+    ).one()
+    unread_total = db.session.query(func.sum(UnreadCounter.count)).filter(
+        UnreadCounter.user_id == user.id
+    ).scalar()
+    etag = make_etag('notifications', user.id, tuple(id_range), unread_total, sorted(request.args.items()))
+    
+    def build():
+        # Get notifications with keyset pagination
+        try:
+            notifications, next_cursor = keyset_page(
+                notification_rows(query), Notification.created_at, Notification.id, limit, cursor=cursor
+            )
+        except InvalidCursorError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        response = {
+            'limit': limit,
+            'next_cursor': next_cursor,
+            'notifications': [project(serialize_notification(n), fields) for n in notifications]
+        }
+        
+        # Counting scans the user's whole history, so only do it on request
+        if include_total:
+            response['total'] = query.count()
+        
+        return jsonify(response), 200
     
-    # Get notifications with pagination
-    notifications = query.order_by(Notification.created_at.desc()).limit(limit).offset(offset).all()
+    return conditional_response(etag, build)
+
+
+@bp.route('/notifications/stream/ticket', methods=['POST'])
+@limiter.limit(lambda: current_app.config['STREAM_TICKET_RATE_LIMIT'], key_func=get_user_rate_key)
+@require_auth
+def create_stream_ticket(user):
+    """
+    Issue a single-use ticket for opening the live notification stream.
     
+    EventSource cannot send an Authorization header; the ticket goes in the
+    stream URL instead of the bearer token, so access logs never see the token.
+    Limited per user by STREAM_TICKET_RATE_LIMIT rather than the app-wide
+    defaults, which periodic stream reconnects would exhaust.
+    """
     return jsonify({
-        'total': total,
-        'limit': limit,
-        'offset': offset,
-        'notifications': [n.to_dict() for n in notifications]
-    }), 200
+        'ticket': StreamTicketService.issue(user.id),
+        'expires_in': current_app.config['SSE_TICKET_SECONDS']
+    }), 201
+
+
+@bp.route('/notifications/stream', methods=['GET'])
+@limiter.exempt
+def stream_notifications():
+    """
+    Stream newly logged notifications to the authenticated user (Server-Sent Events).
+    
+    Authenticate with an Authorization header, or with a ticket query
+    parameter from POST /notifications/stream/ticket (for EventSource). Each
+    event's id is the notification ID; on reconnect, notifications after the
+    Last-Event-ID header (or last_event_id query parameter) are replayed
+    first. Streams close after SSE_MAX_STREAM_SECONDS.
+    
+    Production serves this route from gevent workers (see prod.sh), where a
+    stream costs a greenlet; on threaded workers each stream holds a thread.
+    Either way a worker accepts at most SSE_MAX_STREAMS_PER_WORKER; beyond
+    that the request gets 503 with Retry-After.
+    """
+    from app.utils.auth import verify_keyn_token, get_or_create_user
+    
+    auth_header = request.headers.get('Authorization')
+    ticket = request.args.get('ticket')
+    if auth_header:
+        parts = auth_header.split()
+        if len(parts) != 2 or parts[0].lower() != 'bearer':
+            return jsonify({'error': 'Invalid authorization header format'}), 401
+        try:
+            user_id = get_or_create_user(verify_keyn_token(parts[1])).id
+        except Exception as e:
+            return jsonify({'error': 'Authentication failed'}), 401
+    elif ticket:
+        user_id = StreamTicketService.redeem(ticket)
+        if user_id is None:
+            return jsonify({'error': 'Invalid or expired stream ticket'}), 401
+    else:
+        return jsonify({'error': 'No authorization header or stream ticket provided'}), 401
+    
+    app = current_app._get_current_object()
+    heartbeat = app.config['SSE_HEARTBEAT_SECONDS']
+    subscription = broker.subscribe(app, user_id, limit=app.config['SSE_MAX_STREAMS_PER_WORKER'])
+    if subscription is None:
+        db.session.remove()
+        response = jsonify({'error': 'Too many live streams on this server, retry later'})
+        response.headers['Retry-After'] = str(heartbeat)
+        return response, 503
+    
+    # Replay anything missed since the client's last event
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if last_event_id and last_event_id.isdigit():
+        missed = notification_rows(Notification.query.filter(
+            Notification.user_id == user_id,
+            Notification.id > int(last_event_id)
+        )).order_by(Notification.id).limit(100).all()
+        for row in missed:
+            subscription.deliver(serialize_notification(row))
+    
+    # Release the DB connection before holding the stream open
+    db.session.remove()
+    
+    deadline = time.monotonic() + app.config['SSE_MAX_STREAM_SECONDS']
+    
+    def generate():
+        try:
+            yield f"retry: {heartbeat * 1000}\n\n"
+            while time.monotonic() < deadline:
+                try:
+                    event = subscription.events.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: notification\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Free the slot even if the client leaves before the stream starts
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    return response
 
 
 @bp.route('/notifications/<int:notification_id>/read', methods=['POST'])
@@ -185,12 +375,109 @@ def mark_notification_read(notification_id):
     if not notification:
         return jsonify({'error': 'Notification not found'}), 404
     
-    notification.is_read = True
-    db.session.commit()
+    if not notification.is_read:
+        notification.is_read = True
+        UnreadCounterService.decrement(user.id, notification.site_id)
+        db.session.commit()
     
     return jsonify({'message': 'Notification marked as read'}), 200
 
 
+@bp.route('/notifications/read-all', methods=['POST', 'PUT'])
+@require_auth
+def mark_notifications_read(user):
+    """
+    Mark many notifications as read in a single UPDATE.
+    
+    Request body (all optional, combined with AND; empty body marks everything read):
+    - ids: List of notification IDs (max 1000)
+    - site_id: Only notifications from this site
+    - cursor: Only the notification at this history cursor position and
+      everything older (pass a history next_cursor)
+    - before: Only notifications created at or before this ISO timestamp
+    
+    Returns:
+        Number of notifications marked as read
+    """
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    elif not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    
+    filters = [Notification.user_id == user.id, Notification.is_read == False]  # noqa: E712
+    
+    ids = data.get('ids')
+    if ids is not None:
+        if not isinstance(ids, list):
+            return jsonify({'error': 'ids must be an array'}), 400
+        if len(ids) > 1000:
+            return jsonify({'error': 'Maximum 1000 ids per request'}), 400
+        try:
+            ids = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            return jsonify({'error': 'ids must be integers'}), 400
+        filters.append(Notification.id.in_(ids))
+    
+    if data.get('site_id'):
+        site = Site.query.filter_by(site_id=data['site_id']).first()
+        if not site:
+            return jsonify({'error': 'Site not found'}), 404
+        filters.append(Notification.site_id == site.id)
+    
+    if data.get('cursor'):
+        try:
+            created_at, row_id = decode_cursor(data['cursor'])
+        except InvalidCursorError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        filters.append(or_(
+            Notification.created_at < created_at,
+            and_(Notification.created_at == created_at, Notification.id <= row_id)
+        ))
+    
+    if data.get('before'):
+        try:
+            before = datetime.fromisoformat(str(data['before']).replace('Z', '+00:00'))
+        except ValueError:
+            return jsonify({'error': 'Invalid before timestamp'}), 400
+        if before.tzinfo:
+            before = before.astimezone(pytz.UTC).replace(tzinfo=None)
+        filters.append(Notification.created_at <= before)
+    
+    stmt = update(Notification).where(*filters).values(is_read=True)
+    
+    if db.engine.dialect.update_returning:
+        # Learn which sites were affected from the UPDATE itself
+        site_ids = db.session.execute(
+            stmt.returning(Notification.site_id),
+            execution_options={'synchronize_session': False}
+        ).scalars().all()
+        per_site = {}
+        for notification_site_id in site_ids:
+            per_site[notification_site_id] = per_site.get(notification_site_id, 0) + 1
+    else:
+        per_site = dict(db.session.query(
+            Notification.site_id, func.count(Notification.id)
+        ).filter(*filters).group_by(Notification.site_id).all())
+        db.session.execute(stmt, execution_options={'synchronize_session': False})
+    
+    for notification_site_id, count in per_site.items():
+        UnreadCounterService.decrement(user.id, notification_site_id, count)
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Notifications marked as read',
+        'updated': sum(per_site.values())
+    }), 200
+
+
+@bp.route('/notifications/unread-count', methods=['GET'])
+@require_auth
+def get_unread_count(user):
+    """Get the authenticated user's unread notification count, total and per site."""
+    return jsonify(UnreadCounterService.get_counts(user)), 200
+
+
 @bp.route('/notifications/test', methods=['POST'])
 def send_test_notification():
     """Send a test notification to the authenticated user."""
@@ -294,6 +581,8 @@ def list_pending_notifications(site, site_id):
     - category: Filter by category key (optional)
     - limit: Max results (default 100, max 1000)
     - offset: Pagination offset (default 0)
+    - fields: Comma-separated fields to return, e.g. id,title,scheduled_for (optional;
+      html_message and metadata are not loaded unless requested)
     
     Returns:
         JSON array of pending notifications with details
@@ -302,6 +591,11 @@ def list_pending_notifications(site, site_id):
     if site.site_id != site_id:
         return jsonify({'error': 'Site ID mismatch'}), 403
     
+    try:
+        fields = parse_fields(request.args.get('fields'), PENDING_NOTIFICATION_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     # Build query
     query = PendingNotification.query.filter_by(
         site_id=site.id,
@@ -327,13 +621,15 @@ def list_pending_notifications(site, site_id):
     offset = int(request.args.get('offset', 0))
     
     total = query.count()
-    pending = query.order_by(PendingNotification.scheduled_for).limit(limit).offset(offset).all()
+    pending = pending_notification_rows(query, fields).order_by(
+        PendingNotification.scheduled_for
+    ).limit(limit).offset(offset).all()
     
     return jsonify({
         'total': total,
         'limit': limit,
         'offset': offset,
-        'pending_notifications': [p.to_dict() for p in pending]
+        'pending_notifications': [project(serialize_pending_notification(p), fields) for p in pending]
     }), 200
 
 
@@ -1,8 +1,10 @@
 """User preference routes."""
 from flask import Blueprint, request, jsonify
+from sqlalchemy import and_, func
 from app import db
 from app.models import UserPreference, SitePreference, Site, SiteNotificationCategory, UserCategoryPreference
 from app.utils.auth import require_auth
+from app.utils.http import make_etag, conditional_response
 
 bp = Blueprint('preferences', __name__, url_prefix='/api')
 
@@ -19,7 +21,8 @@ def get_global_preferences(user):
         db.session.add(prefs)
         db.session.commit()
     
-    return jsonify(prefs.to_dict()), 200
+    etag = make_etag('preferences', user.id, prefs.id, prefs.updated_at)
+    return conditional_response(etag, lambda: (jsonify(prefs.to_dict()), 200))
 
 
 @bp.route('/preferences', methods=['PUT'])
@@ -77,8 +80,18 @@ def get_site_preferences(user, site_id):
         db.session.add(global_prefs)
         db.session.commit()
     
-    # Build response with site overrides
-    response = {
+    etag = make_etag(
+        'site-preferences', user.id, site.id, site.updated_at, global_prefs.updated_at,
+        site_prefs.id if site_prefs else None, site_prefs.updated_at if site_prefs else None
+    )
+    return conditional_response(
+        etag, lambda: (jsonify(_site_preferences_response(site, site_prefs, global_prefs)), 200)
+    )
+
+
+def _site_preferences_response(site, site_prefs, global_prefs):
+    """Build the site preferences response with site overrides."""
+    return {
         'site': {
             'id': site.site_id,
             'name': site.name,
@@ -98,8 +111,6 @@ def get_site_preferences(user, site_id):
             'webhook': site_prefs.webhook_enabled if (site_prefs and site_prefs.webhook_enabled is not None) else global_prefs.webhook_enabled
         }
     }
-    
-    return jsonify(response), 200
 
 
 @bp.route('/sites/<site_id>/preferences', methods=['PUT'])
@@ -164,19 +175,91 @@ def list_site_categories(user, site_id):
     if not site:
         return jsonify({'error': 'Site not found'}), 404
 
-    categories = SiteNotificationCategory.query.filter_by(site_id=site.id).all()
-    result = []
-    for cat in categories:
-        ucp = UserCategoryPreference.query.filter_by(
-            user_id=user.id, site_id=site.id, category_id=cat.id
-        ).first()
-        result.append({
-            'category': cat.to_dict(),
-            'user_preference': ucp.to_dict() if ucp else None
-        })
+    # Version from the categories and this user's overrides; deletions change the counts
+    category_version = db.session.query(
+        func.count(SiteNotificationCategory.id), func.max(SiteNotificationCategory.updated_at)
+    ).filter(SiteNotificationCategory.site_id == site.id).one()
+    preference_version = db.session.query(
+        func.count(UserCategoryPreference.id), func.max(UserCategoryPreference.updated_at)
+    ).filter(
+        UserCategoryPreference.user_id == user.id,
+        UserCategoryPreference.site_id == site.id
+    ).one()
+    etag = make_etag('my-categories', user.id, site.id, tuple(category_version), tuple(preference_version))
+    return conditional_response(etag, lambda: _site_categories_response(user, site))
+
+
+def _site_categories_response(user, site):
+    """Build the category list with the user's preferences."""
+    # One LEFT JOIN instead of a preference lookup per category
+    rows = db.session.query(SiteNotificationCategory, UserCategoryPreference).outerjoin(
+        UserCategoryPreference,
+        and_(
+            UserCategoryPreference.category_id == SiteNotificationCategory.id,
+            UserCategoryPreference.user_id == user.id
+        )
+    ).filter(SiteNotificationCategory.site_id == site.id).order_by(SiteNotificationCategory.id).all()
+
+    result = [{
+        'category': cat.to_dict(),
+        'user_preference': ucp.to_dict() if ucp else None
+    } for cat, ucp in rows]
     return jsonify({'categories': result}), 200
 
 
+@bp.route('/sites/<site_id>/my-categories', methods=['PUT'])
+@require_auth
+def update_user_category_preferences(user, site_id):
+    """Update preferences for many categories of a site in one transaction.
+
+    Body: { categories: { <category_key>: { enabled?, schedule? }, ... } }
+    """
+    site = Site.query.filter_by(site_id=site_id).first()
+    if not site:
+        return jsonify({'error': 'Site not found'}), 404
+
+    data = request.get_json() or {}
+    updates = data.get('categories')
+    if not isinstance(updates, dict) or not updates:
+        return jsonify({'error': 'categories must be a non-empty object keyed by category key'}), 400
+
+    categories = {
+        cat.key: cat for cat in SiteNotificationCategory.query.filter(
+            SiteNotificationCategory.site_id == site.id,
+            SiteNotificationCategory.key.in_(list(updates))
+        ).all()
+    }
+    missing = [key for key in updates if key not in categories]
+    if missing:
+        return jsonify({'error': f'Category not found: {", ".join(missing)}'}), 404
+
+    existing = {
+        ucp.category_id: ucp for ucp in UserCategoryPreference.query.filter(
+            UserCategoryPreference.user_id == user.id,
+            UserCategoryPreference.site_id == site.id,
+            UserCategoryPreference.category_id.in_([cat.id for cat in categories.values()])
+        ).all()
+    }
+
+    result = []
+    for key, pref_data in updates.items():
+        category = categories[key]
+        ucp = existing.get(category.id)
+        if not ucp:
+            ucp = UserCategoryPreference(user_id=user.id, site_id=site.id, category_id=category.id)
+            db.session.add(ucp)
+        _apply_category_preference(ucp, pref_data or {})
+        result.append((category, ucp))
+
+    db.session.commit()
+    return jsonify({
+        'categories': [{
+            'category': category.key,
+            'preference': ucp.to_dict()
+        } for category, ucp in result]
+    }), 200
+
+
 @bp.route('/sites/<site_id>/categories/<category_key>/preferences', methods=['PUT'])
 @require_auth
 def update_user_category_preference(user, site_id, category_key):
@@ -197,6 +280,14 @@ def update_user_category_preference(user, site_id, category_key):
         ucp = UserCategoryPreference(user_id=user.id, site_id=site.id, category_id=category.id)
         db.session.add(ucp)
 
+    _apply_category_preference(ucp, data)
+
+    db.session.commit()
+    return jsonify({'category': category.key, 'preference': ucp.to_dict()}), 200
+
+
+def _apply_category_preference(ucp, data):
+    """Apply an enabled flag and schedule overrides from request data to a preference."""
     if 'enabled' in data:
         ucp.enabled = bool(data['enabled'])
 
@@ -210,9 +301,6 @@ def update_user_category_preference(user, site_id, category_key):
         weekly_day = schedule.get('weekly_day')
         ucp.weekly_day = int(weekly_day) if weekly_day is not None else None
 
-    db.session.commit()
-    return jsonify({'category': category.key, 'preference': ucp.to_dict()}), 200
-
 
 @bp.route('/sites/<site_id>/preferences', methods=['DELETE'])
 @require_auth
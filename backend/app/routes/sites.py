@@ -1,8 +1,10 @@
 """Site registration and management routes."""
 from flask import Blueprint, request, jsonify
+from sqlalchemy import func
 from app import db, limiter
 from app.models import Site
 from app.utils.auth import require_admin_auth
+from app.utils.http import make_etag, conditional_response, PUBLIC_CACHE_CONTROL
 
 bp = Blueprint('sites', __name__, url_prefix='/api')
 
@@ -125,6 +127,14 @@ def delete_site(site_id):
 @bp.route('/sites/public', methods=['GET'])
 def list_public_sites():
     """List all active and approved sites (public endpoint)."""
+    # Versioned over all sites so approval/deactivation changes are picked up
+    version = db.session.query(func.count(Site.id), func.max(Site.updated_at)).one()
+    etag = make_etag('public-sites', tuple(version))
+    return conditional_response(etag, _public_sites_response, PUBLIC_CACHE_CONTROL)
+
+
+def _public_sites_response():
+    """Build the public site list."""
     sites = Site.query.filter_by(is_active=True, is_approved=True).all()
     
     return jsonify({
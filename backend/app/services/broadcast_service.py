@@ -0,0 +1,256 @@
+"""Background processing of admin broadcast jobs.
+
+Every chunk is sent under a claim: a worker atomically takes a short lease on
+the job (a conditional UPDATE that only succeeds while nobody else holds one),
+reads the cursor, sends the chunk and records its progress while releasing the
+lease. Parallel schedulers, or a run overlapping a resume, therefore never send
+the same chunk twice. A worker that dies mid-chunk leaves its lease to expire
+after BROADCAST_CLAIM_SECONDS, after which that chunk is sent again.
+"""
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, or_, update
+from app import db
+from app.models import BroadcastJob, User, SitePreference
+from app.services.notification_service import NotificationService
+
+
+class BroadcastService:
+    """Creates broadcast jobs and works through their audience in chunks."""
+
+    ACTIVE_STATUSES = ('queued', 'running')
+
+    @staticmethod
+    def create_job(site, title, message, notification_type='info', html_message=None,
+                   target='all', target_site=None, created_by_keyn_id=None):
+        """
+        Persist a broadcast job for the background worker.
+
+        Args:
+            site: Site the notifications are attributed to
+            title: Notification title
+            message: Notification message (plain text)
+            notification_type: Type of notification
+            html_message: Optional HTML version of message
+            target: 'all' or 'site_users'
+            target_site: Site whose users to target when target == 'site_users'
+            created_by_keyn_id: KeyN ID of the admin creating the job
+
+        Returns:
+            BroadcastJob: The queued job
+        """
+        job = BroadcastJob(
+            site_id=site.id,
+            title=title,
+            message=message,
+            html_message=html_message,
+            notification_type=notification_type,
+            target=target,
+            target_site_id=target_site.id if target_site else None,
+            created_by_keyn_id=created_by_keyn_id,
+            status='queued'
+        )
+        job.total = BroadcastService._audience_query(job).count()
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    @staticmethod
+    def _audience_query(job):
+        """
+        Query of audience users, ordered by users.id so the job cursor can resume it.
+
+        Site audiences are resolved with a join, so each chunk costs one query
+        regardless of its size.
+        """
+        query = User.query
+        if job.target == 'site_users':
+            query = query.join(SitePreference, SitePreference.user_id == User.id).filter(
+                SitePreference.site_id == job.target_site_id
+            )
+        return query.order_by(User.id)
+
+    @staticmethod
+    def _next_chunk(job, chunk_size):
+        """Resolve the next chunk of recipient users after the job cursor."""
+        return BroadcastService._audience_query(job).filter(
+            User.id > job.cursor
+        ).limit(chunk_size).all()
+
+    @staticmethod
+    def _claimable():
+        """Filter for jobs nobody holds an unexpired claim on."""
+        return or_(BroadcastJob.claimed_until == None,  # noqa: E711
+                   BroadcastJob.claimed_until < datetime.utcnow())
+
+    @staticmethod
+    def _claimed(job, owner):
+        """UPDATE statement for a job, matching only while `owner` holds its claim."""
+        return update(BroadcastJob).where(
+            BroadcastJob.id == job.id,
+            BroadcastJob.claimed_by == owner
+        ).execution_options(synchronize_session=False)
+
+    @staticmethod
+    def claim(job, owner):
+        """
+        Atomically claim an active job for one chunk.
+
+        Args:
+            job: BroadcastJob to claim
+            owner: Token identifying the claiming worker
+
+        Returns:
+            bool: True if this worker now holds the claim
+        """
+        now = datetime.utcnow()
+        claimed = db.session.execute(
+            update(BroadcastJob).where(
+                BroadcastJob.id == job.id,
+                BroadcastJob.status.in_(BroadcastService.ACTIVE_STATUSES),
+                BroadcastService._claimable()
+            ).values(
+                claimed_by=owner,
+                claimed_until=now + timedelta(seconds=current_app.config['BROADCAST_CLAIM_SECONDS']),
+                status='running',
+                started_at=func.coalesce(BroadcastJob.started_at, now)
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        return bool(claimed)
+
+    @staticmethod
+    def process_chunk(job, chunk_size, owner):
+        """
+        Send the next chunk of a claimed job, record progress and release the claim.
+
+        Args:
+            job: BroadcastJob claimed by `owner`, loaded after the claim
+            chunk_size: Maximum recipients to process
+            owner: Token the job was claimed with
+
+        Returns:
+            bool: True if the job has more recipients left
+        """
+        users = BroadcastService._next_chunk(job, chunk_size)
+
+        if not users:
+            # A cancellation made meanwhile stays in place
+            db.session.execute(BroadcastService._claimed(job, owner).where(
+                BroadcastJob.status.in_(BroadcastService.ACTIVE_STATUSES)
+            ).values(status='completed', finished_at=datetime.utcnow()))
+            db.session.execute(BroadcastService._claimed(job, owner).values(
+                claimed_by=None, claimed_until=None
+            ))
+            db.session.commit()
+            return False
+
+        results = NotificationService.send_to_users(
+            job.site, users, job.title, job.message, job.notification_type,
+            html_message=job.html_message
+        )
+        recorded = db.session.execute(BroadcastService._claimed(job, owner).values(
+            successful=BroadcastJob.successful + results['successful'],
+            scheduled=BroadcastJob.scheduled + results['scheduled'],
+            failed=BroadcastJob.failed + results['failed'],
+            processed=BroadcastJob.processed + len(users),
+            cursor=users[-1].id,
+            claimed_by=None,
+            claimed_until=None
+        )).rowcount
+        db.session.commit()
+
+        if not recorded:
+            current_app.logger.warning(
+                f"Broadcast job {job.id} lost its claim while sending a chunk; "
+                f"raise BROADCAST_CLAIM_SECONDS above the time one chunk takes"
+            )
+        return True
+
+    @staticmethod
+    def process_jobs(chunk_size=None, time_budget=None):
+        """
+        Work through active jobs, oldest first, until the time budget runs out.
+
+        Each chunk is claimed first and the job re-read after the claim, so
+        cancelling a job through the API stops it after the chunk in flight and
+        jobs claimed by another worker are skipped.
+
+        Args:
+            chunk_size: Recipients per chunk (default: BROADCAST_CHUNK_SIZE)
+            time_budget: Seconds to spend (default: BROADCAST_TIME_BUDGET_SECONDS)
+
+        Returns:
+            bool: True if active jobs remain that no other worker is sending
+        """
+        chunk_size = chunk_size or current_app.config['BROADCAST_CHUNK_SIZE']
+        time_budget = time_budget or current_app.config['BROADCAST_TIME_BUDGET_SECONDS']
+        deadline = time.monotonic() + time_budget
+        owner = uuid.uuid4().hex
+
+        while time.monotonic() < deadline:
+            job = BroadcastJob.query.filter(
+                BroadcastJob.status.in_(BroadcastService.ACTIVE_STATUSES),
+                BroadcastService._claimable()
+            ).order_by(BroadcastJob.id).first()
+
+            if not job:
+                return False
+
+            if BroadcastService.claim(job, owner):
+                # Cursor and status as of the claim
+                db.session.refresh(job)
+                try:
+                    BroadcastService.process_chunk(job, chunk_size, owner)
+                except Exception as e:
+                    db.session.rollback()
+                    db.session.execute(BroadcastService._claimed(job, owner).values(
+                        status='failed',
+                        error=str(e),
+                        finished_at=datetime.utcnow(),
+                        claimed_by=None,
+                        claimed_until=None
+                    ))
+                    db.session.commit()
+                    current_app.logger.error(f"Broadcast job {job.id} failed: {e}")
+
+            # Pick up cancellations and claims made by other processes
+            db.session.expire_all()
+
+        return BroadcastJob.query.filter(
+            BroadcastJob.status.in_(BroadcastService.ACTIVE_STATUSES),
+            BroadcastService._claimable()
+        ).count() > 0
+
+    @staticmethod
+    def cancel(job):
+        """
+        Stop an active job; recipients already processed keep their notifications.
+
+        Returns:
+            bool: True if the job was cancelled
+        """
+        if job.status not in BroadcastService.ACTIVE_STATUSES:
+            return False
+        job.status = 'cancelled'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return True
+
+    @staticmethod
+    def resume(job):
+        """
+        Re-queue a cancelled or failed job from where it stopped.
+
+        Returns:
+            bool: True if the job was re-queued
+        """
+        if job.status not in ('cancelled', 'failed'):
+            return False
+        job.status = 'queued'
+        job.error = None
+        job.finished_at = None
+        db.session.commit()
+        return True
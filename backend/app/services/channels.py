@@ -1,23 +1,185 @@
-"""Notification channel handlers."""
-import smtplib
+"""Notification channel handlers.
+
+Each channel is a ``Channel`` subclass registered in ``CHANNELS``, which is
+what NotificationService dispatches through, so adding a channel needs no
+changes there. A channel turns a user into deliveries (``deliveries_for``)
+and sends a whole batch of them with ``send_many_async``; the default sends
+each with ``deliver`` concurrently, and channels override it where batching
+pays off (one SMTP session for many emails). Everything runs on the
+delivery engine's event loop; the blocking methods are thin wrappers that
+run a coroutine and wait for it.
+"""
+import asyncio
+import time
+from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from urllib.parse import urlparse
 from flask import current_app
-from discord_webhook import DiscordWebhook, DiscordEmbed
-import requests
-from pywebpush import webpush, WebPushException
+import aiosmtplib
+import httpx
+from pywebpush import WebPusher
 import json
+import base64
+import hashlib
+from app.models import WebPushSubscription
+from app.services.delivery_engine import engine
+from app.utils.metrics import observe_delivery, record_delivery
+
+
+class NotificationContent:
+    """
+    What a notification says, shared by all of its deliveries.
+    
+    Channels render it once per notification (an email body, a push payload,
+    a Discord embed) with ``rendered`` instead of once per recipient.
+    """
+    
+    def __init__(self, title, message, notification_type='info', html_message=None, site_name=None, topic=None):
+        self.title = title
+        self.message = message
+        self.notification_type = notification_type
+        self.html_message = html_message
+        self.site_name = site_name
+        self.topic = topic
+        self._rendered = {}
+    
+    def rendered(self, key, render):
+        """Return render(self), computed once per key (called on the engine loop only)."""
+        if key not in self._rendered:
+            self._rendered[key] = render(self)
+        return self._rendered[key]
+
+
+class Delivery:
+    """One notification to one channel recipient."""
+    
+    def __init__(self, channel, recipient, content, subscription_id=None):
+        self.channel = channel  # Channel name
+        self.recipient = recipient  # Email address, subscription info, Discord user ID or URL
+        self.content = content  # NotificationContent
+        self.subscription_id = subscription_id  # WebPushSubscription to mark as used
+        self.result = None  # True/False once sent, or the exception raised
+
+
+class Channel:
+    """
+    Base class for notification channels.
+    
+    Subclasses set ``name`` (also the preference key that enables them),
+    implement ``deliveries_for`` and ``deliver``, and may override
+    ``send_many_async`` to batch.
+    """
+    
+    name = None
+    
+    @classmethod
+    def deliveries_for(cls, user, prefs, content):
+        """
+        Deliveries for a user who has this channel enabled.
+        
+        Args:
+            user: User model instance
+            prefs: Effective preferences (see NotificationService.get_user_preferences)
+            content: NotificationContent
+            
+        Returns:
+            list: Delivery objects (empty if the user has nowhere to send to)
+        """
+        raise NotImplementedError
+    
+    @classmethod
+    async def deliver(cls, app, delivery):
+        """Send one delivery; returns True if it was sent."""
+        raise NotImplementedError
+    
+    @classmethod
+    async def send_many_async(cls, app, deliveries):
+        """
+        Send a batch of deliveries.
+        
+        Args:
+            app: Flask application (for configuration and logging)
+            deliveries: Delivery objects for this channel
+            
+        Returns:
+            list: Results in order, True/False or the exception raised
+        """
+        return await asyncio.gather(*(
+            observe_delivery(cls.name, cls.deliver(app, delivery)) for delivery in deliveries
+        ), return_exceptions=True)
+    
+    @classmethod
+    def send_many(cls, deliveries):
+        """Send a batch of deliveries (blocking wrapper around send_many_async)."""
+        app = current_app._get_current_object()
+        return engine.run(app, cls.send_many_async(app, deliveries))
+
+
+# Registered channels by name, in dispatch order
+CHANNELS = {}
+
+
+def register_channel(cls):
+    """Class decorator adding a Channel subclass to CHANNELS."""
+    CHANNELS[cls.name] = cls
+    return cls
+
+
+def deliver_all(app, deliveries):
+    """
+    Send deliveries of any channels, each channel's share in one send_many batch.
+    
+    All channels' batches run concurrently on the delivery engine. Each
+    delivery's ``result`` is set to its outcome.
+    
+    Args:
+        app: Flask application
+        deliveries: Delivery objects
+    """
+    groups = {}
+    for delivery in deliveries:
+        groups.setdefault(delivery.channel, []).append(delivery)
+    if not groups:
+        return
+    
+    async def send_groups():
+        return await asyncio.gather(*(
+            CHANNELS[name].send_many_async(app, group) for name, group in groups.items()
+        ), return_exceptions=True)
+    
+    for group, results in zip(groups.values(), engine.run(app, send_groups())):
+        if isinstance(results, Exception):
+            results = [results] * len(group)
+        for delivery, result in zip(group, results):
+            delivery.result = result
 
 
-class EmailChannel:
+@register_channel
+class EmailChannel(Channel):
     """Email notification handler."""
     
+    name = 'email'
+    
+    @classmethod
+    def deliveries_for(cls, user, prefs, content):
+        return [Delivery(cls.name, user.email, content)] if user.email else []
+    
     @staticmethod
     def send(recipient_email, title, message, notification_type='info', html_message=None):
+        """Send an email notification (blocking wrapper around send_async)."""
+        app = current_app._get_current_object()
+        return engine.run(app, EmailChannel.send_async(
+            app, recipient_email, title, message, notification_type, html_message
+        ))
+    
+    @staticmethod
+    async def send_async(app, recipient_email, title, message, notification_type='info', html_message=None):
         """
         Send an email notification.
         
         Args:
+            app: Flask application (for configuration and logging)
             recipient_email: Recipient's email address
             title: Email subject
             message: Plain text email body (fallback)
@@ -27,44 +189,99 @@ class EmailChannel:
         Returns:
             bool: True if sent successfully, False otherwise
         """
-        if not current_app.config['SMTP_USERNAME'] or not current_app.config['SMTP_PASSWORD']:
-            current_app.logger.warning("SMTP not configured, skipping email")
-            return False
+        content = NotificationContent(title, message, notification_type, html_message=html_message)
+        return await EmailChannel.deliver(app, Delivery(EmailChannel.name, recipient_email, content))
+    
+    @classmethod
+    async def deliver(cls, app, delivery):
+        return (await cls.send_many_async(app, [delivery]))[0]
+    
+    @classmethod
+    async def send_many_async(cls, app, deliveries):
+        """
+        Send emails over as few SMTP sessions as possible.
         
-        try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = title
-            msg['From'] = f"{current_app.config['SMTP_FROM_NAME']} <{current_app.config['SMTP_FROM_EMAIL']}>"
-            msg['To'] = recipient_email
-            
-            # Plain text version (always include as fallback)
-            text_body = f"{title}\n\n{message}"
-            msg.attach(MIMEText(text_body, 'plain'))
-            
-            # HTML version
-            if html_message:
-                # Use custom HTML if provided
-                html_body = EmailChannel._wrap_custom_html(html_message, title, notification_type)
-            else:
-                # Use default branded template
-                html_body = EmailChannel._create_default_html(title, message, notification_type)
-            
-            msg.attach(MIMEText(html_body, 'html'))
-            
-            # Send email
-            with smtplib.SMTP(current_app.config['SMTP_HOST'], current_app.config['SMTP_PORT']) as server:
-                if current_app.config['SMTP_USE_TLS']:
-                    server.starttls()
-                server.login(current_app.config['SMTP_USERNAME'], current_app.config['SMTP_PASSWORD'])
-                server.send_message(msg)
-            
-            current_app.logger.info(f"Email sent to {recipient_email}")
-            return True
+        Deliveries are split into batches of SMTP_BATCH_SIZE; each batch
+        connects and logs in once, and the batches run concurrently.
+        """
+        config = app.config
+        if not config['SMTP_USERNAME'] or not config['SMTP_PASSWORD']:
+            app.logger.warning("SMTP not configured, skipping email")
+            return [False] * len(deliveries)
+        
+        size = max(1, config['SMTP_BATCH_SIZE'])
+        batches = await asyncio.gather(*(
+            cls._send_session(app, deliveries[i:i + size]) for i in range(0, len(deliveries), size)
+        ))
+        return [result for batch in batches for result in batch]
+    
+    @classmethod
+    async def _send_session(cls, app, deliveries):
+        """Send deliveries over one SMTP connection; returns a result per delivery."""
+        config = app.config
+        started = time.monotonic()
+        results = []
+        
+        async with engine.slots:
+            smtp = aiosmtplib.SMTP(
+                hostname=config['SMTP_HOST'],
+                port=config['SMTP_PORT'],
+                username=config['SMTP_USERNAME'],
+                password=config['SMTP_PASSWORD'],
+                start_tls=bool(config['SMTP_USE_TLS']),
+                timeout=config['CHANNEL_TIMEOUT_SECONDS']
+            )
+            try:
+                await smtp.connect()
+            except Exception as e:
+                app.logger.error(f"Failed to send email: {str(e)}")
+                for _ in deliveries:
+                    record_delivery(cls.name, 'failed', time.monotonic() - started)
+                return [False] * len(deliveries)
             
-        except Exception as e:
-            current_app.logger.error(f"Failed to send email: {str(e)}")
-            return False
+            try:
+                for delivery in deliveries:
+                    try:
+                        await smtp.send_message(cls._build_message(config, delivery))
+                        app.logger.info(f"Email sent to {delivery.recipient}")
+                        results.append(True)
+                    except Exception as e:
+                        app.logger.error(f"Failed to send email: {str(e)}")
+                        results.append(False)
+                    record_delivery(cls.name, 'sent' if results[-1] else 'failed', time.monotonic() - started)
+            finally:
+                try:
+                    await smtp.quit()
+                except Exception:
+                    smtp.close()
+        
+        return results
+    
+    @staticmethod
+    def _build_message(config, delivery):
+        """MIME message for one recipient; the bodies are rendered once per notification."""
+        content = delivery.content
+        
+        # Create message
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = content.title
+        msg['From'] = f"{config['SMTP_FROM_NAME']} <{config['SMTP_FROM_EMAIL']}>"
+        msg['To'] = delivery.recipient
+        
+        # Plain text version (always include as fallback)
+        msg.attach(MIMEText(content.rendered('email_text', lambda c: f"{c.title}\n\n{c.message}"), 'plain'))
+        
+        # HTML version
+        msg.attach(MIMEText(content.rendered('email_html', EmailChannel._render_html), 'html'))
+        return msg
+    
+    @staticmethod
+    def _render_html(content):
+        if content.html_message:
+            # Use custom HTML if provided
+            return EmailChannel._wrap_custom_html(content.html_message, content.title, content.notification_type)
+        # Use default branded template
+        return EmailChannel._create_default_html(content.title, content.message, content.notification_type)
     
     @staticmethod
     def _create_default_html(title, message, notification_type):
@@ -192,65 +409,226 @@ class EmailChannel:
         """
 
 
-class WebPushChannel:
+@register_channel
+class WebPushChannel(Channel):
     """Web Push notification handler."""
     
+    name = 'web_push'
+    
+    @classmethod
+    def deliveries_for(cls, user, prefs, content):
+        return [
+            Delivery(cls.name, subscription.to_dict(), content, subscription_id=subscription.id)
+            for subscription in WebPushSubscription.query.filter_by(user_id=user.id).all()
+        ]
+    
     @staticmethod
-    def send(subscription_info, title, message, notification_type='info'):
+    def topic_for(site_key, collapse_key):
+        """
+        Build a web push Topic for a collapse key.
+        
+        Push services keep only the latest undelivered message per Topic. Topics
+        are limited to 32 URL-safe base64 characters, so the key is hashed.
+        
+        Args:
+            site_key: Public site ID
+            collapse_key: Site-defined collapse key
+            
+        Returns:
+            str: Topic header value
+        """
+        digest = hashlib.sha256(f'{site_key}:{collapse_key}'.encode('utf-8')).digest()
+        return base64.urlsafe_b64encode(digest).decode('ascii').rstrip('=')[:32]
+    
+    @staticmethod
+    def send(subscription_info, title, message, notification_type='info', topic=None):
+        """Send a web push notification (blocking wrapper around send_async)."""
+        app = current_app._get_current_object()
+        return engine.run(app, WebPushChannel.send_async(
+            app, subscription_info, title, message, notification_type, topic
+        ))
+    
+    @staticmethod
+    async def send_async(app, subscription_info, title, message, notification_type='info', topic=None):
         """
         Send a web push notification.
         
         Args:
+            app: Flask application (for configuration and logging)
             subscription_info: Web push subscription object (dict with endpoint, keys)
             title: Notification title
             message: Notification body
             notification_type: Type of notification
+            topic: Optional Topic; replaces an undelivered push with the same topic
             
         Returns:
             bool: True if sent successfully, False otherwise
         """
-        if not current_app.config['VAPID_PRIVATE_KEY'] or not current_app.config['VAPID_PUBLIC_KEY']:
-            current_app.logger.warning("VAPID keys not configured, skipping web push")
+        content = NotificationContent(title, message, notification_type, topic=topic)
+        return await WebPushChannel.deliver(app, Delivery(WebPushChannel.name, subscription_info, content))
+    
+    @staticmethod
+    def _render_payload(content):
+        payload = {
+            'title': content.title,
+            'body': content.message,
+            'type': content.notification_type,
+            'icon': '/icon-192x192.png',
+            'badge': '/badge-96x96.png'
+        }
+        if content.topic:
+            # Lets the service worker replace a displayed notification too
+            payload['tag'] = content.topic
+        return json.dumps(payload)
+    
+    @classmethod
+    async def deliver(cls, app, delivery):
+        """
+        Encrypt the shared payload for one subscription and post it.
+        
+        The payload is encrypted with pywebpush in the loop's default executor,
+        since the ECDH and AES work would otherwise stall every other delivery
+        on the engine loop, and posted through the engine's pooled HTTP client.
+        """
+        config = app.config
+        if not config['VAPID_PRIVATE_KEY'] or not config['VAPID_PUBLIC_KEY']:
+            app.logger.warning("VAPID keys not configured, skipping web push")
             return False
         
         try:
-            payload = json.dumps({
-                'title': title,
-                'body': message,
-                'type': notification_type,
-                'icon': '/icon-192x192.png',
-                'badge': '/badge-96x96.png'
-            })
+            subscription_info = delivery.recipient
+            topic = delivery.content.topic
+            payload = delivery.content.rendered(cls.name, cls._render_payload)
             
-            webpush(
-                subscription_info=subscription_info,
-                data=payload,
-                vapid_private_key=current_app.config['VAPID_PRIVATE_KEY'],
-                vapid_claims={
-                    "sub": current_app.config['VAPID_SUBJECT']
-                }
+            endpoint = subscription_info['endpoint']
+            encoded = await asyncio.get_running_loop().run_in_executor(
+                None, WebPusher(subscription_info).encode, payload, 'aes128gcm'
             )
             
-            current_app.logger.info(f"Web push sent to {subscription_info['endpoint'][:50]}...")
+            endpoint_url = urlparse(endpoint)
+            headers = {
+                'content-encoding': 'aes128gcm',
+                'ttl': '0'
+            }
+            headers.update(engine.vapid_headers(config['VAPID_PRIVATE_KEY'], {
+                'sub': config['VAPID_SUBJECT'],
+                'aud': f"{endpoint_url.scheme}://{endpoint_url.netloc}"
+            }))
+            if topic:
+                headers['Topic'] = topic
+            
+            async with engine.slots:
+                response = await engine.client.post(endpoint, content=encoded['body'], headers=headers)
+            
+            if response.status_code > 202:
+                app.logger.error(f"Failed to send web push: Push failed: {response.status_code} {response.text}")
+                return False
+            
+            app.logger.info(f"Web push sent to {endpoint[:50]}...")
             return True
             
-        except WebPushException as e:
-            current_app.logger.error(f"Failed to send web push: {str(e)}")
+        except httpx.HTTPError as e:
+            app.logger.error(f"Failed to send web push: {str(e)}")
             return False
         except Exception as e:
-            current_app.logger.error(f"Web push error: {str(e)}")
+            app.logger.error(f"Web push error: {str(e)}")
             return False
 
 
-class DiscordChannel:
+class DiscordRateLimiter:
+    """
+    Per-process scheduler for Discord API requests.
+    
+    Every Discord request waits here first. Requests are spaced to stay under
+    DISCORD_GLOBAL_RATE_LIMIT per second; a route whose bucket was reported
+    empty (X-RateLimit-Remaining: 0) waits for X-RateLimit-Reset-After; and a
+    429 pauses its route, or every route for a global limit, for retry_after.
+    Only used from the delivery engine's loop, so it needs no locking.
+    """
+    
+    MAX_ROUTES = 10000
+    
+    def __init__(self):
+        self._routes = {}  # route -> (remaining requests or None, reset time)
+        self._blocked_until = 0
+        self._next_start = 0
+    
+    async def wait(self, app, route):
+        """Wait until a request on route may be sent."""
+        while True:
+            now = time.monotonic()
+            remaining, reset_at = self._routes.get(route, (None, 0))
+            if reset_at <= now:
+                remaining = None
+            delay = max(self._blocked_until - now, reset_at - now if remaining == 0 else 0)
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        
+        if remaining is not None:
+            self._routes[route] = (remaining - 1, reset_at)
+        
+        rate = app.config['DISCORD_GLOBAL_RATE_LIMIT']
+        if rate:
+            start = max(now, self._next_start)
+            self._next_start = start + 1 / rate
+            if start > now:
+                await asyncio.sleep(start - now)
+    
+    def update(self, route, response):
+        """Record the rate limit state reported by a response."""
+        now = time.monotonic()
+        headers = response.headers
+        
+        if response.status_code == 429:
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            retry_after = float(body.get('retry_after') or headers.get('Retry-After') or 1)
+            if body.get('global') or headers.get('X-RateLimit-Global') == 'true':
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+            else:
+                self._routes[route] = (0, now + retry_after)
+            return
+        
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset_after = headers.get('X-RateLimit-Reset-After')
+        if remaining is not None and reset_after is not None:
+            if len(self._routes) >= self.MAX_ROUTES:
+                self._routes = {key: state for key, state in self._routes.items() if state[1] > now}
+            self._routes[route] = (int(remaining), now + float(reset_after))
+
+
+@register_channel
+class DiscordChannel(Channel):
     """Discord notification handler."""
     
+    name = 'discord'
+    
+    ratelimits = DiscordRateLimiter()
+    
+    # Discord user ID -> DM channel ID (a bot's DM channel with a user doesn't change)
+    _dm_channels = {}
+    DM_CHANNEL_CACHE_SIZE = 10000
+    
+    @classmethod
+    def deliveries_for(cls, user, prefs, content):
+        return [Delivery(cls.name, prefs['discord_user_id'], content)] if prefs.get('discord_user_id') else []
+    
     @staticmethod
     def send_dm(user_id, title, message, notification_type='info'):
+        """Send a Discord DM notification (blocking wrapper around send_dm_async)."""
+        app = current_app._get_current_object()
+        return engine.run(app, DiscordChannel.send_dm_async(app, user_id, title, message, notification_type))
+    
+    @staticmethod
+    async def send_dm_async(app, user_id, title, message, notification_type='info'):
         """
         Send a Discord DM notification.
         
         Args:
+            app: Flask application (for configuration and logging)
             user_id: Discord user ID
             title: Notification title
             message: Notification message
@@ -259,84 +637,112 @@ class DiscordChannel:
         Returns:
             bool: True if sent successfully, False otherwise
         """
-        if not current_app.config['DISCORD_BOT_TOKEN']:
-            current_app.logger.warning("Discord bot token not configured, skipping Discord DM")
+        content = NotificationContent(title, message, notification_type)
+        return await DiscordChannel.deliver(app, Delivery(DiscordChannel.name, user_id, content))
+    
+    @staticmethod
+    def _render_embed(content):
+        # Type-specific colors and emojis
+        type_config = {
+            'info': {'color': 0x2EE9FF, 'emoji': 'ℹ️'},
+            'success': {'color': 0x00C853, 'emoji': '✅'},
+            'warning': {'color': 0xFFA726, 'emoji': '⚠️'},
+            'error': {'color': 0xEF5350, 'emoji': '❌'}
+        }
+        config = type_config.get(content.notification_type, type_config['info'])
+        
+        return {
+            'title': f"{config['emoji']} {content.title}",
+            'description': content.message,
+            'color': config['color'],
+            'footer': {
+                'text': 'Nolofication - Manage preferences at nolofication.bynolo.ca'
+            },
+            'timestamp': None  # Discord will use current time
+        }
+    
+    @classmethod
+    async def _post(cls, app, route, path, payload):
+        """POST to the Discord API through the rate limiter, retrying after 429s."""
+        headers = {
+            'Authorization': f"Bot {app.config['DISCORD_BOT_TOKEN']}",
+            'Content-Type': 'application/json'
+        }
+        for _ in range(app.config['DISCORD_RATE_LIMIT_RETRIES'] + 1):
+            await cls.ratelimits.wait(app, route)
+            async with engine.slots:
+                response = await engine.client.post(
+                    f"{app.config['DISCORD_API_BASE_URL']}{path}", headers=headers, json=payload
+                )
+            cls.ratelimits.update(route, response)
+            if response.status_code != 429:
+                break
+        return response
+    
+    @classmethod
+    async def deliver(cls, app, delivery):
+        if not app.config['DISCORD_BOT_TOKEN']:
+            app.logger.warning("Discord bot token not configured, skipping Discord DM")
             return False
         
+        user_id = delivery.recipient
         if not user_id:
-            current_app.logger.warning("No Discord user ID provided")
+            app.logger.warning("No Discord user ID provided")
             return False
         
         try:
-            # Discord API headers
-            headers = {
-                'Authorization': f"Bot {current_app.config['DISCORD_BOT_TOKEN']}",
-                'Content-Type': 'application/json'
-            }
+            embed = delivery.content.rendered(cls.name, cls._render_embed)
             
-            # Step 1: Create a DM channel with the user
-            dm_response = requests.post(
-                'https://discord.com/api/v10/users/@me/channels',
-                headers=headers,
-                json={'recipient_id': str(user_id)},
-                timeout=10
-            )
-            
-            if dm_response.status_code != 200:
-                current_app.logger.error(f"Failed to create DM channel: {dm_response.status_code} - {dm_response.text}")
-                return False
-            
-            dm_channel = dm_response.json()
-            channel_id = dm_channel['id']
+            # Step 1: Create (or reuse) a DM channel with the user
+            channel_id = cls._dm_channels.get(str(user_id))
+            if channel_id is None:
+                dm_response = await cls._post(
+                    app, 'dm_channels', '/users/@me/channels', {'recipient_id': str(user_id)}
+                )
+                
+                if dm_response.status_code != 200:
+                    app.logger.error(f"Failed to create DM channel: {dm_response.status_code} - {dm_response.text}")
+                    return False
+                
+                channel_id = dm_response.json()['id']
+                if len(cls._dm_channels) >= cls.DM_CHANNEL_CACHE_SIZE:
+                    cls._dm_channels.clear()
+                cls._dm_channels[str(user_id)] = channel_id
             
             # Step 2: Send the message
-            # Type-specific colors and emojis
-            type_config = {
-                'info': {'color': 0x2EE9FF, 'emoji': 'ℹ️'},
-                'success': {'color': 0x00C853, 'emoji': '✅'},
-                'warning': {'color': 0xFFA726, 'emoji': '⚠️'},
-                'error': {'color': 0xEF5350, 'emoji': '❌'}
-            }
-            config = type_config.get(notification_type, type_config['info'])
-            
-            # Create embed
-            embed = {
-                'title': f"{config['emoji']} {title}",
-                'description': message,
-                'color': config['color'],
-                'footer': {
-                    'text': 'Nolofication - Manage preferences at nolofication.bynolo.ca'
-                },
-                'timestamp': None  # Discord will use current time
-            }
-            
-            message_response = requests.post(
-                f'https://discord.com/api/v10/channels/{channel_id}/messages',
-                headers=headers,
-                json={'embeds': [embed]},
-                timeout=10
+            message_response = await cls._post(
+                app, f'messages:{channel_id}', f'/channels/{channel_id}/messages', {'embeds': [embed]}
             )
             
             if message_response.status_code not in [200, 201]:
-                current_app.logger.error(f"Failed to send Discord message: {message_response.status_code} - {message_response.text}")
+                if message_response.status_code == 404:
+                    cls._dm_channels.pop(str(user_id), None)
+                app.logger.error(f"Failed to send Discord message: {message_response.status_code} - {message_response.text}")
                 return False
             
-            current_app.logger.info(f"Discord DM sent to user {user_id}")
+            app.logger.info(f"Discord DM sent to user {user_id}")
             return True
             
-        except requests.RequestException as e:
-            current_app.logger.error(f"Discord API request failed: {str(e)}")
+        except httpx.HTTPError as e:
+            app.logger.error(f"Discord API request failed: {str(e)}")
             return False
         except Exception as e:
-            current_app.logger.error(f"Failed to send Discord DM: {str(e)}")
+            app.logger.error(f"Failed to send Discord DM: {str(e)}")
             return False
     
     @staticmethod
     def send_webhook(webhook_url, title, message, notification_type='info'):
+        """Send a Discord webhook notification (blocking wrapper around send_webhook_async)."""
+        app = current_app._get_current_object()
+        return engine.run(app, DiscordChannel.send_webhook_async(app, webhook_url, title, message, notification_type))
+    
+    @staticmethod
+    async def send_webhook_async(app, webhook_url, title, message, notification_type='info'):
         """
         Send a Discord webhook notification.
         
         Args:
+            app: Flask application (for configuration and logging)
             webhook_url: Discord webhook URL
             title: Notification title
             message: Notification message
@@ -354,40 +760,54 @@ class DiscordChannel:
                 'error': 0xEF5350       # Red
             }
             
-            webhook = DiscordWebhook(url=webhook_url)
-            
-            embed = DiscordEmbed(
-                title=title,
-                description=message,
-                color=color_map.get(notification_type, 0x2EE9FF)
-            )
-            embed.set_footer(text='Nolofication')
-            embed.set_timestamp()
+            embed = {
+                'title': title,
+                'description': message,
+                'color': color_map.get(notification_type, 0x2EE9FF),
+                'footer': {'text': 'Nolofication'},
+                'timestamp': datetime.utcnow().isoformat() + 'Z'
+            }
             
-            webhook.add_embed(embed)
-            response = webhook.execute()
+            async with engine.slots:
+                response = await engine.client.post(webhook_url, json={'embeds': [embed]})
             
             if response.status_code in [200, 204]:
-                current_app.logger.info(f"Discord webhook sent successfully")
+                app.logger.info(f"Discord webhook sent successfully")
                 return True
             else:
-                current_app.logger.error(f"Discord webhook failed: {response.status_code}")
+                app.logger.error(f"Discord webhook failed: {response.status_code}")
                 return False
             
         except Exception as e:
-            current_app.logger.error(f"Failed to send Discord webhook: {str(e)}")
+            app.logger.error(f"Failed to send Discord webhook: {str(e)}")
             return False
 
 
-class WebhookChannel:
+@register_channel
+class WebhookChannel(Channel):
     """Generic webhook notification handler."""
     
+    name = 'webhook'
+    
+    @classmethod
+    def deliveries_for(cls, user, prefs, content):
+        return [Delivery(cls.name, prefs['webhook_url'], content)] if prefs.get('webhook_url') else []
+    
     @staticmethod
     def send(webhook_url, title, message, notification_type='info', site_name=None):
+        """Send a generic webhook notification (blocking wrapper around send_async)."""
+        app = current_app._get_current_object()
+        return engine.run(app, WebhookChannel.send_async(
+            app, webhook_url, title, message, notification_type, site_name
+        ))
+    
+    @staticmethod
+    async def send_async(app, webhook_url, title, message, notification_type='info', site_name=None):
         """
         Send a generic webhook notification.
         
         Args:
+            app: Flask application (for configuration and logging)
             webhook_url: Webhook URL
             title: Notification title
             message: Notification message
@@ -397,29 +817,39 @@ class WebhookChannel:
         Returns:
             bool: True if sent successfully, False otherwise
         """
+        content = NotificationContent(title, message, notification_type, site_name=site_name)
+        return await WebhookChannel.deliver(app, Delivery(WebhookChannel.name, webhook_url, content))
+    
+    @staticmethod
+    def _render_payload(content):
+        return json.dumps({
+            'title': content.title,
+            'message': content.message,
+            'type': content.notification_type,
+            'site': content.site_name,
+            'timestamp': None  # Will be set by server
+        })
+    
+    @classmethod
+    async def deliver(cls, app, delivery):
+        webhook_url = delivery.recipient
         try:
-            payload = {
-                'title': title,
-                'message': message,
-                'type': notification_type,
-                'site': site_name,
-                'timestamp': None  # Will be set by server
-            }
+            payload = delivery.content.rendered(cls.name, cls._render_payload)
             
-            response = requests.post(
-                webhook_url,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=10
-            )
+            async with engine.slots:
+                response = await engine.client.post(
+                    webhook_url,
+                    content=payload,
+                    headers={'Content-Type': 'application/json'}
+                )
             
             if response.status_code in [200, 201, 202, 204]:
-                current_app.logger.info(f"Webhook sent to {webhook_url[:50]}...")
+                app.logger.info(f"Webhook sent to {webhook_url[:50]}...")
                 return True
             else:
-                current_app.logger.error(f"Webhook failed: {response.status_code}")
+                app.logger.error(f"Webhook failed: {response.status_code}")
                 return False
             
-        except requests.RequestException as e:
-            current_app.logger.error(f"Failed to send webhook: {str(e)}")
+        except httpx.HTTPError as e:
+            app.logger.error(f"Failed to send webhook: {str(e)}")
             return False
@@ -0,0 +1,128 @@
+"""Asyncio delivery engine for notification channels.
+
+Each process runs a single event loop in a background thread. Channel
+coroutines (see ``app/services/channels.py``) are scheduled onto it from any
+request, lane or scheduler thread, so thousands of deliveries can be in
+flight at once while sharing one pooled HTTP client. The loop and client are
+created lazily and recreated after a fork, so gunicorn workers each get
+their own.
+"""
+import asyncio
+import os
+import threading
+import time
+import httpx
+from py_vapid import Vapid
+
+
+class DeliveryEngine:
+    """Owns the per-process event loop, HTTP connection pool and VAPID signer."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._client = None
+        self._semaphore = None
+        self._vapid = {}  # private key -> Vapid signer
+        self._vapid_headers = {}  # (private key, audience) -> (expires, headers)
+
+    def _ensure_started(self, app):
+        """Start the loop thread for this process if it is not running."""
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, daemon=True, name='delivery-engine')
+            thread.start()
+            asyncio.run_coroutine_threadsafe(self._setup(app), loop).result()
+            self._loop = loop
+            self._pid = os.getpid()
+            return loop
+
+    async def _setup(self, app):
+        """Create loop-bound resources."""
+        max_connections = app.config['DELIVERY_HTTP_MAX_CONNECTIONS']
+        self._client = httpx.AsyncClient(
+            timeout=app.config['CHANNEL_TIMEOUT_SECONDS'],
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self._semaphore = asyncio.Semaphore(app.config['DELIVERY_MAX_IN_FLIGHT'])
+        self._vapid_headers = {}
+
+    @property
+    def client(self):
+        """Pooled HTTP client (only use from coroutines running on the engine)."""
+        return self._client
+
+    @property
+    def slots(self):
+        """Semaphore bounding in-flight deliveries."""
+        return self._semaphore
+
+    def vapid_headers(self, private_key, claims):
+        """
+        VAPID Authorization headers for a push service, reusing signatures.
+
+        A signed token is valid for every subscription on the same push
+        service until it expires, so one is kept per audience and renewed an
+        hour before its expiry.
+
+        Args:
+            private_key: VAPID private key
+            claims: Claims including 'sub' and 'aud' (the push service origin)
+
+        Returns:
+            dict: Headers to add to the push request
+        """
+        now = int(time.time())
+        cache_key = (private_key, claims['aud'])
+        cached = self._vapid_headers.get(cache_key)
+        if cached and cached[0] - now > 3600:
+            return cached[1]
+
+        signer = self._vapid.get(private_key)
+        if signer is None:
+            signer = self._vapid[private_key] = Vapid.from_string(private_key=private_key)
+
+        expires = now + 12 * 60 * 60
+        headers = signer.sign(dict(claims, exp=expires))
+        self._vapid_headers[cache_key] = (expires, headers)
+        return headers
+
+    def run(self, app, coroutine):
+        """
+        Run a channel coroutine on the engine and wait for its result.
+
+        Args:
+            app: Flask application (for configuration)
+            coroutine: Coroutine to run
+
+        Returns:
+            The coroutine's result
+        """
+        loop = self._ensure_started(app)
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    def run_all(self, app, coroutines):
+        """
+        Run channel coroutines concurrently and wait for all of them.
+
+        Args:
+            app: Flask application (for configuration)
+            coroutines: Coroutines to run
+
+        Returns:
+            list: Results in order; exceptions are returned, not raised
+        """
+        if not coroutines:
+            return []
+
+        async def gather():
+            return await asyncio.gather(*coroutines, return_exceptions=True)
+
+        return self.run(app, gather())
+
+
+engine = DeliveryEngine()
@@ -0,0 +1,92 @@
+"""Priority lanes for notification dispatch.
+
+Each process runs one thread pool per lane, so bulk traffic can only occupy
+the bulk lane's threads (and their database connections and outbound
+channel connections) while urgent notifications keep capacity of their own.
+Tasks receive plain IDs rather than ORM objects and run inside their own
+application context, since sessions are not shared between threads; their
+queries count towards the submitting request's query stats (and profile, if
+it is being profiled).
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app.utils import profiling, query_stats
+
+
+LANES = ('high', 'normal', 'bulk')
+
+
+def priority_for(notification_type, requested=None, bulk=False):
+    """
+    Choose the lane for a send.
+
+    Args:
+        notification_type: Notification type ('error' is treated as urgent)
+        requested: Explicit priority from the request, if any
+        bulk: Whether the send targets many recipients
+
+    Returns:
+        str: Lane name
+    """
+    if requested in LANES:
+        return requested
+    if notification_type == 'error':
+        return 'high'
+    return 'bulk' if bulk else 'normal'
+
+
+class DispatchLanes:
+    """Per-lane thread pools, created lazily in each (forked) worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executors = {}
+
+    def _executor(self, app, lane):
+        with self._lock:
+            executor = self._executors.get(lane)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=app.config[f'DISPATCH_{lane.upper()}_WORKERS'],
+                    thread_name_prefix=f'dispatch-{lane}'
+                )
+                self._executors[lane] = executor
+            return executor
+
+    def submit(self, lane, fn, *args, **kwargs):
+        """
+        Run fn in a lane with an application context.
+
+        Args:
+            lane: Lane name (see LANES)
+            fn: Callable to run
+            *args, **kwargs: Arguments for fn
+
+        Returns:
+            Future: Resolves to fn's result
+        """
+        app = current_app._get_current_object()
+        stats = query_stats.current()
+        profile = profiling.current()
+        queued_at = time.monotonic()
+
+        def run():
+            started_at = time.monotonic()
+            with app.app_context(), query_stats.attach(stats), profiling.attach(profile):
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    target = app.config['DISPATCH_LATENCY_TARGETS'].get(lane)
+                    elapsed = time.monotonic() - queued_at
+                    if target and elapsed > target:
+                        app.logger.warning(
+                            f"Dispatch lane '{lane}' missed its {target}s latency target: "
+                            f"{elapsed:.2f}s ({started_at - queued_at:.2f}s queued)"
+                        )
+
+        return self._executor(app, lane).submit(run)
+
+
+lanes = DispatchLanes()
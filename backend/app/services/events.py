@@ -0,0 +1,169 @@
+"""In-process pub/sub for live notification streams (Server-Sent Events).
+
+Each web worker process keeps one broker. Notifications logged in the same
+process are published directly from NotificationService; notifications logged
+by other processes (other gunicorn workers, the scheduler) are picked up by a
+single bridge thread per process that polls the notifications table while at
+least one stream is connected.
+
+The bridge polls by created_at rather than ID: on Postgres, IDs are handed out
+before commit, so a row with a lower ID can become visible after a higher one
+and an ID watermark would skip it. Each poll re-reads the last
+SSE_BRIDGE_OVERLAP_SECONDS to catch late commits, and notifications already
+published are skipped by ID. Each subscription also drops events it has
+already delivered, so a notification seen through both paths is sent once.
+"""
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from app import db
+from app.models import Notification
+from app.utils.serializers import notification_rows, serialize_notification
+
+
+class Subscription:
+    """A single connected stream for one user."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.events = queue.Queue(maxsize=100)
+        self._delivered = set()
+        self._delivered_order = deque(maxlen=500)
+
+    def deliver(self, event):
+        """Queue an event unless it was already delivered (or the client is too far behind)."""
+        if event['id'] in self._delivered:
+            return
+        if len(self._delivered_order) == self._delivered_order.maxlen:
+            self._delivered.discard(self._delivered_order[0])
+        self._delivered_order.append(event['id'])
+        self._delivered.add(event['id'])
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            # Slow client: drop the event; it can recover via Last-Event-ID
+            pass
+
+
+class NotificationBroker:
+    """Fans out newly logged notifications to connected streams in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}  # user_id -> set of Subscription
+        self._count = 0
+        self._bridge = None
+        self._app = None
+        self._polled_at = None
+        self._published = OrderedDict()  # notification ID -> created_at, within the overlap window
+
+    def has_subscribers(self, user_id):
+        """Cheap check used by publishers to skip serialization when nobody listens."""
+        return bool(self._subscriptions.get(user_id))
+
+    def subscribe(self, app, user_id, limit=None):
+        """
+        Register a stream for a user and make sure the bridge is running.
+
+        Args:
+            app: Flask application (used by the bridge thread)
+            user_id: Internal user ID
+            limit: Optional maximum number of streams in this process
+
+        Returns:
+            Subscription, or None if the process already has limit streams
+        """
+        subscription = Subscription(user_id)
+        with self._lock:
+            if limit is not None and self._count >= limit:
+                return None
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+            self._count += 1
+            if self._bridge is None or not self._bridge.is_alive():
+                self._app = app
+                self._bridge = threading.Thread(target=self._run_bridge, daemon=True,
+                                                name='notification-stream-bridge')
+                self._bridge.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a stream once the client disconnects (safe to call twice)."""
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions and subscription in subscriptions:
+                subscriptions.discard(subscription)
+                self._count -= 1
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id, event):
+        """
+        Deliver a serialized notification to a user's streams in this process.
+
+        Args:
+            user_id: Internal user ID
+            event: Serialized notification (must include 'id')
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    def _run_bridge(self):
+        """Poll for notifications logged by other processes while streams are connected."""
+        app = self._app
+        interval = app.config['SSE_BRIDGE_POLL_SECONDS']
+
+        with app.app_context():
+            while True:
+                with self._lock:
+                    user_ids = list(self._subscriptions)
+                if not user_ids:
+                    # Exit when idle; the next subscriber restarts the bridge
+                    with self._lock:
+                        if not self._subscriptions:
+                            self._bridge = None
+                            self._polled_at = None
+                            self._published.clear()
+                            return
+                    continue
+
+                try:
+                    self._poll(user_ids)
+                except Exception as e:
+                    app.logger.error(f"Notification stream bridge error: {e}")
+                finally:
+                    db.session.remove()
+
+                time.sleep(interval)
+
+    def _poll(self, user_ids):
+        """Publish notifications created since the last poll (less the overlap) for connected users."""
+        started = datetime.utcnow()
+        overlap = timedelta(seconds=self._app.config['SSE_BRIDGE_OVERLAP_SECONDS'])
+
+        if self._polled_at is None:
+            # Streams replay their own backlog; start from now
+            self._polled_at = started
+            return
+
+        since = self._polled_at - overlap
+        rows = notification_rows(Notification.query.filter(
+            Notification.created_at >= since,
+            Notification.user_id.in_(user_ids)
+        )).add_columns(Notification.user_id).order_by(Notification.created_at, Notification.id).all()
+        self._polled_at = started
+
+        while self._published and next(iter(self._published.values())) < since:
+            self._published.popitem(last=False)
+
+        for row in rows:
+            if row.id in self._published:
+                continue
+            self._published[row.id] = row.created_at
+            self.publish(row.user_id, serialize_notification(row))
+
+
+broker = NotificationBroker()
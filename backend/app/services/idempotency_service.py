@@ -0,0 +1,210 @@
+"""Idempotency-Key support for site requests.
+
+The first request with a given key (per site) inserts a placeholder row,
+runs, and stores its response; repeats within IDEMPOTENCY_TTL_SECONDS get
+the stored response back without running the view again. Completed
+responses never change, so each process also keeps them in a small LRU
+cache and answers most retries without touching the database.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, make_response, current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import IdempotencyKey
+
+
+MAX_KEY_LENGTH = 255
+
+# Client errors that say "try again later" rather than "this request is wrong";
+# like 5xx they are not stored, so a retry with the same key runs again
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429})
+
+_cache = OrderedDict()  # (site_id, key) -> (expires_at, request_hash, status_code, body)
+_cache_lock = threading.Lock()
+
+
+def _cache_get(cache_key):
+    with _cache_lock:
+        entry = _cache.get(cache_key)
+        if entry is None:
+            return None
+        if entry[0] <= datetime.utcnow():
+            del _cache[cache_key]
+            return None
+        _cache.move_to_end(cache_key)
+        return entry
+
+
+def _cache_put(cache_key, entry):
+    with _cache_lock:
+        _cache[cache_key] = entry
+        _cache.move_to_end(cache_key)
+        while len(_cache) > current_app.config['IDEMPOTENCY_CACHE_SIZE']:
+            _cache.popitem(last=False)
+
+
+class IdempotencyService:
+    """Claims idempotency keys and stores the responses they map to."""
+
+    @staticmethod
+    def begin(site_id, key, request_hash):
+        """
+        Claim a key for a new request, or find the stored outcome of an earlier one.
+
+        Args:
+            site_id: Internal site ID
+            key: Idempotency-Key header value
+            request_hash: SHA-256 of the request body
+
+        Returns:
+            tuple: (outcome, value) where outcome is one of
+                'new' (value is the claimed IdempotencyKey ID),
+                'replay' (value is (status_code, body)),
+                'in_progress' or 'mismatch' (value is None)
+        """
+        cache_key = (site_id, key)
+        entry = _cache_get(cache_key)
+        if entry:
+            _, stored_hash, status_code, body = entry
+            if stored_hash != request_hash:
+                return 'mismatch', None
+            return 'replay', (status_code, body)
+
+        now = datetime.utcnow()
+        record = IdempotencyKey.query.filter_by(site_id=site_id, key=key).first()
+
+        if record and record.expires_at <= now:
+            db.session.delete(record)
+            db.session.commit()
+            record = None
+
+        if record:
+            if record.request_hash != request_hash:
+                return 'mismatch', None
+            if record.status_code is None:
+                # A worker that died mid-request leaves its claim behind; take it over once stale
+                stale_before = now - timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_SECONDS'])
+                if record.created_at >= stale_before:
+                    return 'in_progress', None
+                claimed = db.session.execute(
+                    update(IdempotencyKey).where(
+                        IdempotencyKey.id == record.id,
+                        IdempotencyKey.status_code == None,  # noqa: E711
+                        IdempotencyKey.created_at == record.created_at
+                    ).values(created_at=now)
+                ).rowcount
+                db.session.commit()
+                return ('new', record.id) if claimed else ('in_progress', None)
+
+            _cache_put(cache_key, (record.expires_at, record.request_hash, record.status_code, record.response_body))
+            return 'replay', (record.status_code, record.response_body)
+
+        record = IdempotencyKey(
+            site_id=site_id,
+            key=key,
+            request_hash=request_hash,
+            created_at=now,
+            expires_at=now + timedelta(seconds=current_app.config['IDEMPOTENCY_TTL_SECONDS'])
+        )
+        db.session.add(record)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker claimed the key first
+            db.session.rollback()
+            return 'in_progress', None
+        return 'new', record.id
+
+    @staticmethod
+    def complete(record_id, status_code, body):
+        """Store the response for a claimed key."""
+        record = db.session.get(IdempotencyKey, record_id)
+        if not record:
+            return
+        record.status_code = status_code
+        record.response_body = body
+        db.session.commit()
+        _cache_put((record.site_id, record.key), (record.expires_at, record.request_hash, status_code, body))
+
+    @staticmethod
+    def release(record_id):
+        """Drop a claim whose request failed so a retry can run again."""
+        db.session.rollback()
+        IdempotencyKey.query.filter_by(id=record_id, status_code=None).delete()
+        db.session.commit()
+
+    @staticmethod
+    def purge_expired(batch_size=None):
+        """
+        Delete expired keys in small batches.
+
+        Returns:
+            int: Rows deleted
+        """
+        batch_size = batch_size or current_app.config['RETENTION_BATCH_SIZE']
+        now = datetime.utcnow()
+        deleted = 0
+
+        while True:
+            ids = [row.id for row in db.session.query(IdempotencyKey.id).filter(
+                IdempotencyKey.expires_at <= now
+            ).limit(batch_size).all()]
+
+            if not ids:
+                return deleted
+
+            IdempotencyKey.query.filter(IdempotencyKey.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            deleted += len(ids)
+
+
+def idempotent(f):
+    """
+    Decorator honoring an Idempotency-Key header on a site-authenticated view.
+
+    Must be applied below require_site_auth, which injects the site. Responses
+    other than 5xx and retryable 4xx (e.g. 429 quota rejections) are stored
+    and replayed for repeats of the same key and body; a repeat while the first request is still running gets 409, and
+    reusing a key with a different body gets 422.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return f(*args, **kwargs)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        site = kwargs['site']
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+        outcome, value = IdempotencyService.begin(site.id, key, request_hash)
+
+        if outcome == 'replay':
+            status_code, body = value
+            response = current_app.response_class(body, status=status_code, mimetype='application/json')
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        if outcome == 'in_progress':
+            return jsonify({'error': 'A request with this Idempotency-Key is still being processed'}), 409
+        if outcome == 'mismatch':
+            return jsonify({'error': 'Idempotency-Key was already used with a different request body'}), 422
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            IdempotencyService.release(value)
+            raise
+
+        if response.status_code >= 500 or response.status_code in RETRYABLE_STATUS_CODES:
+            IdempotencyService.release(value)
+        else:
+            IdempotencyService.complete(value, response.status_code, response.get_data(as_text=True))
+        return response
+
+    return decorated_function
@@ -6,7 +6,11 @@ from app.models import (
     WebPushSubscription, SiteNotificationCategory, UserCategoryPreference,
     PendingNotification
 )
-from app.services.channels import EmailChannel, WebPushChannel, DiscordChannel, WebhookChannel
+from app.services.channels import CHANNELS, NotificationContent, WebPushChannel, deliver_all
+from app.services.unread_service import UnreadCounterService
+from app.services.stats_service import StatsService
+from app.services.events import broker
+from app.services.dispatch_lanes import lanes, priority_for
 from datetime import datetime, timedelta
 import pytz
 import json
@@ -153,7 +157,7 @@ class NotificationService:
     
     @staticmethod
     def send_notification(user, site, title, message, notification_type='info', 
-                         category_key=None, html_message=None, metadata=None):
+                         category_key=None, html_message=None, metadata=None, collapse_key=None):
         """
         Send a notification to a user across enabled channels OR queue it for scheduled delivery.
         
@@ -166,13 +170,51 @@ class NotificationService:
             category_key: Optional category key for scheduling
             html_message: Optional HTML version of message (for email)
             metadata: Optional additional data (dict)
+            collapse_key: Optional key; a newer notification with the same key
+                replaces a pending one, and instant sends repeated within
+                COLLAPSE_WINDOW_SECONDS are held and merged
             
         Returns:
             dict: Status of delivery or queuing
         """
+        queued = NotificationService._queue_if_scheduled(
+            user, site, title, message, notification_type,
+            category_key=category_key, html_message=html_message, metadata=metadata, collapse_key=collapse_key
+        )
+        if queued:
+            return queued
+        
+        # Send immediately
+        return NotificationService._dispatch_notification(
+            user, site, title, message, notification_type,
+            category_key=category_key, html_message=html_message, collapse_key=collapse_key
+        )
+    
+    @staticmethod
+    def _queue_if_scheduled(user, site, title, message, notification_type='info',
+                            category_key=None, html_message=None, metadata=None, collapse_key=None):
+        """
+        Queue a notification if it should not be sent right away.
+        
+        It is queued when its category is scheduled for the user, merged into a
+        pending notification with the same collapse key, or held for coalescing.
+        
+        Returns:
+            dict: Queuing status, or None if it should be sent now
+        """
         # Check if notification should be scheduled
         scheduled_time = NotificationService.get_next_scheduled_time(user, site, category_key)
         
+        if collapse_key:
+            collapsed = NotificationService._collapse_into_pending(
+                user, site, collapse_key, title, message, notification_type,
+                category_key=category_key, html_message=html_message, metadata=metadata
+            )
+            if collapsed:
+                return collapsed
+            if not scheduled_time:
+                scheduled_time = NotificationService._coalescing_hold(user, site, collapse_key)
+        
         if scheduled_time:
             # Queue notification for later delivery
             pending = PendingNotification(
@@ -184,6 +226,7 @@ class NotificationService:
                 notification_type=notification_type,
                 category_key=category_key,
                 metadata_json=json.dumps(metadata) if metadata else None,
+                collapse_key=collapse_key,
                 scheduled_for=scheduled_time
             )
             db.session.add(pending)
@@ -195,15 +238,75 @@ class NotificationService:
                 'pending_id': pending.id
             }
         
-        # Send immediately
-        return NotificationService._dispatch_notification(
-            user, site, title, message, notification_type,
-            category_key=category_key, html_message=html_message
-        )
+        return None
+    
+    @staticmethod
+    def _collapse_into_pending(user, site, collapse_key, title, message, notification_type,
+                               category_key=None, html_message=None, metadata=None):
+        """
+        Replace the content of a pending notification with the same collapse key.
+        
+        The pending notification keeps its delivery time; the newest content wins.
+        
+        Returns:
+            dict: Queuing status, or None if nothing with this key is pending
+        """
+        pending = PendingNotification.query.filter_by(
+            user_id=user.id,
+            site_id=site.id,
+            collapse_key=collapse_key,
+            cancelled_at=None
+        ).order_by(PendingNotification.id).with_for_update().first()
+        
+        if not pending:
+            return None
+        
+        pending.title = title
+        pending.message = message
+        pending.html_message = html_message
+        pending.notification_type = notification_type
+        pending.category_key = category_key
+        pending.metadata_json = json.dumps(metadata) if metadata else None
+        pending.collapsed_count = (pending.collapsed_count or 1) + 1
+        db.session.commit()
+        
+        return {
+            'status': 'scheduled',
+            'scheduled_for': pending.scheduled_for.isoformat(),
+            'pending_id': pending.id,
+            'collapsed': True
+        }
+    
+    @staticmethod
+    def _coalescing_hold(user, site, collapse_key):
+        """
+        Decide whether an instant notification should be held for coalescing.
+        
+        The first notification for a collapse key is sent straight away; one
+        arriving within COLLAPSE_WINDOW_SECONDS of it is held until the window
+        ends, so any further repeats merge into it.
+        
+        Returns:
+            datetime: When to deliver the held notification, or None to send now
+        """
+        window = current_app.config['COLLAPSE_WINDOW_SECONDS']
+        if not window:
+            return None
+        
+        last_sent = db.session.query(db.func.max(Notification.created_at)).filter(
+            Notification.user_id == user.id,
+            Notification.site_id == site.id,
+            Notification.created_at >= datetime.utcnow() - timedelta(seconds=window),
+            Notification.collapse_key == collapse_key
+        ).scalar()
+        
+        if not last_sent:
+            return None
+        return last_sent + timedelta(seconds=window)
     
     @staticmethod
     def _dispatch_notification(user, site, title, message, notification_type='info',
-                               category_key=None, html_message=None):
+                               category_key=None, html_message=None, collapse_key=None):
         """
         Internal method to actually dispatch a notification across channels.
         
@@ -215,89 +318,228 @@ class NotificationService:
             notification_type: Type of notification
             category_key: Optional category key
             html_message: Optional HTML version
+            collapse_key: Optional collapse key (sent as the web push Topic)
             
         Returns:
             dict: Status of each channel delivery attempt
         """
-        # Get user preferences
+        content = NotificationService._content_for(site, title, message, notification_type, html_message, collapse_key)
+        deliveries = NotificationService._prepare_deliveries(user, site, content)
+        deliver_all(current_app._get_current_object(), deliveries)
+        return NotificationService._record_dispatch(
+            user.id, site.id, title, message, notification_type, deliveries,
+            category_key=category_key, collapse_key=collapse_key
+        )
+    
+    @staticmethod
+    def _content_for(site, title, message, notification_type, html_message=None, collapse_key=None):
+        """Content shared by every delivery of a notification."""
+        return NotificationContent(
+            title, message, notification_type,
+            html_message=html_message,
+            site_name=site.name,
+            topic=WebPushChannel.topic_for(site.site_id, collapse_key) if collapse_key else None
+        )
+    
+    @staticmethod
+    def _prepare_deliveries(user, site, content):
+        """
+        Collect a user's deliveries on every registered channel they have enabled.
+        
+        Args:
+            user: User model instance
+            site: Site model instance
+            content: NotificationContent to send
+            
+        Returns:
+            list: Delivery objects, not yet sent
+        """
         prefs = NotificationService.get_user_preferences(user, site)
         
-        # Track delivery status
-        status = {
-            'email': False,
-            'web_push': False,
-            'discord': False,
-            'webhook': False
-        }
+        deliveries = []
+        for name, channel in CHANNELS.items():
+            if prefs.get(name):
+                deliveries.extend(channel.deliveries_for(user, prefs, content))
+        return deliveries
+    
+    @staticmethod
+    def _record_dispatch(user_id, site_id, title, message, notification_type, deliveries,
+                         category_key=None, collapse_key=None):
+        """
+        Log a sent notification and publish it to live streams.
         
-        # Send via email
-        if prefs['email'] and user.email:
-            status['email'] = EmailChannel.send(
-                user.email,
-                title,
-                message,
-                notification_type,
-                html_message=html_message
-            )
+        Takes IDs rather than instances: batches record users one commit at a
+        time, and each commit would make the next user's instances reload.
         
-        # Send via web push
-        if prefs['web_push']:
-            subscriptions = WebPushSubscription.query.filter_by(user_id=user.id).all()
-            for subscription in subscriptions:
-                try:
-                    result = WebPushChannel.send(
-                        subscription.to_dict(),
-                        title,
-                        message,
-                        notification_type
-                    )
-                    if result:
-                        status['web_push'] = True
-                        subscription.last_used = db.func.now()
-                except Exception as e:
-                    current_app.logger.error(f"Web push failed for subscription {subscription.id}: {e}")
-        
-        # Send via Discord
-        if prefs['discord']:
-            if prefs.get('discord_user_id'):
-                status['discord'] = DiscordChannel.send_dm(
-                    prefs['discord_user_id'],
-                    title,
-                    message,
-                    notification_type
-                )
+        Args:
+            user_id: Internal user ID
+            site_id: Internal site ID
+            title, message, notification_type: As sent
+            deliveries: The user's deliveries, with results set
+            category_key: Optional category key
+            collapse_key: Optional collapse key
+            
+        Returns:
+            dict: Status of each channel delivery attempt
+        """
+        # Track delivery status
+        status = {name: False for name in CHANNELS}
+        used_subscriptions = []
+        
+        for delivery in deliveries:
+            if isinstance(delivery.result, Exception):
+                target = f"subscription {delivery.subscription_id}" if delivery.subscription_id else f"user {user_id}"
+                current_app.logger.error(f"{delivery.channel} delivery failed for {target}: {delivery.result}")
+                continue
+            if delivery.result:
+                status[delivery.channel] = True
+                if delivery.subscription_id:
+                    used_subscriptions.append(delivery.subscription_id)
         
-        # Send via webhook
-        if prefs['webhook'] and prefs.get('webhook_url'):
-            status['webhook'] = WebhookChannel.send(
-                prefs['webhook_url'],
-                title,
-                message,
-                notification_type,
-                site.name
+        if used_subscriptions:
+            WebPushSubscription.query.filter(WebPushSubscription.id.in_(used_subscriptions)).update(
+                {'last_used': db.func.now()}, synchronize_session=False
             )
         
         # Log the notification
         notification = Notification(
-            user_id=user.id,
-            site_id=site.id,
+            user_id=user_id,
+            site_id=site_id,
             title=title,
             message=message,
             notification_type=notification_type,
             category_key=category_key,
-            sent_via_email=status['email'],
-            sent_via_web_push=status['web_push'],
-            sent_via_discord=status['discord'],
-            sent_via_webhook=status['webhook']
+            collapse_key=collapse_key,
+            sent_via_email=status.get('email', False),
+            sent_via_web_push=status.get('web_push', False),
+            sent_via_discord=status.get('discord', False),
+            sent_via_webhook=status.get('webhook', False)
         )
         db.session.add(notification)
+        UnreadCounterService.increment(user_id, site_id)
+        StatsService.record(site_id, status)
         db.session.commit()
         
+        # Push to live streams connected to this process (others see it via the bridge)
+        if broker.has_subscribers(user_id):
+            broker.publish(user_id, notification.to_dict())
+        
         return status
     
+    @staticmethod
+    def dispatch_pending(pending):
+        """
+        Dispatch due pending notifications, sending their deliveries grouped by channel.
+        
+        The batch's pending rows are deleted in one transaction before
+        anything is sent, so a crash mid-batch can lose notifications but never
+        sends them twice; rows another scheduler already removed are skipped.
+        Each notification is then logged on its own, so one failure does not
+        hold back the rest.
+        
+        Args:
+            pending: PendingNotification instances (at most DELIVERY_BATCH_SIZE
+                is a sensible batch)
+            
+        Returns:
+            list: (pending ID, KeyN user ID, error message or None) per notification, in order
+        """
+        outcomes = [None] * len(pending)
+        prepared = []  # (index, pending notification fields, deliveries)
+        
+        for index, notif in enumerate(pending):
+            pending_id = notif.id
+            try:
+                # Copied out because each recorded notification commits, expiring the instances
+                fields = {
+                    'id': pending_id,
+                    'user_id': notif.user_id,
+                    'site_id': notif.site_id,
+                    'keyn_user_id': notif.user.keyn_user_id,
+                    'title': notif.title,
+                    'message': notif.message,
+                    'notification_type': notif.notification_type,
+                    'category_key': notif.category_key,
+                    'collapse_key': notif.collapse_key
+                }
+                content = NotificationService._content_for(
+                    notif.site, notif.title, notif.message, notif.notification_type,
+                    notif.html_message, notif.collapse_key
+                )
+                prepared.append((index, fields, NotificationService._prepare_deliveries(notif.user, notif.site, content)))
+            except Exception as e:
+                db.session.rollback()
+                outcomes[index] = (pending_id, None, str(e))
+        
+        # Claim the batch by removing it from the pending queue
+        claimed = []
+        for index, fields, deliveries in prepared:
+            if PendingNotification.query.filter_by(id=fields['id']).delete(synchronize_session=False):
+                claimed.append((index, fields, deliveries))
+            else:
+                outcomes[index] = (fields['id'], None, 'Already dispatched')
+        db.session.commit()
+        prepared = claimed
+        
+        deliver_all(current_app._get_current_object(), [
+            delivery for _, _, deliveries in prepared for delivery in deliveries
+        ])
+        
+        for index, fields, deliveries in prepared:
+            try:
+                NotificationService._record_dispatch(
+                    fields['user_id'], fields['site_id'], fields['title'], fields['message'],
+                    fields['notification_type'], deliveries,
+                    category_key=fields['category_key'], collapse_key=fields['collapse_key']
+                )
+                outcomes[index] = (fields['id'], fields['keyn_user_id'], None)
+            except Exception as e:
+                db.session.rollback()
+                outcomes[index] = (fields['id'], None, str(e))
+        
+        return outcomes
+    
+    @staticmethod
+    def send_in_lane(user, site, title, message, notification_type='info', category_key=None,
+                     html_message=None, metadata=None, collapse_key=None, priority=None):
+        """
+        Send a notification through its priority lane and wait for the result.
+        
+        Args:
+            user: User model instance
+            site: Site model instance
+            title, message, notification_type, category_key, html_message,
+            metadata, collapse_key: As for send_notification
+            priority: Optional lane ('high', 'normal' or 'bulk'); derived from
+                notification_type when omitted
+            
+        Returns:
+            dict: Status of delivery or queuing (as send_notification)
+        """
+        lane = priority_for(notification_type, priority)
+        future = lanes.submit(
+            lane, NotificationService._send_by_id, user.id, site.id, title, message, notification_type,
+            category_key=category_key, html_message=html_message, metadata=metadata,
+            collapse_key=collapse_key
+        )
+        NotificationService._release_connection()
+        return future.result()
+    
+    @staticmethod
+    def _send_by_id(user_id, site_id, title, message, notification_type,
+                    category_key=None, html_message=None, metadata=None, collapse_key=None):
+        """Load the user and site in the current thread's session and send."""
+        return NotificationService.send_notification(
+            db.session.get(User, user_id), db.session.get(Site, site_id),
+            title, message, notification_type,
+            category_key=category_key, html_message=html_message, metadata=metadata,
+            collapse_key=collapse_key
+        )
+    
     @staticmethod
     def send_bulk_notification(site, user_ids, title, message, notification_type='info', 
-                              category_key=None, html_message=None, metadata=None):
+                              category_key=None, html_message=None, metadata=None, collapse_key=None,
+                              priority=None):
         """
         Send a notification to multiple users.
         
@@ -310,57 +552,198 @@ class NotificationService:
             category_key: Optional category key for scheduling
             html_message: Optional HTML version of message
             metadata: Optional additional data
+            collapse_key: Optional collapse key (see send_notification)
+            priority: Optional lane; bulk sends use the 'bulk' lane unless urgent
+            
+        Returns:
+            dict: Summary of delivery results
+        """
+        # Resolve all recipients in one query
+        keyn_ids = [str(keyn_user_id) for keyn_user_id in user_ids]
+        users = {
+            keyn_user_id: user_id
+            for keyn_user_id, user_id in db.session.query(User.keyn_user_id, User.id).filter(
+                User.keyn_user_id.in_(keyn_ids)
+            ).all()
+        } if keyn_ids else {}
+        
+        recipients = [(keyn_user_id, users.get(str(keyn_user_id))) for keyn_user_id in user_ids]
+        return NotificationService._send_many(
+            site, recipients, title, message, notification_type,
+            category_key=category_key, html_message=html_message, metadata=metadata,
+            collapse_key=collapse_key, priority=priority
+        )
+    
+    @staticmethod
+    def send_to_users(site, users, title, message, notification_type='info',
+                      category_key=None, html_message=None, metadata=None, collapse_key=None,
+                      priority=None):
+        """
+        Send a notification to already-resolved users.
+        
+        Used by internal audiences (e.g. broadcasts) that select User rows
+        directly, avoiding a round-trip through KeyN user IDs.
+        
+        Args:
+            site: Site model instance
+            users: Iterable of User model instances
+            title: Notification title
+            message: Notification message (plain text)
+            notification_type: Type of notification
+            category_key: Optional category key for scheduling
+            html_message: Optional HTML version of message
+            metadata: Optional additional data
+            collapse_key: Optional collapse key (see send_notification)
+            priority: Optional lane; bulk sends use the 'bulk' lane unless urgent
+            
+        Returns:
+            dict: Summary of delivery results (same shape as send_bulk_notification)
+        """
+        recipients = [(user.keyn_user_id, user.id) for user in users]
+        return NotificationService._send_many(
+            site, recipients, title, message, notification_type,
+            category_key=category_key, html_message=html_message, metadata=metadata,
+            collapse_key=collapse_key, priority=priority
+        )
+    
+    @staticmethod
+    def _send_many(site, recipients, title, message, notification_type,
+                   category_key=None, html_message=None, metadata=None, collapse_key=None,
+                   priority=None):
+        """
+        Fan a bulk delivery out over its lane and collect the outcomes in order.
+        
+        Recipients are split into batches of DELIVERY_BATCH_SIZE, one lane task
+        each; a batch's deliveries are sent together, grouped by channel.
+        
+        Args:
+            site: Site model instance
+            recipients: List of (KeyN user ID, internal user ID or None if unknown)
             
         Returns:
             dict: Summary of delivery results
         """
-        results = {
-            'total': len(user_ids),
+        lane = priority_for(notification_type, priority, bulk=True)
+        results = NotificationService._new_bulk_results(len(recipients))
+        size = max(1, current_app.config['DELIVERY_BATCH_SIZE'])
+        
+        futures = [
+            lanes.submit(
+                lane, NotificationService._send_batch, recipients[i:i + size], site.id,
+                title, message, notification_type,
+                category_key=category_key, html_message=html_message, metadata=metadata,
+                collapse_key=collapse_key
+            )
+            for i in range(0, len(recipients), size)
+        ]
+        NotificationService._release_connection()
+        
+        for future in futures:
+            for detail in future.result():
+                if detail['status'] == 'sent':
+                    results['successful'] += 1
+                elif detail['status'] == 'scheduled':
+                    results['scheduled'] += 1
+                else:
+                    results['failed'] += 1
+                results['details'].append(detail)
+        
+        return results
+    
+    @staticmethod
+    def _release_connection():
+        """
+        End the caller's transaction before it waits on a lane.
+        
+        Lane tasks use their own sessions and so their own pooled connections;
+        a caller that held on to its connection while waiting would need two
+        per send, and enough concurrent requests would exhaust the pool.
+        """
+        db.session.commit()
+    
+    @staticmethod
+    def _new_bulk_results(total):
+        """Create an empty bulk delivery summary."""
+        return {
+            'total': total,
             'successful': 0,
             'scheduled': 0,
             'failed': 0,
             'details': []
         }
+    
+    @staticmethod
+    def _send_batch(recipients, site_id, title, message, notification_type,
+                    category_key=None, html_message=None, metadata=None, collapse_key=None):
+        """
+        Send to a batch of bulk recipients (in a lane thread) and describe each outcome.
+        
+        Recipients whose notification is queued are done right away; the
+        deliveries of everyone else are sent together, then logged per user.
         
-        for keyn_user_id in user_ids:
-            user = User.query.filter_by(keyn_user_id=str(keyn_user_id)).first()
+        Args:
+            recipients: List of (KeyN user ID, internal user ID or None if unknown)
+            site_id: Internal site ID
             
-            if not user:
-                results['failed'] += 1
-                results['details'].append({
-                    'user_id': keyn_user_id,
-                    'status': 'user_not_found'
-                })
+        Returns:
+            list: Outcome detail per recipient, in order
+        """
+        site = db.session.get(Site, site_id)
+        content = NotificationService._content_for(site, title, message, notification_type, html_message, collapse_key)
+        details = [None] * len(recipients)
+        prepared = []  # (index, user ID, deliveries)
+        
+        for index, (keyn_user_id, user_id) in enumerate(recipients):
+            if not user_id:
+                details[index] = {'user_id': keyn_user_id, 'status': 'user_not_found'}
                 continue
-            
             try:
-                status = NotificationService.send_notification(
+                user = db.session.get(User, user_id)
+                queued = NotificationService._queue_if_scheduled(
                     user, site, title, message, notification_type,
-                    category_key=category_key, html_message=html_message, metadata=metadata
+                    category_key=category_key, html_message=html_message, metadata=metadata,
+                    collapse_key=collapse_key
                 )
-                
-                if status.get('status') == 'scheduled':
-                    results['scheduled'] += 1
-                    results['details'].append({
+                if queued:
+                    details[index] = {
                         'user_id': keyn_user_id,
                         'status': 'scheduled',
-                        'scheduled_for': status.get('scheduled_for'),
-                        'pending_id': status.get('pending_id')
-                    })
-                else:
-                    results['successful'] += 1
-                    results['details'].append({
-                        'user_id': keyn_user_id,
-                        'status': 'sent',
-                        'channels': status
-                    })
+                        'scheduled_for': queued.get('scheduled_for'),
+                        'pending_id': queued.get('pending_id')
+                    }
+                    continue
+                prepared.append((index, user_id, NotificationService._prepare_deliveries(user, site, content)))
             except Exception as e:
-                results['failed'] += 1
-                results['details'].append({
+                details[index] = NotificationService._failed_detail(keyn_user_id, e)
+        
+        deliver_all(current_app._get_current_object(), [
+            delivery for _, _, deliveries in prepared for delivery in deliveries
+        ])
+        
+        for index, user_id, deliveries in prepared:
+            keyn_user_id = recipients[index][0]
+            try:
+                status = NotificationService._record_dispatch(
+                    user_id, site_id, title, message, notification_type, deliveries,
+                    category_key=category_key, collapse_key=collapse_key
+                )
+                details[index] = {
                     'user_id': keyn_user_id,
-                    'status': 'error',
-                    'error': str(e)
-                })
-                current_app.logger.error(f"Failed to send notification to user {keyn_user_id}: {e}")
+                    'status': 'sent',
+                    'channels': status
+                }
+            except Exception as e:
+                details[index] = NotificationService._failed_detail(keyn_user_id, e)
         
-        return results
+        return details
+    
+    @staticmethod
+    def _failed_detail(keyn_user_id, error):
+        """Roll back after a failed send to one bulk recipient and describe it."""
+        db.session.rollback()
+        current_app.logger.error(f"Failed to send notification to user {keyn_user_id}: {error}")
+        return {
+            'user_id': keyn_user_id,
+            'status': 'error',
+            'error': str(error)
+        }
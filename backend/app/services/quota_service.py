@@ -0,0 +1,130 @@
+"""Per-site recipient quotas.
+
+Sites are charged one unit per recipient, so a bulk send of 500 users costs
+the same as 500 single sends. Usage lives in a small SQLite file shared by all
+worker processes on the host (QUOTA_DB_PATH), so the quota holds regardless
+of how many gunicorn workers serve the requests. Counting uses a sliding
+window approximated from the current and previous fixed windows.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app
+
+
+_local = threading.local()
+
+
+def _connection(path):
+    """Per-thread connection to the quota database."""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    connection = connections.get(path)
+    if connection is None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS quota_usage ('
+            ' site_id INTEGER NOT NULL,'
+            ' window_start INTEGER NOT NULL,'
+            ' count INTEGER NOT NULL,'
+            ' PRIMARY KEY (site_id, window_start))'
+        )
+        connections[path] = connection
+    return connection
+
+
+def _retry_after(previous, current, elapsed, amount, limit, window):
+    """Seconds until the sliding estimate leaves room for amount."""
+    excess = previous * (1 - elapsed / window) + current + amount - limit
+
+    # Room frees up within the current window as the previous window slides out
+    if previous and excess <= previous * (window - elapsed) / window:
+        return excess * window / previous
+
+    # Otherwise wait for the next window, where the current one slides out
+    wait = window - elapsed
+    excess = current + amount - limit
+    if excess > 0:
+        wait += excess * window / current if current else window
+    return wait
+
+
+class QuotaService:
+    """Charges sites for recipients against their quota."""
+
+    @staticmethod
+    def limit_for(site):
+        """Effective recipient quota for a site (0 = unlimited)."""
+        if site.recipient_quota is not None:
+            return site.recipient_quota
+        return current_app.config['SITE_RECIPIENT_QUOTA']
+
+    @staticmethod
+    def consume(site, amount):
+        """
+        Charge recipients to a site's quota if it has room.
+
+        Args:
+            site: Site model instance
+            amount: Number of recipients
+
+        Returns:
+            dict: 'allowed', 'limit', 'remaining' and, when refused,
+                  'retry_after' (seconds)
+        """
+        limit = QuotaService.limit_for(site)
+        if not limit:
+            return {'allowed': True, 'limit': None, 'remaining': None}
+
+        window = current_app.config['SITE_QUOTA_WINDOW_SECONDS']
+        now = time.time()
+        window_start = int(now // window * window)
+        elapsed = now - window_start
+
+        connection = _connection(current_app.config['QUOTA_DB_PATH'])
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = dict(connection.execute(
+                'SELECT window_start, count FROM quota_usage WHERE site_id = ? AND window_start >= ?',
+                (site.id, window_start - window)
+            ).fetchall())
+            previous = rows.get(window_start - window, 0)
+            current = rows.get(window_start, 0)
+            used = previous * (1 - elapsed / window) + current
+
+            if used + amount > limit:
+                connection.execute('ROLLBACK')
+                retry_after = window if amount > limit else _retry_after(
+                    previous, current, elapsed, amount, limit, window
+                )
+                return {
+                    'allowed': False,
+                    'limit': limit,
+                    'remaining': max(0, int(limit - used)),
+                    'retry_after': max(1, math.ceil(retry_after))
+                }
+
+            connection.execute(
+                'INSERT INTO quota_usage (site_id, window_start, count) VALUES (?, ?, ?) '
+                'ON CONFLICT (site_id, window_start) DO UPDATE SET count = count + excluded.count',
+                (site.id, window_start, amount)
+            )
+            connection.execute(
+                'DELETE FROM quota_usage WHERE site_id = ? AND window_start < ?',
+                (site.id, window_start - window)
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+        return {'allowed': True, 'limit': limit, 'remaining': max(0, int(limit - used - amount))}
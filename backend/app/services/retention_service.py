@@ -0,0 +1,277 @@
+"""Notification history retention and archival.
+
+Notifications older than a site's retention window are appended to
+compressed, month-partitioned JSONL archives
+(``ARCHIVE_DIR/<internal site ID>/<YYYY-MM>.jsonl.gz``; the public site_id is
+chosen by whoever registers the site, so it never becomes part of a path) and then deleted from the live
+table in small batches, each in its own short transaction. A batch is written
+to the archive before it is deleted, so an interrupted run can at worst
+archive a row twice; readers drop the duplicate.
+"""
+import gzip
+import json
+import os
+import re
+import shutil
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import Notification, PendingNotification, Site, User
+from app.services.stats_service import StatsService
+from app.services.unread_service import UnreadCounterService
+
+
+ARCHIVE_COLUMNS = (
+    Notification.id,
+    Notification.user_id,
+    User.keyn_user_id,
+    Notification.title,
+    Notification.message,
+    Notification.notification_type,
+    Notification.category_key,
+    Notification.sent_via_email,
+    Notification.sent_via_web_push,
+    Notification.sent_via_discord,
+    Notification.sent_via_webhook,
+    Notification.is_read,
+    Notification.created_at,
+)
+
+MONTH_PATTERN = re.compile(r'^\d{4}-\d{2}$')
+
+
+def archive_record(row, site_key):
+    """Convert an archive row to the dictionary stored in the archive."""
+    return {
+        'id': row.id,
+        'user_id': row.keyn_user_id,
+        'site_id': site_key,
+        'title': row.title,
+        'message': row.message,
+        'type': row.notification_type,
+        'category': row.category_key,
+        'channels': {
+            'email': row.sent_via_email,
+            'web_push': row.sent_via_web_push,
+            'discord': row.sent_via_discord,
+            'webhook': row.sent_via_webhook
+        },
+        'is_read': row.is_read,
+        'created_at': row.created_at.isoformat()
+    }
+
+
+class RetentionService:
+    """Archives and prunes notification history past each site's retention window."""
+
+    @staticmethod
+    def retention_days(site):
+        """Effective retention for a site in days (0 = keep forever)."""
+        if site.retention_days is not None:
+            return site.retention_days
+        return current_app.config['NOTIFICATION_RETENTION_DAYS']
+
+    @staticmethod
+    def archive_dir(site):
+        """Directory holding a site's archives, keyed by its internal integer ID."""
+        return os.path.join(current_app.config['ARCHIVE_DIR'], str(int(site.id)))
+
+    @staticmethod
+    def archive_path(site, month):
+        """Path of a site's archive file for a month ('YYYY-MM')."""
+        return os.path.join(RetentionService.archive_dir(site), f'{month}.jsonl.gz')
+
+    @staticmethod
+    def delete_archives(site):
+        """Remove a site's archives (used when the site is deleted)."""
+        shutil.rmtree(RetentionService.archive_dir(site), ignore_errors=True)
+
+    @staticmethod
+    def _append_archive(path, records):
+        """Append records to a gzip JSONL file and flush them to disk."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = ''.join(json.dumps(record) + '\n' for record in records).encode('utf-8')
+
+        # Each append adds a gzip member; gzip readers treat them as one stream
+        with open(path, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='ab') as archive:
+                archive.write(data)
+            raw.flush()
+            os.fsync(raw.fileno())
+
+    @staticmethod
+    def prune_site(site, batch_size=None, deadline=None):
+        """
+        Archive and delete a site's notifications older than its retention window.
+
+        Args:
+            site: Site model instance
+            batch_size: Rows per batch (default: RETENTION_BATCH_SIZE)
+            deadline: Optional time.monotonic() value to stop at
+
+        Returns:
+            tuple: (rows pruned, True if nothing past the window is left)
+        """
+        days = RetentionService.retention_days(site)
+        if not days:
+            return 0, True
+
+        batch_size = batch_size or current_app.config['RETENTION_BATCH_SIZE']
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        pruned = 0
+
+        while deadline is None or time.monotonic() < deadline:
+            # Outer join so notifications whose user was deleted still expire
+            rows = db.session.query(*ARCHIVE_COLUMNS).outerjoin(
+                User, Notification.user_id == User.id
+            ).filter(
+                Notification.site_id == site.id,
+                Notification.created_at < cutoff
+            ).order_by(Notification.created_at, Notification.id).limit(batch_size).all()
+
+            if not rows:
+                return pruned, True
+
+            by_month = {}
+            for row in rows:
+                by_month.setdefault(row.created_at.strftime('%Y-%m'), []).append(
+                    archive_record(row, site.site_id)
+                )
+            for month, records in by_month.items():
+                RetentionService._append_archive(RetentionService.archive_path(site, month), records)
+
+            unread = Counter(row.user_id for row in rows if not row.is_read)
+            Notification.query.filter(
+                Notification.id.in_([row.id for row in rows])
+            ).delete(synchronize_session=False)
+            for user_id, count in unread.items():
+                UnreadCounterService.decrement(user_id, site.id, count)
+            StatsService.discount(site.id, rows)
+            db.session.commit()
+
+            pruned += len(rows)
+            if len(rows) < batch_size:
+                return pruned, True
+
+        return pruned, False
+
+    @staticmethod
+    def prune(batch_size=None, time_budget=None):
+        """
+        Archive and prune expired notification history for all sites.
+
+        Args:
+            batch_size: Rows per batch (default: RETENTION_BATCH_SIZE)
+            time_budget: Optional seconds to spend before stopping
+
+        Returns:
+            dict: Rows pruned per site ID, and whether the run completed
+        """
+        deadline = time.monotonic() + time_budget if time_budget else None
+        pruned = {}
+
+        for site in Site.query.order_by(Site.id).all():
+            count, complete = RetentionService.prune_site(site, batch_size, deadline)
+            if count:
+                pruned[site.site_id] = count
+            if not complete:
+                return {'pruned': pruned, 'complete': False}
+
+        return {'pruned': pruned, 'complete': True}
+
+    @staticmethod
+    def prune_cancelled_pending(older_than_days=7, batch_size=None):
+        """
+        Delete cancelled pending notifications in small batches.
+
+        Args:
+            older_than_days: Minimum age of the cancellation
+            batch_size: Rows per batch (default: RETENTION_BATCH_SIZE)
+
+        Returns:
+            int: Rows deleted
+        """
+        batch_size = batch_size or current_app.config['RETENTION_BATCH_SIZE']
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        deleted = 0
+
+        while True:
+            ids = [row.id for row in db.session.query(PendingNotification.id).filter(
+                PendingNotification.cancelled_at != None,  # noqa: E711
+                PendingNotification.cancelled_at < cutoff
+            ).limit(batch_size).all()]
+
+            if not ids:
+                return deleted
+
+            PendingNotification.query.filter(
+                PendingNotification.id.in_(ids)
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            deleted += len(ids)
+
+    @staticmethod
+    def list_archives(site):
+        """
+        List a site's archive files.
+
+        Returns:
+            list: Dicts with month and compressed size, oldest first
+        """
+        directory = RetentionService.archive_dir(site)
+        if not os.path.isdir(directory):
+            return []
+
+        archives = []
+        for name in sorted(os.listdir(directory)):
+            month = name[:-len('.jsonl.gz')]
+            if name.endswith('.jsonl.gz') and MONTH_PATTERN.match(month):
+                archives.append({
+                    'month': month,
+                    'size_bytes': os.path.getsize(os.path.join(directory, name))
+                })
+        return archives
+
+    @staticmethod
+    def read_archive(site, month, keyn_user_id=None, limit=100, offset=0):
+        """
+        Read archived notifications for a site and month.
+
+        Args:
+            site: Site model instance
+            month: Month as 'YYYY-MM'
+            keyn_user_id: Optional KeyN user ID to filter by
+            limit: Maximum records to return
+            offset: Records to skip
+
+        Returns:
+            tuple: (records, total matching) or None if there is no archive
+
+        Raises:
+            ValueError: If month is not in YYYY-MM format
+        """
+        if not MONTH_PATTERN.match(month or ''):
+            raise ValueError('month must be in YYYY-MM format')
+
+        path = RetentionService.archive_path(site, month)
+        if not os.path.exists(path):
+            return None
+
+        records = []
+        seen = set()
+        total = 0
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            for line in archive:
+                record = json.loads(line)
+                if record['id'] in seen:
+                    continue
+                seen.add(record['id'])
+                if keyn_user_id is not None and record['user_id'] != keyn_user_id:
+                    continue
+                if offset <= total < offset + limit:
+                    records.append(record)
+                total += 1
+
+        return records, total
@@ -0,0 +1,182 @@
+"""Incrementally maintained notification statistics."""
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import func, case
+from app import db
+from app.models import Notification, NotificationStat
+from app.utils.db import increment_counter
+
+
+# Delivery channels tracked in the rollup, mapped to their Notification flag
+CHANNEL_COLUMNS = {
+    'email': Notification.sent_via_email,
+    'web_push': Notification.sent_via_web_push,
+    'discord': Notification.sent_via_discord,
+    'webhook': Notification.sent_via_webhook,
+}
+
+
+def hour_bucket(timestamp):
+    """Truncate a timestamp to the start of its hour."""
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+class StatsService:
+    """Maintains and reads the hourly notification rollup."""
+
+    @staticmethod
+    def record(site_id, channels, timestamp=None):
+        """
+        Count a logged notification in the rollup.
+
+        Joins the caller's transaction so the rollup is committed together
+        with the notification row.
+
+        Args:
+            site_id: Internal site ID
+            channels: Dict of channel name -> delivered flag
+            timestamp: When the notification was logged (default: now)
+        """
+        bucket = hour_bucket(timestamp or datetime.utcnow())
+
+        for channel in ['all'] + [name for name in CHANNEL_COLUMNS if channels.get(name)]:
+            increment_counter(
+                NotificationStat,
+                {'bucket': bucket, 'site_id': site_id, 'channel': channel},
+                count=1
+            )
+
+    @staticmethod
+    def discount(site_id, rows):
+        """
+        Remove pruned notifications from the rollup (within the caller's transaction).
+
+        Keeps the counts in line with the retained history, so they match a
+        rebuild after retention has deleted rows. Never goes below 0.
+
+        Args:
+            site_id: Internal site ID
+            rows: Deleted rows with created_at and sent_via_* attributes
+        """
+        removed = Counter()
+        for row in rows:
+            bucket = hour_bucket(row.created_at)
+            removed[bucket, 'all'] += 1
+            for channel in CHANNEL_COLUMNS:
+                if getattr(row, f'sent_via_{channel}'):
+                    removed[bucket, channel] += 1
+
+        for (bucket, channel), count in removed.items():
+            increment_counter(
+                NotificationStat,
+                {'bucket': bucket, 'site_id': site_id, 'channel': channel},
+                floor=0,
+                count=-count
+            )
+
+    @staticmethod
+    def get_totals(site_id=None):
+        """
+        Get totals per channel over the retained history.
+
+        Args:
+            site_id: Optional internal site ID to restrict to
+
+        Returns:
+            dict: Channel name -> count (including 'all')
+        """
+        query = db.session.query(NotificationStat.channel, func.sum(NotificationStat.count))
+        if site_id is not None:
+            query = query.filter(NotificationStat.site_id == site_id)
+
+        totals = {channel: 0 for channel in ['all'] + list(CHANNEL_COLUMNS)}
+        for channel, count in query.group_by(NotificationStat.channel).all():
+            totals[channel] = int(count or 0)
+        return totals
+
+    @staticmethod
+    def get_site_totals():
+        """
+        Get notification counts per site over the retained history.
+
+        Returns:
+            dict: Internal site ID -> notification count
+        """
+        rows = db.session.query(
+            NotificationStat.site_id, func.sum(NotificationStat.count)
+        ).filter(
+            NotificationStat.channel == 'all'
+        ).group_by(NotificationStat.site_id).all()
+        return {site_id: int(count or 0) for site_id, count in rows}
+
+    @staticmethod
+    def get_timeseries(hours=24, site_id=None):
+        """
+        Get hourly counts per channel for the trailing window.
+
+        Args:
+            hours: Number of hours to include, ending with the current hour
+            site_id: Optional internal site ID to restrict to
+
+        Returns:
+            list: One dict per hour, oldest first, with a count per channel
+        """
+        end = hour_bucket(datetime.utcnow())
+        start = end - timedelta(hours=hours - 1)
+
+        query = db.session.query(
+            NotificationStat.bucket, NotificationStat.channel, func.sum(NotificationStat.count)
+        ).filter(NotificationStat.bucket >= start)
+        if site_id is not None:
+            query = query.filter(NotificationStat.site_id == site_id)
+        rows = query.group_by(NotificationStat.bucket, NotificationStat.channel).all()
+
+        series = {}
+        for bucket, channel, count in rows:
+            series.setdefault(bucket, {})[channel] = int(count or 0)
+
+        points = []
+        for offset in range(hours):
+            bucket = start + timedelta(hours=offset)
+            counts = series.get(bucket, {})
+            point = {'hour': bucket.isoformat()}
+            for channel in ['all'] + list(CHANNEL_COLUMNS):
+                point[channel] = counts.get(channel, 0)
+            points.append(point)
+        return points
+
+    @staticmethod
+    def rebuild():
+        """
+        Recompute the rollup from the notification log.
+
+        Returns:
+            int: Number of rollup rows written
+        """
+        if db.session.get_bind().dialect.name == 'sqlite':
+            bucket_expr = func.strftime('%Y-%m-%d %H:00:00', Notification.created_at)
+        else:
+            bucket_expr = func.date_trunc('hour', Notification.created_at)
+
+        sums = [
+            func.sum(case((column == True, 1), else_=0))  # noqa: E712
+            for column in CHANNEL_COLUMNS.values()
+        ]
+        rows = db.session.query(
+            bucket_expr, Notification.site_id, func.count(Notification.id), *sums
+        ).group_by(bucket_expr, Notification.site_id).all()
+
+        mappings = []
+        for bucket, site_id, total, *channel_counts in rows:
+            if isinstance(bucket, str):
+                bucket = datetime.strptime(bucket, '%Y-%m-%d %H:%M:%S')
+            mappings.append({'bucket': bucket, 'site_id': site_id, 'channel': 'all', 'count': total})
+            for channel, count in zip(CHANNEL_COLUMNS, channel_counts):
+                if count:
+                    mappings.append({'bucket': bucket, 'site_id': site_id, 'channel': channel, 'count': count})
+
+        NotificationStat.query.delete()
+        db.session.bulk_insert_mappings(NotificationStat, mappings)
+        db.session.commit()
+
+        return len(mappings)
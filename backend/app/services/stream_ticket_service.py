@@ -0,0 +1,87 @@
+"""Single-use tickets for opening live notification streams.
+
+EventSource cannot send headers, so a browser first exchanges its bearer
+token for a ticket (POST /api/notifications/stream/ticket) and opens the
+stream with ?ticket=... instead. Tickets expire after SSE_TICKET_SECONDS and
+are deleted when redeemed, so one leaking through an access log is useless.
+They live in the database because the stream may land on another worker.
+"""
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import StreamTicket
+
+
+def _hash(ticket):
+    return hashlib.sha256(ticket.encode('utf-8')).hexdigest()
+
+
+class StreamTicketService:
+    """Issues and redeems stream tickets."""
+
+    @staticmethod
+    def issue(user_id):
+        """
+        Create a ticket for a user.
+
+        Args:
+            user_id: Internal user ID
+
+        Returns:
+            str: The ticket (only its hash is stored)
+        """
+        ticket = secrets.token_urlsafe(32)
+        db.session.add(StreamTicket(
+            ticket_hash=_hash(ticket),
+            user_id=user_id,
+            expires_at=datetime.utcnow() + timedelta(seconds=current_app.config['SSE_TICKET_SECONDS'])
+        ))
+        db.session.commit()
+        return ticket
+
+    @staticmethod
+    def redeem(ticket):
+        """
+        Consume a ticket.
+
+        Args:
+            ticket: Ticket from the stream URL
+
+        Returns:
+            int: Internal user ID, or None if the ticket is unknown, expired or already used
+        """
+        record = StreamTicket.query.filter_by(ticket_hash=_hash(ticket)).first()
+        if not record:
+            return None
+
+        user_id, expired = record.user_id, record.expires_at <= datetime.utcnow()
+        # Only the request whose delete succeeds gets the ticket
+        deleted = StreamTicket.query.filter_by(id=record.id).delete(synchronize_session=False)
+        db.session.commit()
+        return user_id if deleted and not expired else None
+
+    @staticmethod
+    def purge_expired(batch_size=None):
+        """
+        Delete expired tickets in small batches.
+
+        Returns:
+            int: Rows deleted
+        """
+        batch_size = batch_size or current_app.config['RETENTION_BATCH_SIZE']
+        now = datetime.utcnow()
+        deleted = 0
+
+        while True:
+            ids = [row.id for row in db.session.query(StreamTicket.id).filter(
+                StreamTicket.expires_at <= now
+            ).limit(batch_size).all()]
+
+            if not ids:
+                return deleted
+
+            StreamTicket.query.filter(StreamTicket.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            deleted += len(ids)
@@ -0,0 +1,81 @@
+"""Maintained unread notification counters."""
+from sqlalchemy import func
+from app import db
+from app.models import Notification, Site, UnreadCounter
+from app.utils.db import increment_counter
+
+
+class UnreadCounterService:
+    """Keeps per-(user, site) unread counts in step with the notification log."""
+
+    @staticmethod
+    def increment(user_id, site_id, amount=1):
+        """
+        Add to a user's unread count for a site.
+
+        Joins the caller's transaction; the caller commits together with the
+        notification change so the counter never drifts.
+        """
+        increment_counter(UnreadCounter, {'user_id': user_id, 'site_id': site_id}, count=amount)
+
+    @staticmethod
+    def decrement(user_id, site_id, amount=1):
+        """
+        Subtract from a user's unread count for a site (within the caller's transaction).
+
+        Never goes below 0, so counters that started empty on an existing
+        database (or drifted) cannot turn negative.
+        """
+        increment_counter(UnreadCounter, {'user_id': user_id, 'site_id': site_id}, floor=0, count=-amount)
+
+    @staticmethod
+    def get_counts(user):
+        """
+        Get a user's unread counts.
+
+        Args:
+            user: User model instance
+
+        Returns:
+            dict: Total unread count and per-site breakdown
+        """
+        rows = db.session.query(
+            Site.site_id, Site.name, UnreadCounter.count
+        ).join(Site, UnreadCounter.site_id == Site.id).filter(
+            UnreadCounter.user_id == user.id,
+            UnreadCounter.count > 0
+        ).all()
+
+        return {
+            'total': sum(row.count for row in rows),
+            'sites': [{
+                'site_id': row.site_id,
+                'site_name': row.name,
+                'unread': row.count
+            } for row in rows]
+        }
+
+    @staticmethod
+    def rebuild():
+        """
+        Recompute all counters from the notification log.
+
+        Used to backfill counters for existing data or repair drift.
+
+        Returns:
+            int: Number of (user, site) counters written
+        """
+        rows = db.session.query(
+            Notification.user_id, Notification.site_id, func.count(Notification.id)
+        ).filter(
+            Notification.is_read == False  # noqa: E712
+        ).group_by(Notification.user_id, Notification.site_id).all()
+
+        UnreadCounter.query.delete()
+        db.session.bulk_insert_mappings(UnreadCounter, [
+            {'user_id': user_id, 'site_id': site_id, 'count': count}
+            for user_id, site_id, count in rows
+        ])
+        db.session.commit()
+
+        return len(rows)
@@ -1,9 +1,11 @@
 """Authentication utilities for KeyN OAuth integration."""
 import requests
+import time
 from functools import wraps
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, g, has_request_context
 from app import db
 from app.models import User
+from app.utils.metrics import KEYN_VERIFY_SECONDS
 
 
 class KeyNAuthError(Exception):
@@ -15,6 +17,10 @@ def verify_keyn_token(token):
     """
     Verify a KeyN OAuth token by calling KeyN's user-scoped endpoint.
     
+    The outcome is remembered for the rest of the request, so hooks that
+    look at the token before the view (e.g. profiling) don't cost KeyN a
+    second call.
+    
     Args:
         token: OAuth access token string
         
@@ -24,6 +30,25 @@ def verify_keyn_token(token):
     Raises:
         KeyNAuthError: If token is invalid
     """
+    if not has_request_context():
+        return _verify_keyn_token(token)
+    
+    verified = g.setdefault('keyn_verified', {})
+    if token not in verified:
+        try:
+            verified[token] = (_verify_keyn_token(token), None)
+        except KeyNAuthError as e:
+            verified[token] = (None, e)
+    
+    payload, error = verified[token]
+    if error:
+        raise error
+    return payload
+
+
+def _verify_keyn_token(token):
+    started = time.monotonic()
+    outcome = 'error'
     try:
         response = requests.get(
             f"{current_app.config['KEYN_BASE_URL']}/api/user-scoped",
@@ -33,14 +58,18 @@ def verify_keyn_token(token):
         )
         
         if response.status_code == 200:
+            outcome = 'valid'
             return response.json()
         elif response.status_code == 401:
+            outcome = 'invalid'
             raise KeyNAuthError("Invalid or expired token")
         else:
             raise KeyNAuthError(f"Token verification failed: {response.status_code}")
             
     except requests.RequestException as e:
         raise KeyNAuthError(f"Failed to verify token with KeyN: {str(e)}")
+    finally:
+        KEYN_VERIFY_SECONDS.labels(outcome).observe(time.monotonic() - started)
 
 
 def get_or_create_user(keyn_user_data):
@@ -157,50 +186,72 @@ def require_site_auth(f):
     return decorated_function
 
 
+def authenticate_admin():
+    """
+    Authenticate the current request as the admin.
+    
+    The user must be logged in via KeyN and be user ID 1 (Sam). The result
+    is kept in g, so require_admin_auth reuses a check made earlier in the
+    request (e.g. by profiling).
+    
+    Returns:
+        tuple: (User, None) for the admin, or (None, error response tuple)
+    """
+    if 'admin_auth' not in g:
+        g.admin_auth = _authenticate_admin()
+    return g.admin_auth
+
+
+def _authenticate_admin():
+    token = request.headers.get('Authorization')
+    
+    if not token or not token.startswith('Bearer '):
+        return None, (jsonify({'error': 'No token provided'}), 401)
+    
+    token = token.split(' ')[1]
+    
+    # Verify KeyN token
+    try:
+        payload = verify_keyn_token(token)
+    except Exception as e:
+        return None, (jsonify({'error': f'Invalid token: {str(e)}'}), 401)
+    
+    # KeyN returns 'id' field, not 'sub'
+    keyn_user_id = str(payload.get('id'))
+    username = payload.get('username')
+    
+    # Debug logging
+    current_app.logger.info(f"Admin auth check: keyn_user_id={keyn_user_id}, username={username}")
+    current_app.logger.info(f"Check result: keyn_user_id != '1': {keyn_user_id != '1'}, username.lower() != 'sam': {username.lower() != 'sam'}")
+    
+    # Check if user is admin (KeyN user ID 1, username Sam)
+    if keyn_user_id != '1' or username.lower() != 'sam':
+        current_app.logger.warning(f"Admin access denied for user {username} (ID: {keyn_user_id})")
+        return None, (jsonify({'error': 'Admin access required'}), 403)
+    
+    # Get or create user in database
+    user = User.query.filter_by(keyn_user_id=keyn_user_id).first()
+    if not user:
+        user = User(
+            keyn_user_id=keyn_user_id,
+            username=username,
+            email=payload.get('email')
+        )
+        db.session.add(user)
+        db.session.commit()
+    
+    return user, None
+
+
 def require_admin_auth(f):
     """
-    Decorator to require admin authentication.
-    User must be logged in via KeyN and be user ID 1 (Sam).
+    Decorator to require admin authentication (see authenticate_admin).
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        
-        if not token or not token.startswith('Bearer '):
-            return jsonify({'error': 'No token provided'}), 401
-        
-        token = token.split(' ')[1]
-        
-        # Verify KeyN token
-        try:
-            payload = verify_keyn_token(token)
-        except Exception as e:
-            return jsonify({'error': f'Invalid token: {str(e)}'}), 401
-        
-        # KeyN returns 'id' field, not 'sub'
-        keyn_user_id = str(payload.get('id'))
-        username = payload.get('username')
-        
-        # Debug logging
-        current_app.logger.info(f"Admin auth check: keyn_user_id={keyn_user_id}, username={username}")
-        current_app.logger.info(f"Check result: keyn_user_id != '1': {keyn_user_id != '1'}, username.lower() != 'sam': {username.lower() != 'sam'}")
-        
-        # Check if user is admin (KeyN user ID 1, username Sam)
-        if keyn_user_id != '1' or username.lower() != 'sam':
-            current_app.logger.warning(f"Admin access denied for user {username} (ID: {keyn_user_id})")
-            return jsonify({'error': 'Admin access required'}), 403
-        
-        # Get or create user in database
-        from app.models import User
-        user = User.query.filter_by(keyn_user_id=keyn_user_id).first()
-        if not user:
-            user = User(
-                keyn_user_id=keyn_user_id,
-                username=username,
-                email=payload.get('email')
-            )
-            db.session.add(user)
-            db.session.commit()
+        user, error = authenticate_admin()
+        if error:
+            return error
         
         return f(user=user, *args, **kwargs)
     
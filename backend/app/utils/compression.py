@@ -0,0 +1,85 @@
+"""Negotiated response compression.
+
+Large JSON responses (pending listings, bulk send details) are compressed with
+brotli when the client accepts it and the brotli package is installed,
+otherwise with gzip. Small, streamed and already-encoded responses are left
+untouched.
+"""
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/csv'}
+
+# Favor speed: these responses are generated per request, not cached
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+
+def _choose_encoding():
+    """Pick the best encoding the client accepts, or None."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality('br') > 0:
+        return 'br'
+    if accepted.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+def compress_response(response, min_size):
+    """
+    Compress a response body in place if it is worth it.
+
+    Args:
+        response: Flask response
+        min_size: Minimum body size in bytes to compress
+
+    Returns:
+        Response: The (possibly compressed) response
+    """
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    if (response.content_length or 0) < min_size:
+        return response
+
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+    if len(compressed) >= len(data):
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    """Register response compression if COMPRESS_ENABLED is set."""
+    if not app.config.get('COMPRESS_ENABLED', True):
+        return
+
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+
+    @app.after_request
+    def compress(response):
+        return compress_response(response, min_size)
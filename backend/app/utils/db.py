@@ -0,0 +1,54 @@
+"""Database helpers shared by services."""
+from sqlalchemy import case
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+
+
+_UPSERT_DIALECTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def increment_counter(model, keys, floor=None, **deltas):
+    """
+    Atomically add deltas to counter columns, creating the row if needed.
+
+    Runs as a single INSERT ... ON CONFLICT DO UPDATE on SQLite and Postgres,
+    so concurrent writers never lose increments. The change joins the current
+    session transaction and is committed by the caller.
+
+    Args:
+        model: Model class with a unique constraint over the key columns
+        keys: Dict of key column values identifying the counter row
+        floor: Optional lower bound the counters are clamped to (e.g. 0)
+        **deltas: Counter column name -> amount to add (may be negative)
+    """
+    insert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    table = model.__table__
+
+    if insert is None:
+        # Generic fallback for other databases: lock the row and update it
+        row = model.query.filter_by(**keys).with_for_update().first()
+        if not row:
+            row = model(**keys, **{column: 0 for column in deltas})
+            db.session.add(row)
+            db.session.flush()
+        for column, delta in deltas.items():
+            setattr(row, column, _clamped(getattr(model, column) + delta, floor))
+        return
+
+    initial = {column: delta if floor is None else max(delta, floor) for column, delta in deltas.items()}
+    stmt = insert(table).values(**keys, **initial)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: _clamped(table.c[column] + delta, floor) for column, delta in deltas.items()}
+    )
+    db.session.execute(stmt)
+
+
+def _clamped(expression, floor):
+    """SQL expression for max(expression, floor) (portable, unlike GREATEST)."""
+    if floor is None:
+        return expression
+    return case((expression < floor, floor), else_=expression)
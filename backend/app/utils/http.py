@@ -0,0 +1,52 @@
+"""Conditional GET helpers.
+
+Read-heavy endpoints derive an ETag from cheap version values (``updated_at``
+timestamps, maximum IDs, maintained counters) and only build and serialize
+their response when the client's cached copy is stale.
+"""
+import hashlib
+
+from flask import request, make_response, current_app
+
+
+PRIVATE_CACHE_CONTROL = 'private, no-cache'
+PUBLIC_CACHE_CONTROL = 'public, max-age=60'
+
+
+def make_etag(*parts):
+    """
+    Build an ETag value from version parts.
+
+    Args:
+        *parts: Values identifying the representation (IDs, timestamps, counts, query args)
+
+    Returns:
+        str: Opaque ETag value (without quotes)
+    """
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def conditional_response(etag, build, cache_control=PRIVATE_CACHE_CONTROL):
+    """
+    Answer a GET with 304 if the client's ETag matches, otherwise build the response.
+
+    Args:
+        etag: ETag value from make_etag
+        build: Callable returning a Flask response (or response tuple);
+               only called when the client's copy is stale
+        cache_control: Cache-Control header value
+
+    Returns:
+        Response: 304 Not Modified or the built response, with ETag and Cache-Control set
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+
+    # Weak: the representation may be re-encoded (e.g. compressed) on the way out
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = cache_control
+    return response
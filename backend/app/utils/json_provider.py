@@ -0,0 +1,64 @@
+"""Fast JSON provider.
+
+Registers an orjson-backed provider when orjson is installed, so ``jsonify``
+and ``request.get_json`` avoid the standard library encoder on large list
+responses. Calls that pass stdlib-specific options fall back to it.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson.
+
+    Datetimes are passed through to the default handler so they serialize
+    exactly as with Flask's provider, and keys are sorted when ``sort_keys``
+    is set (the default) so bodies, and the ETags hashed from them, are stable.
+    """
+
+    def _options(self):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if self._app.debug:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self._options()),
+            mimetype=self.mimetype
+        )
+
+
+def init_json_provider(app):
+    """
+    Select the JSON provider from the JSON_PROVIDER setting.
+
+    Args:
+        app: Flask application ('auto' uses orjson if installed, 'orjson'
+             requires it, 'stdlib' keeps Flask's default provider)
+    """
+    choice = app.config.get('JSON_PROVIDER', 'auto')
+    if choice == 'stdlib':
+        return
+    if orjson is None:
+        if choice == 'orjson':
+            app.logger.warning("JSON_PROVIDER=orjson but orjson is not installed; using the standard library")
+        return
+    app.json = OrjsonProvider(app)
@@ -0,0 +1,203 @@
+"""Prometheus metrics.
+
+Under gunicorn, PROMETHEUS_MULTIPROC_DIR is set (see gunicorn_config.py) and
+every worker writes its samples to files there; /metrics merges them, so a
+scrape reflects all workers rather than whichever one answered it. Queue
+depth and age are read from the database at scrape time.
+"""
+import os
+import time
+from datetime import datetime
+from flask import Response, current_app, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client import multiprocess
+
+
+REQUEST_SECONDS = Histogram(
+    'nolofication_http_request_duration_seconds',
+    'HTTP request latency by route',
+    ['method', 'endpoint'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+REQUESTS = Counter(
+    'nolofication_http_requests_total',
+    'HTTP requests by route and status',
+    ['method', 'endpoint', 'status']
+)
+RATE_LIMITED = Counter(
+    'nolofication_rate_limit_rejections_total',
+    'Requests rejected with 429 (rate limits and recipient quotas)',
+    ['endpoint']
+)
+DELIVERIES = Counter(
+    'nolofication_channel_deliveries_total',
+    'Channel delivery attempts by outcome (sent, failed or error)',
+    ['channel', 'outcome']
+)
+DELIVERY_SECONDS = Histogram(
+    'nolofication_channel_delivery_duration_seconds',
+    'Channel delivery latency',
+    ['channel'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+KEYN_VERIFY_SECONDS = Histogram(
+    'nolofication_keyn_verify_duration_seconds',
+    'KeyN token verification latency by outcome (valid, invalid or error)',
+    ['outcome'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'nolofication_db_pool_checked_out',
+    'Database connections in use',
+    multiprocess_mode='livesum'
+)
+DB_POOL_IDLE = Gauge(
+    'nolofication_db_pool_idle',
+    'Idle database connections held by the pool',
+    multiprocess_mode='livesum'
+)
+DB_POOL_OVERFLOW = Gauge(
+    'nolofication_db_pool_overflow',
+    'Database connections opened beyond the pool size',
+    multiprocess_mode='livesum'
+)
+
+
+def record_delivery(channel, outcome, seconds):
+    """
+    Record one delivery attempt.
+
+    Args:
+        channel: Channel name (e.g. 'email' or 'web_push')
+        outcome: 'sent', 'failed' or 'error'
+        seconds: How long the delivery took
+    """
+    DELIVERY_SECONDS.labels(channel).observe(seconds)
+    DELIVERIES.labels(channel, outcome).inc()
+
+
+async def observe_delivery(channel, coroutine):
+    """
+    Await a channel coroutine, recording its outcome and latency.
+
+    Args:
+        channel: Channel name (e.g. 'email' or 'web_push')
+        coroutine: Channel coroutine returning True on success
+
+    Returns:
+        The coroutine's result (exceptions are recorded and re-raised)
+    """
+    started = time.monotonic()
+    outcome = 'error'
+    try:
+        result = await coroutine
+        outcome = 'sent' if result else 'failed'
+        return result
+    finally:
+        record_delivery(channel, outcome, time.monotonic() - started)
+
+
+class QueueCollector:
+    """Pending notification queue depth and age, read at scrape time."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def describe(self):
+        # Lets the registry learn the metric names without querying the database
+        yield GaugeMetricFamily('nolofication_pending_due', '')
+        yield GaugeMetricFamily('nolofication_pending_oldest_due_age_seconds', '')
+
+    def collect(self):
+        from app import db
+        from app.models import PendingNotification
+
+        with self.app.app_context():
+            depth, oldest = db.session.query(
+                db.func.count(PendingNotification.id),
+                db.func.min(PendingNotification.scheduled_for)
+            ).filter(
+                PendingNotification.cancelled_at == None,  # noqa: E711
+                PendingNotification.scheduled_for <= datetime.utcnow()
+            ).one()
+            db.session.remove()
+
+        yield GaugeMetricFamily(
+            'nolofication_pending_due', 'Pending notifications that are due but not yet dispatched', value=depth
+        )
+        age = (datetime.utcnow() - oldest).total_seconds() if oldest else 0
+        yield GaugeMetricFamily(
+            'nolofication_pending_oldest_due_age_seconds', 'How long the oldest due pending notification has waited',
+            value=max(0, age)
+        )
+
+
+def _record_pool_stats(engine):
+    pool = engine.pool
+    if not hasattr(pool, 'checkedout'):
+        return
+    DB_POOL_CHECKED_OUT.set(pool.checkedout())
+    DB_POOL_IDLE.set(pool.checkedin())
+    DB_POOL_OVERFLOW.set(max(0, pool.overflow()))
+
+
+_queue_collector_registered = False
+
+
+def init_metrics(app):
+    """Record request metrics and serve /metrics if METRICS_ENABLED is set."""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    from app import db, limiter
+
+    global _queue_collector_registered
+    multiprocess_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if not multiprocess_dir and not _queue_collector_registered:
+        REGISTRY.register(QueueCollector(app))
+        _queue_collector_registered = True
+
+    if not app.config.get('METRICS_TOKEN'):
+        if app.config.get('METRICS_REQUIRE_TOKEN'):
+            app.logger.warning("METRICS_TOKEN is not set; /metrics is disabled until it is")
+        elif not app.debug and not app.testing:
+            app.logger.warning("METRICS_TOKEN is not set; /metrics is publicly readable")
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.monotonic()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_SECONDS.labels(request.method, endpoint).observe(time.monotonic() - started)
+        REQUESTS.labels(request.method, endpoint, str(response.status_code)).inc()
+        if response.status_code == 429:
+            RATE_LIMITED.labels(endpoint).inc()
+        _record_pool_stats(db.engine)
+        return response
+
+    # Scrapers poll every few seconds; app-wide rate limits would reject them
+    @app.route('/metrics')
+    @limiter.exempt
+    def metrics():
+        token = current_app.config.get('METRICS_TOKEN')
+        if not token and current_app.config.get('METRICS_REQUIRE_TOKEN'):
+            return {'error': 'Metrics are disabled until METRICS_TOKEN is set'}, 403
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return {'error': 'Unauthorized'}, 401
+
+        if multiprocess_dir:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            registry.register(QueueCollector(app))
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,86 @@
+"""Keyset (cursor) pagination helpers."""
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+    pass
+
+
+def encode_cursor(created_at, row_id):
+    """
+    Encode a (created_at, id) position as an opaque cursor string.
+
+    Args:
+        created_at: Timestamp of the last row on the page
+        row_id: Primary key of the last row on the page
+
+    Returns:
+        str: URL-safe cursor
+    """
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: Opaque cursor string from a previous response
+
+    Returns:
+        tuple: (created_at datetime, id int)
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_at, row_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+
+def keyset_page(query, created_col, id_col, limit, cursor=None):
+    """
+    Fetch one page of rows ordered newest first by (created_at, id).
+
+    Only rows strictly after the cursor position are scanned, so the cost of
+    a page depends on its size rather than on how deep into the history it is.
+
+    Args:
+        query: Base SQLAlchemy query (already filtered)
+        created_col: Timestamp column to order by
+        id_col: Primary key column used as a tie-breaker
+        limit: Page size (at least 1)
+        cursor: Optional cursor from a previous page
+
+    Returns:
+        tuple: (rows, next_cursor) where next_cursor is None on the last page
+    """
+    limit = max(1, limit)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            created_col < created_at,
+            and_(created_col == created_at, id_col < row_id)
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(created_col.desc(), id_col.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            getattr(last, created_col.key), getattr(last, id_col.key)
+        )
+
+    return rows, next_cursor
@@ -0,0 +1,214 @@
+"""On-demand request profiling.
+
+A request is profiled with cProfile when an admin sends an ``X-Profile: 1``
+header (or ``_profile=1`` query parameter), or when it is picked by
+PROFILE_SAMPLE_RATE. Work the request hands to dispatch lanes is profiled in
+those threads too and merged into the same profile. Profiles are written to
+PROFILE_DIR as pstats files, keeping the newest PROFILE_MAX_FILES.
+
+When PROFILING_ENABLED is off no hooks are registered at all; when it is on,
+requests that are not profiled only pay for a header lookup.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from flask import g, request
+
+
+PROFILE_SUFFIX = '.prof'
+_NAME_PATTERN = re.compile(r'^[\w.-]+\.prof$')
+
+_local = threading.local()
+
+
+class ProfileSession:
+    """cProfile runs belonging to one request, one per participating thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles = []
+
+    def add(self, profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def stats(self):
+        """Merged pstats.Stats of every finished run (None if nothing ran)."""
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        merged = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            merged.add(profile)
+        return merged
+
+
+def current():
+    """ProfileSession of the request being profiled by this thread, or None."""
+    return getattr(_local, 'session', None)
+
+
+@contextmanager
+def attach(session):
+    """Profile this thread's work inside the block as part of session (if any)."""
+    if session is None:
+        yield
+        return
+
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiler is already active (one at a time on Python 3.12+)
+        yield
+        return
+
+    previous = current()
+    _local.session = session
+    try:
+        yield
+    finally:
+        profile.disable()
+        _local.session = previous
+        session.add(profile)
+
+
+def _safe(value):
+    return re.sub(r'[^\w.-]+', '_', value)[:60]
+
+
+def write_profile(directory, max_files, session, endpoint, elapsed):
+    """
+    Save a finished session and trim the directory to max_files profiles.
+
+    Returns:
+        str: File name of the profile, or None if nothing was profiled
+    """
+    stats = session.stats()
+    if stats is None:
+        return None
+
+    os.makedirs(directory, exist_ok=True)
+    name = (
+        f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{_safe(endpoint)}-"
+        f"{int(elapsed * 1000)}ms-{os.getpid()}{PROFILE_SUFFIX}"
+    )
+    stats.dump_stats(os.path.join(directory, name))
+
+    files = sorted(f for f in os.listdir(directory) if f.endswith(PROFILE_SUFFIX))
+    for old in files[:max(0, len(files) - max_files)]:
+        try:
+            os.remove(os.path.join(directory, old))
+        except FileNotFoundError:
+            pass  # Trimmed by another worker
+    return name
+
+
+def list_profiles(directory):
+    """
+    Saved profiles, newest first.
+
+    Returns:
+        list: Dicts with name, endpoint, duration_ms, size and created_at
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not _NAME_PATTERN.match(name):
+            continue
+        path = os.path.join(directory, name)
+        parts = name[:-len(PROFILE_SUFFIX)].split('-')
+        profiles.append({
+            'name': name,
+            'endpoint': '-'.join(parts[1:-2]) if len(parts) >= 4 else None,
+            'duration_ms': int(parts[-2][:-2]) if len(parts) >= 4 and parts[-2].endswith('ms') else None,
+            'size': os.path.getsize(path),
+            'created_at': datetime.utcfromtimestamp(os.path.getmtime(path)).isoformat()
+        })
+    return profiles
+
+
+def profile_path(directory, name):
+    """
+    Path of a saved profile.
+
+    Raises:
+        ValueError: If name is not a profile file name
+        FileNotFoundError: If it does not exist (or was trimmed)
+    """
+    if not _NAME_PATTERN.match(name):
+        raise ValueError('Invalid profile name')
+    path = os.path.join(directory, name)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(name)
+    return path
+
+
+def render_profile(path, sort='cumulative', limit=50):
+    """Text report of a saved profile, as printed by pstats."""
+    output = io.StringIO()
+    stats = pstats.Stats(path, stream=output)
+    stats.sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+def _wants_profile(sample_rate):
+    if request.headers.get('X-Profile') == '1' or request.args.get('_profile') == '1':
+        from app.utils.auth import authenticate_admin
+        user, _ = authenticate_admin()
+        return user is not None
+    return bool(sample_rate) and random.random() < sample_rate
+
+
+def init_profiling(app):
+    """Register the profiling hooks if PROFILING_ENABLED is set."""
+    if not app.config.get('PROFILING_ENABLED', False):
+        return
+
+    sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0)
+    directory = app.config['PROFILE_DIR']
+    max_files = app.config['PROFILE_MAX_FILES']
+
+    @app.before_request
+    def start_profile():
+        if not _wants_profile(sample_rate):
+            return
+        g.profile_session = ProfileSession()
+        g.profile_started = time.monotonic()
+        g.profile_block = attach(g.profile_session)
+        g.profile_block.__enter__()
+
+    @app.after_request
+    def finish_profile(response):
+        block = g.pop('profile_block', None)
+        if block is None:
+            return response
+        block.__exit__(None, None, None)
+        elapsed = time.monotonic() - g.pop('profile_started')
+
+        try:
+            name = write_profile(
+                directory, max_files, g.pop('profile_session'), request.endpoint or 'unmatched', elapsed
+            )
+            if name:
+                response.headers['X-Profile-Id'] = name
+        except Exception as e:
+            app.logger.error(f"Failed to save request profile: {e}")
+        return response
+
+    @app.teardown_request
+    def abandon_profile(exc):
+        # after_request is skipped when the view raises; stop profiling anyway
+        block = g.pop('profile_block', None)
+        if block is not None:
+            block.__exit__(None, None, None)
@@ -0,0 +1,240 @@
+"""SQL query counting and timing.
+
+SQLAlchemy engine events add each statement's count and duration to the
+QueryStats being tracked by the current thread. Requests are tracked
+automatically (see init_query_stats), scheduler cycles with track_cycle, and
+work handed to dispatch lanes is charged to the request that submitted it.
+Per-endpoint aggregates are kept in memory for each process.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+_local = threading.local()
+_installed = False
+_install_lock = threading.Lock()
+
+_aggregates = {}
+_aggregates_lock = threading.Lock()
+
+
+class QueryStats:
+    """Queries and database time for a unit of work (request, cycle, block)."""
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.queries = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, statement, elapsed):
+        with self._lock:
+            self.queries += 1
+            self.seconds += elapsed
+            self.statements[statement] += 1
+        if self.parent is not None:
+            self.parent.add(statement, elapsed)
+
+    def most_repeated(self, limit=3):
+        """The most frequently run statements as (statement, count) pairs."""
+        with self._lock:
+            return self.statements.most_common(limit)
+
+
+def current():
+    """QueryStats tracked by this thread, or None."""
+    return getattr(_local, 'stats', None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current() is not None:
+        conn.info.setdefault('query_stats_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current()
+    started = conn.info.get('query_stats_started')
+    if stats is None or not started:
+        return
+    stats.add(statement, time.perf_counter() - started.pop())
+
+
+def install():
+    """Register the engine event listeners (once per process)."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _installed = True
+
+
+@contextmanager
+def attach(stats):
+    """Charge this thread's queries to an existing QueryStats (e.g. a request's)."""
+    previous = current()
+    _local.stats = stats
+    try:
+        yield stats
+    finally:
+        _local.stats = previous
+
+
+@contextmanager
+def track_queries():
+    """
+    Count the queries run inside the block.
+
+    Nested blocks also count towards the enclosing one.
+
+    Yields:
+        QueryStats: Updated as queries run
+    """
+    install()
+    with attach(QueryStats(parent=current())) as stats:
+        yield stats
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """
+    Fail if the block runs more than limit queries.
+
+    Intended for regression tests guarding against N+1 queries.
+
+    Raises:
+        AssertionError: Listing the most repeated statements
+    """
+    with track_queries() as stats:
+        yield stats
+
+    if stats.queries > limit:
+        repeated = '\n'.join(
+            f'  {count}x {statement}' for statement, count in stats.most_repeated(5)
+        )
+        raise AssertionError(f'Expected at most {limit} queries, ran {stats.queries}:\n{repeated}')
+
+
+def record(name, stats, elapsed):
+    """Add a finished unit of work to the per-name aggregates."""
+    with _aggregates_lock:
+        entry = _aggregates.get(name)
+        if entry is None:
+            entry = _aggregates[name] = {
+                'count': 0, 'queries': 0, 'db_seconds': 0.0, 'seconds': 0.0,
+                'max_queries': 0, 'max_seconds': 0.0
+            }
+        entry['count'] += 1
+        entry['queries'] += stats.queries
+        entry['db_seconds'] += stats.seconds
+        entry['seconds'] += elapsed
+        entry['max_queries'] = max(entry['max_queries'], stats.queries)
+        entry['max_seconds'] = max(entry['max_seconds'], elapsed)
+
+
+def snapshot():
+    """
+    Per-endpoint (and per scheduler task) aggregates for this process.
+
+    Returns:
+        list: Dicts sorted by total database time, slowest first
+    """
+    with _aggregates_lock:
+        items = [(name, dict(entry)) for name, entry in _aggregates.items()]
+
+    result = []
+    for name, entry in items:
+        count = entry['count']
+        result.append({
+            'name': name,
+            'count': count,
+            'avg_queries': round(entry['queries'] / count, 2),
+            'max_queries': entry['max_queries'],
+            'avg_db_ms': round(entry['db_seconds'] * 1000 / count, 2),
+            'total_db_seconds': round(entry['db_seconds'], 3),
+            'avg_ms': round(entry['seconds'] * 1000 / count, 2),
+            'max_ms': round(entry['max_seconds'] * 1000, 2)
+        })
+    result.sort(key=lambda item: item['total_db_seconds'], reverse=True)
+    return result
+
+
+def reset():
+    """Clear the aggregates."""
+    with _aggregates_lock:
+        _aggregates.clear()
+
+
+def is_slow(config, stats, elapsed):
+    """Whether a unit of work exceeded SLOW_REQUEST_SECONDS or SLOW_REQUEST_QUERIES."""
+    max_seconds = config.get('SLOW_REQUEST_SECONDS')
+    max_queries = config.get('SLOW_REQUEST_QUERIES')
+    return bool((max_seconds and elapsed > max_seconds) or (max_queries and stats.queries > max_queries))
+
+
+def describe(stats, elapsed):
+    """One-line summary of a unit of work for logs."""
+    summary = f'{elapsed:.2f}s, {stats.queries} queries in {stats.seconds * 1000:.1f}ms'
+    repeated = stats.most_repeated(1)
+    if repeated and repeated[0][1] > 1:
+        statement, count = repeated[0]
+        summary += f"; most repeated ({count}x): {' '.join(statement.split())[:200]}"
+    return summary
+
+
+@contextmanager
+def track_cycle(app, name):
+    """
+    Track a scheduler task: aggregate it under name and log it if slow.
+
+    Yields:
+        QueryStats: Updated as queries run
+    """
+    started = time.monotonic()
+    with track_queries() as stats:
+        try:
+            yield stats
+        finally:
+            elapsed = time.monotonic() - started
+            record(name, stats, elapsed)
+            if is_slow(app.config, stats, elapsed):
+                app.logger.warning(f'Slow {name}: {describe(stats, elapsed)}')
+
+
+def init_query_stats(app):
+    """Track queries for every request; add X-DB-* headers if DB_STATS_HEADERS is set."""
+    install()
+    headers = app.config.get('DB_STATS_HEADERS', False)
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats_previous = current()
+        g.query_stats = QueryStats(parent=g.query_stats_previous)
+        g.query_stats_started = time.monotonic()
+        _local.stats = g.query_stats
+
+    @app.after_request
+    def finish_query_stats(response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+        elapsed = time.monotonic() - g.pop('query_stats_started')
+
+        record(request.endpoint or 'unmatched', stats, elapsed)
+        if headers:
+            response.headers['X-DB-Queries'] = str(stats.queries)
+            response.headers['X-DB-Time'] = f'{stats.seconds * 1000:.2f}'
+        if is_slow(app.config, stats, elapsed):
+            app.logger.warning(f'Slow request {request.method} {request.path}: {describe(stats, elapsed)}')
+        return response
+
+    @app.teardown_request
+    def stop_query_stats(exc):
+        _local.stats = g.pop('query_stats_previous', None)
@@ -0,0 +1,168 @@
+"""Row serializers for list endpoints.
+
+List endpoints select plain columns (joining the related site/user columns
+they need) instead of loading ORM instances and calling ``to_dict``, which
+would lazy-load ``site``/``user`` once per row. The dictionaries produced
+here match the corresponding model ``to_dict`` output.
+"""
+import json
+
+from sqlalchemy import null
+
+from app.models import Notification, PendingNotification, Site, User
+
+
+NOTIFICATION_COLUMNS = (
+    Notification.id,
+    Notification.title,
+    Notification.message,
+    Notification.notification_type,
+    Notification.category_key,
+    Notification.sent_via_email,
+    Notification.sent_via_web_push,
+    Notification.sent_via_discord,
+    Notification.sent_via_webhook,
+    Notification.is_read,
+    Notification.created_at,
+    Site.site_id.label('site_key'),
+    Site.name.label('site_name'),
+)
+
+PENDING_NOTIFICATION_COLUMNS = (
+    PendingNotification.id,
+    PendingNotification.title,
+    PendingNotification.message,
+    PendingNotification.html_message,
+    PendingNotification.notification_type,
+    PendingNotification.category_key,
+    PendingNotification.collapse_key,
+    PendingNotification.collapsed_count,
+    PendingNotification.scheduled_for,
+    PendingNotification.created_at,
+    PendingNotification.cancelled_at,
+    PendingNotification.metadata_json,
+    User.keyn_user_id,
+)
+
+NOTIFICATION_FIELDS = (
+    'id', 'title', 'message', 'type', 'category', 'site_id', 'site_name',
+    'channels', 'is_read', 'created_at'
+)
+
+PENDING_NOTIFICATION_FIELDS = (
+    'id', 'user_id', 'title', 'message', 'html_message', 'type', 'category',
+    'collapse_key', 'collapsed_count', 'scheduled_for', 'created_at', 'cancelled_at', 'metadata'
+)
+
+# Large pending columns that are only selected when their field is requested
+PENDING_HEAVY_COLUMNS = {
+    'html_message': PendingNotification.html_message,
+    'metadata': PendingNotification.metadata_json,
+}
+
+
+def parse_fields(value, allowed):
+    """
+    Parse a comma-separated ``fields`` query parameter.
+
+    Args:
+        value: Raw parameter value (None or empty means all fields)
+        allowed: Field names the endpoint can return
+
+    Returns:
+        set: Requested field names (always including 'id'), or None for all fields
+
+    Raises:
+        ValueError: If an unknown field is requested
+    """
+    if not value:
+        return None
+
+    fields = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = fields - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}")
+    return fields | {'id'}
+
+
+def project(data, fields):
+    """Restrict a serialized dictionary to the requested fields (None keeps all)."""
+    if fields is None:
+        return data
+    return {key: value for key, value in data.items() if key in fields}
+
+
+def notification_rows(query):
+    """
+    Turn a filtered Notification query into a single-query row query.
+
+    Apply all ``filter_by`` calls before this, since ``filter_by`` targets the
+    last joined entity.
+
+    Args:
+        query: Notification query
+
+    Returns:
+        Query yielding rows accepted by serialize_notification
+    """
+    return query.join(Site, Notification.site_id == Site.id).with_entities(*NOTIFICATION_COLUMNS)
+
+
+def pending_notification_rows(query, fields=None):
+    """
+    Turn a filtered PendingNotification query into a single-query row query.
+
+    Args:
+        query: PendingNotification query
+        fields: Optional set of requested fields; heavy columns outside it
+                are selected as NULL instead of being loaded
+
+    Returns:
+        Query yielding rows accepted by serialize_pending_notification
+    """
+    columns = PENDING_NOTIFICATION_COLUMNS
+    if fields is not None:
+        skipped = {column.key for name, column in PENDING_HEAVY_COLUMNS.items() if name not in fields}
+        columns = [null().label(column.key) if column.key in skipped else column for column in columns]
+
+    return query.join(User, PendingNotification.user_id == User.id).with_entities(*columns)
+
+
+def serialize_notification(row):
+    """Convert a notification row to a dictionary."""
+    return {
+        'id': row.id,
+        'title': row.title,
+        'message': row.message,
+        'type': row.notification_type,
+        'category': row.category_key,
+        'site_id': row.site_key,
+        'site_name': row.site_name,
+        'channels': {
+            'email': row.sent_via_email,
+            'web_push': row.sent_via_web_push,
+            'discord': row.sent_via_discord,
+            'webhook': row.sent_via_webhook
+        },
+        'is_read': row.is_read,
+        'created_at': row.created_at.isoformat()
+    }
+
+
+def serialize_pending_notification(row):
+    """Convert a pending notification row to a dictionary."""
+    return {
+        'id': row.id,
+        'user_id': row.keyn_user_id,
+        'title': row.title,
+        'message': row.message,
+        'html_message': row.html_message,
+        'type': row.notification_type,
+        'category': row.category_key,
+        'collapse_key': row.collapse_key,
+        'collapsed_count': row.collapsed_count,
+        'scheduled_for': row.scheduled_for.isoformat() if row.scheduled_for else None,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'cancelled_at': row.cancelled_at.isoformat() if row.cancelled_at else None,
+        'metadata': json.loads(row.metadata_json) if row.metadata_json else None
+    }
@@ -0,0 +1,97 @@
+"""Benchmarks for sending, scheduling and dispatching notifications."""
+from datetime import datetime, timedelta
+from app import db
+from app.models import User, Site, PendingNotification
+from app.services.notification_service import NotificationService
+from conftest import SETTINGS
+
+
+def _users():
+    return User.query.order_by(User.id).all()
+
+
+def _site():
+    return Site.query.filter_by(site_id='bench-0').first()
+
+
+def test_send_notification_instant(ctx, bench):
+    site = _site()
+    users = _users()
+
+    def send(i):
+        status = NotificationService.send_notification(
+            users[i % len(users)], site, f'Update {i}', 'Something changed', category_key='updates'
+        )
+        assert status['email'] and status['web_push']
+
+    bench.measure('send_notification.instant', send, SETTINGS['iterations'])
+
+
+def test_send_notification_scheduled(ctx, bench):
+    site = _site()
+    users = _users()
+
+    def send(i):
+        status = NotificationService.send_notification(
+            users[i % len(users)], site, f'Digest item {i}', 'Queued for later', category_key='digest'
+        )
+        assert status['status'] == 'scheduled'
+
+    bench.measure('send_notification.scheduled', send, SETTINGS['iterations'])
+
+
+def test_send_bulk_notification(ctx, bench):
+    site = _site()
+    keyn_ids = [user.keyn_user_id for user in _users()]
+    size = min(SETTINGS['bulk_size'], len(keyn_ids))
+
+    def send(i):
+        start = (i * size) % len(keyn_ids)
+        batch = (keyn_ids[start:] + keyn_ids[:start])[:size]
+        results = NotificationService.send_bulk_notification(
+            site, batch, f'Bulk {i}', 'To everyone', category_key='updates'
+        )
+        assert results['successful'] == size
+
+    bench.measure('send_bulk_notification', send, max(3, SETTINGS['iterations'] // 20), notifications_per_call=size)
+
+
+def test_get_next_scheduled_time(ctx, bench):
+    site = _site()
+    users = _users()
+
+    for category_key in (None, 'updates', 'digest'):
+        bench.measure(
+            f'get_next_scheduled_time.{category_key or "uncategorized"}',
+            lambda i: NotificationService.get_next_scheduled_time(users[i % len(users)], site, category_key),
+            SETTINGS['iterations'] * 5
+        )
+
+
+def test_dispatch_scheduled_notifications(ctx, bench):
+    import scheduler
+
+    site = _site()
+    user_ids = [user.id for user in _users()]
+    batch = SETTINGS['pending_batch']
+
+    def queue_due(i):
+        due = datetime.utcnow() - timedelta(minutes=1)
+        db.session.add_all([
+            PendingNotification(
+                user_id=user_ids[(i * batch + n) % len(user_ids)], site_id=site.id,
+                title=f'Scheduled {i}.{n}', message='Due now', category_key='digest',
+                scheduled_for=due
+            )
+            for n in range(batch)
+        ])
+        db.session.commit()
+
+    def dispatch(i):
+        scheduler.dispatch_scheduled_notifications()
+
+    bench.measure(
+        'dispatch_scheduled_notifications', dispatch, max(3, SETTINGS['iterations'] // 50),
+        notifications_per_call=batch, setup=queue_due
+    )
+    assert PendingNotification.query.filter(PendingNotification.scheduled_for <= datetime.utcnow()).count() == 0
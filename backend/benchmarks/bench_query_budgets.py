@@ -0,0 +1,33 @@
+"""Query budgets for hot paths; these fail when a change adds queries (e.g. an N+1)."""
+from app.models import User, Site
+from app.services.notification_service import NotificationService
+from app.utils.query_stats import assert_max_queries
+
+
+def _user_and_site():
+    return User.query.order_by(User.id).first(), Site.query.filter_by(site_id='bench-0').first()
+
+
+def test_instant_send_budget(ctx):
+    user, site = _user_and_site()
+    with assert_max_queries(18):
+        NotificationService.send_notification(user, site, 'Budget', 'Instant', category_key='updates')
+
+
+def test_scheduled_send_budget(ctx):
+    user, site = _user_and_site()
+    with assert_max_queries(7):
+        NotificationService.send_notification(user, site, 'Budget', 'Queued', category_key='digest')
+
+
+def test_schedule_resolution_budget(ctx):
+    user, site = _user_and_site()
+    with assert_max_queries(3):
+        NotificationService.get_next_scheduled_time(user, site, 'digest')
+
+
+def test_bulk_send_budget_scales_per_recipient(ctx):
+    site = Site.query.filter_by(site_id='bench-0').first()
+    keyn_ids = [user.keyn_user_id for user in User.query.order_by(User.id).limit(20)]
+    with assert_max_queries(1 + 18 * len(keyn_ids)):
+        NotificationService.send_bulk_notification(site, keyn_ids, 'Budget', 'Bulk', category_key='updates')
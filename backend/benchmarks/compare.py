@@ -0,0 +1,49 @@
+"""Compare two benchmark result files.
+
+Usage:
+    python benchmarks/compare.py <before.json> <after.json>
+"""
+import json
+import sys
+
+
+def _change(before, after):
+    if not before or after is None:
+        return '      -'
+    return f'{(after - before) / before * 100:+6.1f}%'
+
+
+def main():
+    if len(sys.argv) != 3:
+        print(__doc__.strip())
+        sys.exit(1)
+
+    with open(sys.argv[1]) as f:
+        before = json.load(f)
+    with open(sys.argv[2]) as f:
+        after = json.load(f)
+
+    print(f"before: {before.get('git_commit')} {before['created_at']}")
+    print(f"after:  {after.get('git_commit')} {after['created_at']}")
+    if before['settings'] != after['settings']:
+        print('warning: runs used different settings')
+    print()
+    print(f"{'benchmark':<40} {'throughput':>10} {'p50':>8} {'p99':>8} {'queries':>8}")
+
+    for name in sorted(set(before['results']) | set(after['results'])):
+        old = before['results'].get(name)
+        new = after['results'].get(name)
+        if not old or not new:
+            print(f"{name:<40} {'only in ' + ('after' if new else 'before'):>10}")
+            continue
+        print(
+            f"{name:<40} "
+            f"{_change(old['throughput_per_second'], new['throughput_per_second']):>10} "
+            f"{_change(old['latency_ms']['p50'], new['latency_ms']['p50']):>8} "
+            f"{_change(old['latency_ms']['p99'], new['latency_ms']['p99']):>8} "
+            f"{_change(old['queries_per_notification'], new['queries_per_notification']):>8}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""Fixtures for the dispatch benchmarks.
+
+The database, quota store and archives live in a temporary directory unless
+BENCH_DATABASE_URL points at a scratch database (e.g. Postgres), which is
+wiped and re-seeded. Every channel is replaced by a stub that sleeps for a
+configurable latency on the delivery engine, so runs measure this service's
+own overhead rather than SMTP or push service round-trips.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+BENCH_DIR = tempfile.mkdtemp(prefix='nolofication-bench-')
+
+# Configuration is read from the environment at import time, so point it at
+# the benchmark database before anything from the app is imported
+os.environ['DATABASE_URL'] = os.getenv('BENCH_DATABASE_URL') or f'sqlite:///{BENCH_DIR}/bench.db'
+os.environ['QUOTA_DB_PATH'] = os.path.join(BENCH_DIR, 'quota.db')
+os.environ['ARCHIVE_DIR'] = os.path.join(BENCH_DIR, 'archives')
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+os.environ.setdefault('FLASK_ENV', 'production')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'scripts'))
+
+import pytest  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import (  # noqa: E402
+    User, Site, UserPreference, WebPushSubscription,
+    SiteNotificationCategory, UserCategoryPreference
+)
+from app.services.channels import CHANNELS  # noqa: E402
+from recorder import Recorder  # noqa: E402
+
+
+def _int_setting(name, default):
+    return int(os.getenv(name, default))
+
+
+SETTINGS = {
+    'database': os.environ['DATABASE_URL'].split(':', 1)[0],
+    'users': _int_setting('BENCH_USERS', '500'),
+    'sites': _int_setting('BENCH_SITES', '3'),
+    'iterations': _int_setting('BENCH_ITERATIONS', '200'),
+    'bulk_size': _int_setting('BENCH_BULK_SIZE', '100'),
+    'pending_batch': _int_setting('BENCH_PENDING_BATCH', '100'),
+    'channel_latency_ms': {
+        channel: float(os.getenv(f'BENCH_{channel.upper()}_LATENCY_MS', os.getenv('BENCH_CHANNEL_LATENCY_MS', '5')))
+        for channel in ('email', 'web_push', 'discord', 'webhook')
+    }
+}
+
+
+def _stub(channel):
+    """send_many_async replacement: the batch's deliveries all take the configured latency."""
+    latency = SETTINGS['channel_latency_ms'].get(channel, 5) / 1000
+
+    async def send_many_async(app, deliveries):
+        await asyncio.sleep(latency)
+        return [True] * len(deliveries)
+
+    return staticmethod(send_many_async)
+
+
+@pytest.fixture(scope='session')
+def app():
+    """Application with a freshly seeded benchmark database and stubbed channels."""
+    app = create_app(os.environ['FLASK_ENV'])
+
+    # Channels without their own send_many_async inherit it (original None)
+    originals = {cls: cls.__dict__.get('send_many_async') for cls in CHANNELS.values()}
+    for name, cls in CHANNELS.items():
+        cls.send_many_async = _stub(name)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed(SETTINGS['users'], SETTINGS['sites'])
+
+    yield app
+
+    for cls, original in originals.items():
+        if original is None:
+            del cls.send_many_async
+        else:
+            cls.send_many_async = original
+
+
+def seed(user_count, site_count):
+    """
+    Create sites, categories and users with every channel enabled.
+
+    Each site has an instant 'updates' category and a daily 'digest' one;
+    every fourth user has a weekly override for 'digest'.
+    """
+    sites = []
+    for n in range(site_count):
+        site = Site(
+            site_id=f'bench-{n}', name=f'Bench {n}', api_key=f'bench-key-{n}',
+            is_active=True, is_approved=True, recipient_quota=0
+        )
+        db.session.add(site)
+        sites.append(site)
+    db.session.flush()
+
+    digests = []
+    for site in sites:
+        db.session.add(SiteNotificationCategory(
+            site_id=site.id, key='updates', name='Updates', default_frequency='instant'
+        ))
+        digest = SiteNotificationCategory(
+            site_id=site.id, key='digest', name='Digest',
+            default_frequency='daily', default_time_of_day='09:00'
+        )
+        db.session.add(digest)
+        digests.append(digest)
+    db.session.flush()
+
+    for n in range(user_count):
+        user = User(keyn_user_id=f'bench-user-{n}', username=f'bench{n}', email=f'bench{n}@example.com')
+        db.session.add(user)
+        db.session.flush()
+
+        db.session.add(UserPreference(
+            user_id=user.id, email_enabled=True, web_push_enabled=True,
+            discord_enabled=True, discord_user_id=str(10**17 + n),
+            webhook_enabled=True, webhook_url=f'https://hooks.example.com/{n}'
+        ))
+        for device in range(2):
+            db.session.add(WebPushSubscription(
+                user_id=user.id, endpoint=f'https://push.example.com/{n}/{device}',
+                p256dh='bench', auth='bench'
+            ))
+        if n % 4 == 0:
+            for digest in digests:
+                db.session.add(UserCategoryPreference(
+                    user_id=user.id, site_id=digest.site_id, category_id=digest.id,
+                    frequency='weekly', time_of_day='18:00', timezone='America/Toronto', weekly_day=4
+                ))
+
+        if n % 500 == 499:
+            db.session.commit()
+    db.session.commit()
+
+
+@pytest.fixture
+def ctx(app):
+    """Application context for a single benchmark."""
+    with app.app_context():
+        yield
+        db.session.remove()
+
+
+_recorder = Recorder(SETTINGS)
+
+
+@pytest.fixture(scope='session')
+def bench():
+    """Recorder shared by all benchmarks; the JSON report is written at the end."""
+    return _recorder
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _recorder.results:
+        return
+
+    path = _recorder.write(os.getenv('BENCH_OUTPUT'))
+    terminalreporter.section('benchmarks')
+    for name, result in sorted(_recorder.results.items()):
+        latency = result['latency_ms']
+        terminalreporter.write_line(
+            f"{name:<40} {result['throughput_per_second'] or 0:>10.1f}/s  "
+            f"p50 {latency['p50']:>8.2f}ms  p99 {latency['p99']:>8.2f}ms  "
+            f"{result['queries_per_notification']:>6.2f} queries/notification"
+        )
+    terminalreporter.write_line(f'Results written to {path}')
@@ -0,0 +1,112 @@
+"""Timing and query accounting for the dispatch benchmarks."""
+import json
+import math
+import os
+import subprocess
+import time
+from datetime import datetime
+from app.utils.query_stats import track_queries
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class Recorder:
+    """Runs measured calls and collects their results for the JSON report."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.results = {}
+
+    def measure(self, name, fn, iterations, notifications_per_call=1, setup=None):
+        """
+        Time repeated calls of fn.
+
+        Args:
+            name: Result name in the report
+            fn: Callable taking the iteration number
+            iterations: Number of calls
+            notifications_per_call: Notifications handled by one call (for
+                throughput and queries per notification)
+            setup: Optional callable taking the iteration number, run before
+                each call and excluded from timings and query counts
+
+        Returns:
+            dict: The recorded result
+        """
+        latencies = []
+        queries = 0
+        db_seconds = 0.0
+        total = 0.0
+
+        for i in range(iterations):
+            if setup:
+                setup(i)
+            with track_queries() as stats:
+                started = time.perf_counter()
+                fn(i)
+                elapsed = time.perf_counter() - started
+            queries += stats.queries
+            db_seconds += stats.seconds
+            latencies.append(elapsed * 1000)
+            total += elapsed
+
+        notifications = iterations * notifications_per_call
+        result = {
+            'calls': iterations,
+            'notifications': notifications,
+            'total_seconds': round(total, 4),
+            'throughput_per_second': round(notifications / total, 2) if total else None,
+            'latency_ms': {
+                'mean': round(total * 1000 / iterations, 3),
+                'p50': round(percentile(latencies, 50), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'max': round(max(latencies), 3)
+            },
+            'queries_per_notification': round(queries / notifications, 2) if notifications else None,
+            'db_ms_per_notification': round(db_seconds * 1000 / notifications, 3) if notifications else None
+        }
+        self.results[name] = result
+        return result
+
+    def write(self, path=None):
+        """
+        Save the report as JSON.
+
+        Args:
+            path: Output file (default: benchmarks/results/<UTC timestamp>.json)
+
+        Returns:
+            str: Path written
+        """
+        if not path:
+            directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, datetime.utcnow().strftime('%Y%m%dT%H%M%SZ') + '.json')
+
+        report = {
+            'created_at': datetime.utcnow().isoformat() + 'Z',
+            'git_commit': _git_commit(),
+            'settings': self.settings,
+            'results': self.results
+        }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        return path
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except Exception:
+        return None
@@ -32,6 +32,7 @@ class Config:
     SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
     SMTP_FROM_EMAIL = os.getenv('SMTP_FROM_EMAIL', 'noreply@bynolo.ca')
     SMTP_FROM_NAME = os.getenv('SMTP_FROM_NAME', 'Nolofication')
+    SMTP_BATCH_SIZE = int(os.getenv('SMTP_BATCH_SIZE', '50'))  # Emails sent per SMTP connection
     
     # Web Push (VAPID)
     VAPID_PRIVATE_KEY = os.getenv('VAPID_PRIVATE_KEY', '')
@@ -40,17 +41,113 @@ class Config:
     
     # Discord
     DISCORD_BOT_TOKEN = os.getenv('DISCORD_BOT_TOKEN', '')
+    DISCORD_API_BASE_URL = os.getenv('DISCORD_API_BASE_URL', 'https://discord.com/api/v10')
+    DISCORD_GLOBAL_RATE_LIMIT = float(os.getenv('DISCORD_GLOBAL_RATE_LIMIT', '50'))  # Requests/second per process; 0 = unpaced
+    DISCORD_RATE_LIMIT_RETRIES = int(os.getenv('DISCORD_RATE_LIMIT_RETRIES', '3'))  # Retries after a 429
     DISCORD_CLIENT_ID = os.getenv('DISCORD_CLIENT_ID', '')
     DISCORD_CLIENT_SECRET = os.getenv('DISCORD_CLIENT_SECRET', '')
     DISCORD_REDIRECT_URI = os.getenv('DISCORD_REDIRECT_URI', 'https://nolofication.bynolo.ca/auth/discord/callback')
     
     # Rate Limiting
     RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
-    RATE_LIMIT_STORAGE_URL = os.getenv('RATE_LIMIT_STORAGE_URL', 'memory://')
+    RATE_LIMIT_STORAGE_URL = os.getenv('RATE_LIMIT_STORAGE_URL', 'memory://')  # e.g. redis://localhost:6379
+    NOTIFY_RATE_LIMIT = os.getenv('NOTIFY_RATE_LIMIT', '600 per minute')  # Requests per site
+    # Per user; each open tab reconnects every SSE_MAX_STREAM_SECONDS (12 tickets an hour at 300s)
+    STREAM_TICKET_RATE_LIMIT = os.getenv('STREAM_TICKET_RATE_LIMIT', '120 per hour')
+    
+    # Per-site recipient quotas, shared by all workers through a local SQLite file
+    SITE_RECIPIENT_QUOTA = int(os.getenv('SITE_RECIPIENT_QUOTA', '10000'))  # 0 = unlimited
+    SITE_QUOTA_WINDOW_SECONDS = int(os.getenv('SITE_QUOTA_WINDOW_SECONDS', '3600'))
+    QUOTA_DB_PATH = os.getenv('QUOTA_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quota.db'))
     
     # Admin
     ADMIN_API_KEY = os.getenv('ADMIN_API_KEY', 'admin-key-change-in-production')
     
+    # Dispatch lanes: threads per lane in each process, and latency targets (seconds)
+    DISPATCH_HIGH_WORKERS = int(os.getenv('DISPATCH_HIGH_WORKERS', '4'))
+    DISPATCH_NORMAL_WORKERS = int(os.getenv('DISPATCH_NORMAL_WORKERS', '4'))
+    DISPATCH_BULK_WORKERS = int(os.getenv('DISPATCH_BULK_WORKERS', '2'))
+    DISPATCH_LATENCY_TARGETS = {
+        'high': float(os.getenv('DISPATCH_HIGH_LATENCY_TARGET', '2')),
+        'normal': float(os.getenv('DISPATCH_NORMAL_LATENCY_TARGET', '10')),
+    }
+    
+    # Database connections per process: every gunicorn thread and every lane
+    # thread may hold one at the same time
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', str(
+        int(os.getenv('GUNICORN_THREADS', '16'))
+        + DISPATCH_HIGH_WORKERS + DISPATCH_NORMAL_WORKERS + DISPATCH_BULK_WORKERS
+    )))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW
+    }
+    
+    # Delivery engine: one asyncio loop per process shared by all lanes
+    CHANNEL_TIMEOUT_SECONDS = float(os.getenv('CHANNEL_TIMEOUT_SECONDS', '10'))
+    DELIVERY_MAX_IN_FLIGHT = int(os.getenv('DELIVERY_MAX_IN_FLIGHT', '1000'))
+    DELIVERY_HTTP_MAX_CONNECTIONS = int(os.getenv('DELIVERY_HTTP_MAX_CONNECTIONS', '200'))
+    # Recipients whose deliveries are sent together, grouped by channel (bulk sends and scheduler passes)
+    DELIVERY_BATCH_SIZE = int(os.getenv('DELIVERY_BATCH_SIZE', '100'))
+    
+    # Scheduler and notification coalescing
+    SCHEDULER_INTERVAL_SECONDS = int(os.getenv('SCHEDULER_INTERVAL_SECONDS', '60'))
+    COLLAPSE_WINDOW_SECONDS = int(os.getenv('COLLAPSE_WINDOW_SECONDS', '60'))  # 0 disables holding
+    
+    # Idempotency-Key handling for /notify
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '86400'))
+    IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', '300'))
+    IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', '1024'))
+    
+    # Live notification stream (Server-Sent Events)
+    SSE_BRIDGE_POLL_SECONDS = float(os.getenv('SSE_BRIDGE_POLL_SECONDS', '1'))
+    SSE_HEARTBEAT_SECONDS = int(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
+    SSE_MAX_STREAM_SECONDS = int(os.getenv('SSE_MAX_STREAM_SECONDS', '300'))
+    # Streams a worker accepts at once. Production serves streams from gevent
+    # workers (prod.sh raises this there); on the threaded API server each open
+    # stream holds a thread, so keep it well below GUNICORN_THREADS
+    SSE_MAX_STREAMS_PER_WORKER = int(os.getenv('SSE_MAX_STREAMS_PER_WORKER', '4'))
+    # Rows committed up to this long after they were created are still picked up
+    SSE_BRIDGE_OVERLAP_SECONDS = float(os.getenv('SSE_BRIDGE_OVERLAP_SECONDS', '10'))
+    SSE_TICKET_SECONDS = int(os.getenv('SSE_TICKET_SECONDS', '30'))
+    
+    # Broadcast jobs (processed by scripts/scheduler.py)
+    BROADCAST_CHUNK_SIZE = int(os.getenv('BROADCAST_CHUNK_SIZE', '100'))
+    BROADCAST_TIME_BUDGET_SECONDS = int(os.getenv('BROADCAST_TIME_BUDGET_SECONDS', '20'))
+    # How long a worker's claim on a job lasts; must exceed the time to send one chunk
+    BROADCAST_CLAIM_SECONDS = int(os.getenv('BROADCAST_CLAIM_SECONDS', '300'))
+    
+    # Notification history retention (scripts/scheduler.py archives and prunes)
+    NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', '0'))  # 0 = keep forever
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archives'))
+    RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '500'))
+    RETENTION_INTERVAL_SECONDS = int(os.getenv('RETENTION_INTERVAL_SECONDS', '3600'))
+    
+    # Responses
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'auto')  # auto, orjson or stdlib
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+    
+    # Query instrumentation: X-DB-Queries / X-DB-Time headers, and slow request
+    # logging for requests or scheduler tasks over either threshold (0 disables)
+    DB_STATS_HEADERS = os.getenv('DB_STATS_HEADERS', 'false').lower() == 'true'
+    SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', '1'))
+    SLOW_REQUEST_QUERIES = int(os.getenv('SLOW_REQUEST_QUERIES', '50'))
+    
+    # Prometheus /metrics (set METRICS_TOKEN to require 'Authorization: Bearer <token>';
+    # left empty, the endpoint is public)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    METRICS_REQUIRE_TOKEN = False
+    
+    # Request profiling: admins send 'X-Profile: 1'; PROFILE_SAMPLE_RATE profiles
+    # a random fraction of all requests. Newest PROFILE_MAX_FILES are kept.
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'true').lower() == 'true'
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '50'))
+    
     # CORS
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*').split(',')
     
@@ -66,12 +163,15 @@ class DevelopmentConfig(Config):
     """Development configuration."""
     DEBUG = True
     TESTING = False
+    DB_STATS_HEADERS = os.getenv('DB_STATS_HEADERS', 'true').lower() == 'true'
 
 
 class ProductionConfig(Config):
     """Production configuration."""
     DEBUG = False
     TESTING = False
+    # /metrics answers 403 until METRICS_TOKEN is set
+    METRICS_REQUIRE_TOKEN = True
 
 
 class TestingConfig(Config):
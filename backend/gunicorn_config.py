@@ -1,5 +1,6 @@
 """Gunicorn configuration file."""
 import os
+import tempfile
 
 # Server socket
 bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
@@ -7,7 +8,11 @@ backlog = 2048
 
 # Worker processes
 workers = 4
-worker_class = 'sync'
+# Threaded workers for the API. Live notification streams are served by a
+# separate gevent server (prod.sh overrides the worker class for it); any that
+# reach these workers hold a thread each, capped by SSE_MAX_STREAMS_PER_WORKER
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -18,13 +23,47 @@ errorlog = '-'
 loglevel = 'info'
 access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"'
 
+# Prometheus metrics: each worker writes samples to this directory and /metrics
+# merges them. Must be set before the app (and prometheus_client) is imported.
+prometheus_multiproc_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR') or os.path.join(
+    tempfile.gettempdir(), 'nolofication-metrics'
+)
+os.environ['PROMETHEUS_MULTIPROC_DIR'] = prometheus_multiproc_dir
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def on_starting(server):
+    """Remove metric files left by processes that are no longer running."""
+    os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+    for name in os.listdir(prometheus_multiproc_dir):
+        pid = name.rsplit('_', 1)[-1].split('.', 1)[0]
+        if not pid.isdigit() or not _process_alive(int(pid)):
+            os.remove(os.path.join(prometheus_multiproc_dir, name))
+
+
+def child_exit(server, worker):
+    """Drop a dead worker's live gauges (its counters and histograms are kept)."""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
 # Process naming
 proc_name = 'nolofication'
 
 # Server mechanics
 daemon = False
 pidfile = None
-umask = 0
+# Keep metric files and quota.db private to the service user and its group
+umask = 0o027
 user = None
 group = None
 tmp_upload_dir = None
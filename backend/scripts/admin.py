@@ -113,6 +113,35 @@ def stats():
         print(f"  Total Notifications: {total_notifications}")
 
 
+def rebuild_counters():
+    """Recompute unread notification counters from the notification log."""
+    from app.services.unread_service import UnreadCounterService
+
+    with app.app_context():
+        written = UnreadCounterService.rebuild()
+        print(f"✓ Rebuilt unread counters ({written} user/site pairs)")
+
+
+def rebuild_stats():
+    """Recompute the hourly notification stats rollup from the notification log."""
+    from app.services.stats_service import StatsService
+
+    with app.app_context():
+        written = StatsService.rebuild()
+        print(f"✓ Rebuilt notification stats ({written} rollup rows)")
+
+
+def prune_history():
+    """Archive and delete notification history past each site's retention window."""
+    from app.services.retention_service import RetentionService
+
+    with app.app_context():
+        result = RetentionService.prune()
+        for site_id, count in result['pruned'].items():
+            print(f"  {site_id}: {count} notifications archived")
+        print(f"✓ Pruned {sum(result['pruned'].values())} notifications")
+
+
 def main():
     """Main entry point."""
     if len(sys.argv) < 2:
@@ -123,6 +152,9 @@ def main():
         print("  python scripts/admin.py approve <site_id>            # Approve a site")
         print("  python scripts/admin.py create <site_id> <name>      # Create new site")
         print("  python scripts/admin.py stats                        # Show statistics")
+        print("  python scripts/admin.py rebuild-counters             # Rebuild unread counters")
+        print("  python scripts/admin.py rebuild-stats                # Rebuild stats rollup")
+        print("  python scripts/admin.py prune                        # Archive and prune old history")
         sys.exit(1)
     
     command = sys.argv[1]
@@ -149,6 +181,12 @@ def main():
         create_site(site_id, name, description)
     elif command == 'stats':
         stats()
+    elif command == 'rebuild-counters':
+        rebuild_counters()
+    elif command == 'rebuild-stats':
+        rebuild_stats()
+    elif command == 'prune':
+        prune_history()
     else:
         print(f"Error: Unknown command '{command}'")
         sys.exit(1)
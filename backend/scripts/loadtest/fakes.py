@@ -0,0 +1,282 @@
+"""Local stand-ins for the channel backends used by load tests.
+
+Each fake listens on 127.0.0.1, waits for its configured latency before
+answering, fails a configurable fraction of deliveries, and counts what it
+received:
+
+- SmtpSink: minimal ESMTP server (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA)
+- PushFake: web push endpoint (POST /push/<id> -> 201)
+- DiscordFake: Discord API mock with X-RateLimit-* headers and 429s once the
+  bucket is exhausted
+- WebhookFake: generic webhook receiver (POST anything -> 200)
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Behavior:
+    """Latency and error injection shared by the fakes."""
+
+    def __init__(self, latency_ms=20, jitter_ms=0, error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    def delay(self):
+        """Seconds to wait before answering."""
+        jitter = random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        return max(0, self.latency_ms + jitter) / 1000
+
+    def fail(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+class Counters:
+    """Thread-safe named counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class _HttpFake:
+    """Base for HTTP fakes: a threaded server running in the background."""
+
+    name = 'http'
+
+    def __init__(self, behavior):
+        self.behavior = behavior
+        self.counters = Counters()
+        self._server = None
+
+    def handle(self, handler, body):
+        """Return (status, headers, payload) for a POST."""
+        raise NotImplementedError
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                fake.counters.inc('received')
+                time.sleep(fake.behavior.delay())
+
+                status, headers, payload = fake.handle(self, body)
+                data = json.dumps(payload).encode('utf-8') if payload is not None else b''
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, str(value))
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            # The default backlog of 5 drops connections when many deliveries start at once
+            request_queue_size = 1024
+
+        self._server = Server(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True, name=f'fake-{self.name}').start()
+        return self
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+
+
+class PushFake(_HttpFake):
+    """Web push service: accepts encrypted payloads at /push/<subscription>."""
+
+    name = 'web_push'
+
+    def handle(self, handler, body):
+        if handler.headers.get('Content-Encoding') != 'aes128gcm' or not handler.headers.get('Authorization'):
+            self.counters.inc('rejected')
+            return 400, {}, {'error': 'missing encryption or VAPID headers'}
+        if self.behavior.fail():
+            self.counters.inc('errors')
+            return 503, {}, {'error': 'injected failure'}
+        self.counters.inc('delivered')
+        return 201, {}, None
+
+
+class WebhookFake(_HttpFake):
+    """Generic webhook receiver."""
+
+    name = 'webhook'
+
+    def handle(self, handler, body):
+        if self.behavior.fail():
+            self.counters.inc('errors')
+            return 500, {}, {'error': 'injected failure'}
+        self.counters.inc('delivered')
+        return 200, {}, {'ok': True}
+
+
+class DiscordFake(_HttpFake):
+    """
+    Discord API mock.
+
+    Creating a DM channel returns a channel ID; posting a message consumes
+    the shared bucket. Responses carry X-RateLimit-* headers, and once
+    rate_limit requests were made in the current window the API answers
+    429 with retry_after, like Discord's global limit.
+    """
+
+    name = 'discord'
+
+    def __init__(self, behavior, rate_limit=50, window=1.0):
+        super().__init__(behavior)
+        self.rate_limit = rate_limit
+        self.window = window
+        self._bucket_lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._used = 0
+
+    def _take(self):
+        """Consume from the bucket; returns (allowed, remaining, reset_after)."""
+        with self._bucket_lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._used = 0
+            reset_after = self.window - (now - self._window_start)
+            if self.rate_limit and self._used >= self.rate_limit:
+                return False, 0, reset_after
+            self._used += 1
+            return True, max(0, self.rate_limit - self._used), reset_after
+
+    def handle(self, handler, body):
+        allowed, remaining, reset_after = self._take()
+        headers = {
+            'X-RateLimit-Limit': self.rate_limit,
+            'X-RateLimit-Remaining': remaining,
+            'X-RateLimit-Reset': f'{time.time() + reset_after:.3f}',
+            'X-RateLimit-Reset-After': f'{reset_after:.3f}',
+            'X-RateLimit-Bucket': 'loadtest'
+        }
+        if not allowed:
+            self.counters.inc('rate_limited')
+            headers.update({'Retry-After': f'{reset_after:.3f}', 'X-RateLimit-Global': 'true'})
+            return 429, headers, {
+                'message': 'You are being rate limited.', 'retry_after': round(reset_after, 3), 'global': True
+            }
+
+        if handler.path.endswith('/users/@me/channels'):
+            recipient = json.loads(body or b'{}').get('recipient_id', '0')
+            self.counters.inc('dm_channels')
+            return 200, headers, {'id': f'9{recipient}', 'type': 1}
+
+        if handler.path.endswith('/messages'):
+            if self.behavior.fail():
+                self.counters.inc('errors')
+                return 500, headers, {'message': 'injected failure'}
+            self.counters.inc('delivered')
+            return 200, headers, {'id': str(random.getrandbits(60))}
+
+        return 404, headers, {'message': '404: Not Found'}
+
+
+class SmtpSink:
+    """Minimal ESMTP server that accepts (and discards) mail."""
+
+    name = 'email'
+
+    def __init__(self, behavior):
+        self.behavior = behavior
+        self.counters = Counters()
+        self._loop = None
+        self._server = None
+        self.port = None
+
+    async def _handle(self, reader, writer):
+        async def reply(line):
+            writer.write(line.encode('ascii') + b'\r\n')
+            await writer.drain()
+
+        await reply('220 loadtest ESMTP')
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode('utf-8', 'replace').strip()
+                verb = command.split(' ', 1)[0].upper()
+
+                if verb == 'EHLO':
+                    writer.write(b'250-loadtest\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 10485760\r\n')
+                    await writer.drain()
+                elif verb == 'HELO':
+                    await reply('250 loadtest')
+                elif verb == 'AUTH':
+                    parts = command.split()
+                    if parts[1].upper() == 'LOGIN':
+                        await reply('334 VXNlcm5hbWU6')
+                        await reader.readline()
+                        await reply('334 UGFzc3dvcmQ6')
+                        await reader.readline()
+                    elif len(parts) == 2:
+                        await reply('334 ')
+                        await reader.readline()
+                    await reply('235 2.7.0 Authentication successful')
+                elif verb in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                    await reply('250 OK')
+                elif verb == 'DATA':
+                    await reply('354 End data with <CR><LF>.<CR><LF>')
+                    while (await reader.readline()) not in (b'.\r\n', b'.\n', b''):
+                        pass
+                    self.counters.inc('received')
+                    await asyncio.sleep(self.behavior.delay())
+                    if self.behavior.fail():
+                        self.counters.inc('errors')
+                        await reply('451 4.3.0 Injected failure')
+                    else:
+                        self.counters.inc('delivered')
+                        await reply('250 2.0.0 Queued')
+                elif verb == 'QUIT':
+                    await reply('221 Bye')
+                    break
+                else:
+                    await reply('502 Command not implemented')
+        finally:
+            writer.close()
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True, name='fake-smtp').start()
+
+        async def serve():
+            return await asyncio.start_server(self._handle, '127.0.0.1', 0, backlog=1024)
+
+        self._server = asyncio.run_coroutine_threadsafe(serve(), self._loop).result()
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    def stop(self):
+        if self._server:
+            self._loop.call_soon_threadsafe(self._server.close)
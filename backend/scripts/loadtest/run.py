@@ -0,0 +1,391 @@
+"""Load test the notification pipeline against local fake channel backends.
+
+Starts an SMTP sink, web push endpoint, Discord API mock and webhook
+receiver, seeds a scratch database with N sites x M users subscribed to
+every channel, runs the app under gunicorn pointed at the fakes, and drives
+it through /notify, bulk /notify and the scheduled path (queued through
+/notify, then dispatched by the scheduler). Reports throughput and tail
+latencies per phase.
+
+Usage:
+    python scripts/loadtest/run.py --sites 5 --users 1000 --requests 2000 --concurrency 32
+    python scripts/loadtest/run.py --help
+"""
+import argparse
+import base64
+import contextlib
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'scripts'))
+
+import httpx  # noqa: E402
+from fakes import Behavior, SmtpSink, PushFake, DiscordFake, WebhookFake  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sites', type=int, default=3, help='Sites to seed (default: 3)')
+    parser.add_argument('--users', type=int, default=500, help='Users to seed (default: 500)')
+    parser.add_argument('--requests', type=int, default=1000, help='Single /notify requests (default: 1000)')
+    parser.add_argument('--bulk-requests', type=int, default=20, help='Bulk /notify requests (default: 20)')
+    parser.add_argument('--bulk-size', type=int, default=100, help='Recipients per bulk request (default: 100)')
+    parser.add_argument('--scheduled', type=int, default=500, help='Notifications sent through the scheduled path (default: 500)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent client requests (default: 16)')
+    parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers (default: 2)')
+    parser.add_argument('--threads', type=int, default=16, help='Threads per gunicorn worker (default: 16)')
+    parser.add_argument('--channels', default='email,web_push,discord,webhook',
+                        help='Channels enabled for seeded users (default: all)')
+    parser.add_argument('--latency-ms', type=float, default=20, help='Latency of every fake backend (default: 20)')
+    parser.add_argument('--jitter-ms', type=float, default=5, help='Random +/- latency jitter (default: 5)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of deliveries each fake fails (default: 0)')
+    for backend in ('smtp', 'push', 'discord', 'webhook'):
+        parser.add_argument(f'--{backend}-latency-ms', type=float, help=f'Override latency for the {backend} fake')
+        parser.add_argument(f'--{backend}-error-rate', type=float, help=f'Override error rate for the {backend} fake')
+    parser.add_argument('--discord-rate-limit', type=int, default=50,
+                        help='Discord mock requests per window before 429s; 0 = unlimited (default: 50)')
+    parser.add_argument('--discord-rate-window', type=float, default=1.0, help='Discord mock window in seconds (default: 1)')
+    parser.add_argument('--database-url', help='Scratch database to use (dropped and re-seeded); default: temporary SQLite')
+    parser.add_argument('--output', help='Also write the report as JSON to this path')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary directory (database, logs)')
+    return parser.parse_args()
+
+
+def behavior(args, backend):
+    latency = getattr(args, f'{backend}_latency_ms')
+    error_rate = getattr(args, f'{backend}_error_rate')
+    return Behavior(
+        latency_ms=args.latency_ms if latency is None else latency,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate if error_rate is None else error_rate
+    )
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def vapid_keys():
+    """A fresh VAPID key pair as (private, public) base64url strings."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    private = b64url(key.private_numbers().private_value.to_bytes(32, 'big'))
+    public = b64url(key.public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    ))
+    return private, public
+
+
+def configure_environment(args, workdir, fakes):
+    """Point the app's configuration at the fakes and the scratch database."""
+    private, public = vapid_keys()
+    env = {
+        'DATABASE_URL': args.database_url or f"sqlite:///{os.path.join(workdir, 'loadtest.db')}",
+        'FLASK_ENV': 'production',
+        'SMTP_HOST': '127.0.0.1',
+        'SMTP_PORT': str(fakes['email'].port),
+        'SMTP_USERNAME': 'loadtest',
+        'SMTP_PASSWORD': 'loadtest',
+        'SMTP_USE_TLS': 'false',
+        'VAPID_PRIVATE_KEY': private,
+        'VAPID_PUBLIC_KEY': public,
+        'DISCORD_BOT_TOKEN': 'loadtest',
+        'DISCORD_API_BASE_URL': fakes['discord'].url,
+        'RATE_LIMIT_ENABLED': 'false',
+        'SITE_RECIPIENT_QUOTA': '0',
+        'COLLAPSE_WINDOW_SECONDS': '0',
+        'QUOTA_DB_PATH': os.path.join(workdir, 'quota.db'),
+        'ARCHIVE_DIR': os.path.join(workdir, 'archives'),
+        'PROFILE_DIR': os.path.join(workdir, 'profiles'),
+        'PROMETHEUS_MULTIPROC_DIR': os.path.join(workdir, 'metrics'),
+        'SLOW_REQUEST_SECONDS': '0',
+        'SLOW_REQUEST_QUERIES': '0',
+    }
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+    os.environ.update(env)
+
+
+def seed(args, fakes):
+    """Create sites, a scheduled 'digest' category per site, and users on every chosen channel."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from app import create_app, db
+    from app.models import User, Site, UserPreference, WebPushSubscription, SiteNotificationCategory
+
+    channels = set(args.channels.split(','))
+    # One subscriber key for all users; the payload is still encrypted per message
+    p256dh = b64url(ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    ))
+
+    app = create_app('production')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        sites = []
+        for n in range(args.sites):
+            site = Site(
+                site_id=f'load-{n}', name=f'Load {n}', api_key=f'load-key-{n}',
+                is_active=True, is_approved=True
+            )
+            db.session.add(site)
+            sites.append(site)
+        db.session.flush()
+        for site in sites:
+            db.session.add(SiteNotificationCategory(
+                site_id=site.id, key='digest', name='Digest', default_frequency='daily'
+            ))
+
+        for n in range(args.users):
+            user = User(keyn_user_id=f'load-user-{n}', username=f'load{n}', email=f'load{n}@loadtest.invalid')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(UserPreference(
+                user_id=user.id,
+                email_enabled='email' in channels,
+                web_push_enabled='web_push' in channels,
+                discord_enabled='discord' in channels,
+                discord_user_id=str(10**17 + n),
+                webhook_enabled='webhook' in channels,
+                webhook_url=f"{fakes['webhook'].url}/hook/{n}"
+            ))
+            if 'web_push' in channels:
+                db.session.add(WebPushSubscription(
+                    user_id=user.id, endpoint=f"{fakes['web_push'].url}/push/{n}",
+                    p256dh=p256dh, auth=b64url(os.urandom(16))
+                ))
+            if n % 500 == 499:
+                db.session.commit()
+        db.session.commit()
+    return app
+
+
+def start_server(args, workdir):
+    """Run the app under gunicorn; returns (process, base URL, log path)."""
+    port = free_port()
+    log_path = os.path.join(workdir, 'gunicorn.log')
+    log = open(log_path, 'w')
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers), '--threads', str(args.threads),
+            '--timeout', '300', "app:create_app('production')"
+        ],
+        cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT, env=os.environ.copy()
+    )
+    base_url = f'http://127.0.0.1:{port}'
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited early; see {log_path}')
+        try:
+            if httpx.get(f'{base_url}/health', timeout=1).status_code == 200:
+                return process, base_url, log_path
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'gunicorn did not become healthy; see {log_path}')
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies, elapsed, requests, errors, notifications):
+    return {
+        'requests': requests,
+        'errors': errors,
+        'notifications': notifications,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(requests / elapsed, 2) if elapsed else None,
+        'notifications_per_second': round(notifications / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2) if latencies else None,
+            'p90': round(percentile(latencies, 90), 2) if latencies else None,
+            'p99': round(percentile(latencies, 99), 2) if latencies else None,
+            'max': round(max(latencies), 2) if latencies else None
+        }
+    }
+
+
+def drive(base_url, payloads, concurrency, recipients_per_request=1):
+    """POST payloads [(site index, body)] to /notify concurrently and time them."""
+    client = httpx.Client(base_url=base_url, timeout=300, limits=httpx.Limits(max_connections=concurrency))
+    latencies = []
+    errors = 0
+
+    def send(item):
+        site_index, body = item
+        started = time.perf_counter()
+        try:
+            response = client.post(
+                f'/api/sites/load-{site_index}/notify', json=body,
+                headers={'X-API-Key': f'load-key-{site_index}'}
+            )
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        return (time.perf_counter() - started) * 1000, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for latency, ok in pool.map(send, payloads):
+            latencies.append(latency)
+            errors += 0 if ok else 1
+    elapsed = time.perf_counter() - started
+    client.close()
+    return summarize(latencies, elapsed, len(payloads), errors, len(payloads) * recipients_per_request)
+
+
+def run_scheduled(args, base_url):
+    """Queue notifications through /notify, make them due and time one scheduler pass."""
+    from app import db
+    from app.models import Notification, PendingNotification
+
+    queued = drive(base_url, [
+        (random.randrange(args.sites), {
+            'user_id': f'load-user-{random.randrange(args.users)}',
+            'title': f'Scheduled {i}', 'message': 'Load test', 'category': 'digest'
+        })
+        for i in range(args.scheduled)
+    ], args.concurrency)
+
+    import scheduler
+    with scheduler.app.app_context():
+        PendingNotification.query.filter(PendingNotification.title.like('Scheduled %')).update(
+            {'scheduled_for': datetime.utcnow()}, synchronize_session=False
+        )
+        db.session.commit()
+        count = PendingNotification.query.filter(PendingNotification.title.like('Scheduled %')).count()
+
+    dispatch_started_at = datetime.utcnow()
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        # The scheduler prints a line per notification
+        scheduler.dispatch_scheduled_notifications()
+    elapsed = time.perf_counter() - started
+
+    with scheduler.app.app_context():
+        delivered_at = [row.created_at for row in db.session.query(Notification.created_at).filter(
+            Notification.title.like('Scheduled %')
+        )]
+    # Time from the start of the pass until each notification was delivered
+    latencies = [max(0, (created_at - dispatch_started_at).total_seconds() * 1000) for created_at in delivered_at]
+    dispatched = summarize(latencies, elapsed, 1, 0, len(delivered_at))
+    dispatched['due'] = count
+    return {'queue': queued, 'dispatch': dispatched}
+
+
+def print_report(report):
+    print()
+    print(f"Load test: {report['settings']['sites']} sites x {report['settings']['users']} users, "
+          f"{report['settings']['workers']} workers x {report['settings']['threads']} threads, "
+          f"concurrency {report['settings']['concurrency']}")
+    print(f"{'phase':<20} {'requests':>9} {'errors':>7} {'req/s':>9} {'notif/s':>9} "
+          f"{'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, result in report['phases'].items():
+        latency = result['latency_ms']
+        print(f"{name:<20} {result['requests']:>9} {result['errors']:>7} "
+              f"{result['requests_per_second'] or 0:>9.1f} {result['notifications_per_second'] or 0:>9.1f} "
+              f"{latency['p50'] or 0:>9.1f} {latency['p90'] or 0:>9.1f} "
+              f"{latency['p99'] or 0:>9.1f} {latency['max'] or 0:>9.1f}")
+    print()
+    print('Fake backends:')
+    for name, counters in report['backends'].items():
+        print(f"  {name:<10} " + ', '.join(f'{key}={value}' for key, value in sorted(counters.items())))
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='nolofication-loadtest-')
+
+    fakes = {
+        'email': SmtpSink(behavior(args, 'smtp')).start(),
+        'web_push': PushFake(behavior(args, 'push')).start(),
+        'discord': DiscordFake(behavior(args, 'discord'), args.discord_rate_limit, args.discord_rate_window).start(),
+        'webhook': WebhookFake(behavior(args, 'webhook')).start(),
+    }
+    configure_environment(args, workdir, fakes)
+    print(f'Seeding {args.sites} sites and {args.users} users...')
+    seed(args, fakes)
+
+    process, base_url, log_path = start_server(args, workdir)
+    print(f'App running at {base_url} (log: {log_path})')
+    try:
+        phases = {}
+        print(f'Single /notify x {args.requests}...')
+        phases['notify'] = drive(base_url, [
+            (random.randrange(args.sites), {
+                'user_id': f'load-user-{random.randrange(args.users)}',
+                'title': f'Load {i}', 'message': 'Load test'
+            })
+            for i in range(args.requests)
+        ], args.concurrency)
+
+        bulk_size = min(args.bulk_size, args.users)
+        print(f'Bulk /notify x {args.bulk_requests} ({bulk_size} recipients each)...')
+        phases['bulk'] = drive(base_url, [
+            (random.randrange(args.sites), {
+                'user_ids': [f'load-user-{n}' for n in random.sample(range(args.users), bulk_size)],
+                'title': f'Bulk {i}', 'message': 'Load test'
+            })
+            for i in range(args.bulk_requests)
+        ], args.concurrency, recipients_per_request=bulk_size)
+
+        if args.scheduled:
+            print(f'Scheduled path x {args.scheduled}...')
+            scheduled = run_scheduled(args, base_url)
+            phases['scheduled.queue'] = scheduled['queue']
+            phases['scheduled.dispatch'] = scheduled['dispatch']
+
+        report = {
+            'created_at': datetime.utcnow().isoformat() + 'Z',
+            'settings': vars(args),
+            'phases': phases,
+            'backends': {name: fake.counters.snapshot() for name, fake in fakes.items()}
+        }
+        print_report(report)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f'\nReport written to {args.output}')
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        for fake in fakes.values():
+            fake.stop()
+        if args.keep:
+            print(f'Kept {workdir}')
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Bring an existing database schema up to date with the models.
+
+`db.create_all()` only creates missing tables, so databases created by an
+older release never receive new columns or indexes. This script compares the
+live schema against the models and adds whatever is missing:
+
+- missing tables
+- missing columns (added as nullable, with the model's scalar default)
+- missing indexes
+
+It also backfills the maintained unread counters and stats rollup when their
+tables are still empty but notifications exist (i.e. they were just added to
+an existing database), and moves notification archives from the old
+``ARCHIVE_DIR/<site_id>`` layout to ``ARCHIVE_DIR/<internal site ID>``.
+
+Every step is additive and idempotent, so it is safe to run on every deploy.
+Works with SQLite and Postgres.
+
+Usage:
+    python scripts/migrate.py            # Apply pending changes
+    python scripts/migrate.py --dry-run  # Only print what would change
+"""
+import os
+import sys
+
+# Add parent directory to path to import app module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from app import create_app, db
+import app.models  # noqa: F401 - register all models with the metadata
+
+
+def _column_ddl(column, dialect):
+    """Build the column definition used in ALTER TABLE ... ADD COLUMN."""
+    ddl = f"{dialect.identifier_preparer.quote(column.name)} {column.type.compile(dialect=dialect)}"
+
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        if isinstance(default, bool):
+            literal = ('1' if default else '0') if dialect.name == 'sqlite' else ('TRUE' if default else 'FALSE')
+        elif isinstance(default, (int, float)):
+            literal = str(default)
+        else:
+            literal = "'" + str(default).replace("'", "''") + "'"
+        ddl += f" DEFAULT {literal}"
+
+    return ddl
+
+
+def pending_changes():
+    """
+    Compute the DDL statements needed to match the models.
+
+    Returns:
+        list: (description, statement) tuples in the order they must run
+    """
+    inspector = inspect(db.engine)
+    dialect = db.engine.dialect
+    existing_tables = set(inspector.get_table_names())
+    changes = []
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            # create_all() creates the table together with its indexes
+            changes.append((f"create table {table.name}", None))
+            continue
+
+        existing_columns = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                changes.append((
+                    f"add column {table.name}.{column.name}",
+                    f"ALTER TABLE {dialect.identifier_preparer.quote(table.name)} "
+                    f"ADD COLUMN {_column_ddl(column, dialect)}"
+                ))
+
+        existing_indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name not in existing_indexes:
+                changes.append((
+                    f"create index {index.name} on {table.name}",
+                    str(CreateIndex(index).compile(dialect=dialect))
+                ))
+
+    return changes
+
+
+def migrate(dry_run=False):
+    """Apply (or print) all pending schema changes."""
+    changes = pending_changes()
+
+    if not changes:
+        print("✓ Schema is up to date")
+        return
+
+    for description, statement in changes:
+        print(f"{'Would' if dry_run else 'Will'} {description}")
+
+    if dry_run:
+        return
+
+    # New tables first, then columns and indexes on existing tables
+    db.create_all()
+    with db.engine.begin() as conn:
+        for description, statement in changes:
+            if statement:
+                conn.execute(text(statement))
+
+    print(f"✓ Applied {len(changes)} change(s)")
+
+
+def backfill_counters(dry_run=False):
+    """Rebuild the unread counters if they are empty although notifications exist."""
+    from app.models import Notification, UnreadCounter
+    from app.services.unread_service import UnreadCounterService
+
+    if Notification.query.first() is None or UnreadCounter.query.first() is not None:
+        return
+
+    if dry_run:
+        print("Would rebuild unread counters")
+    else:
+        print(f"✓ Rebuilt unread counters ({UnreadCounterService.rebuild()} rows)")
+
+
+def backfill_stats(dry_run=False):
+    """Rebuild the stats rollup if it is empty although notifications exist."""
+    from app.models import Notification, NotificationStat
+    from app.services.stats_service import StatsService
+
+    if Notification.query.first() is None or NotificationStat.query.first() is not None:
+        return
+
+    if dry_run:
+        print("Would rebuild notification stats")
+    else:
+        print(f"✓ Rebuilt notification stats ({StatsService.rebuild()} rows)")
+
+
+def move_legacy_archives(dry_run=False):
+    """Move archives kept under a site's public site_id to its internal ID."""
+    from flask import current_app
+    from app.models import Site
+    from app.services.retention_service import RetentionService
+
+    root = os.path.realpath(current_app.config['ARCHIVE_DIR'])
+    if not os.path.isdir(root):
+        return
+
+    for site in Site.query.order_by(Site.id).all():
+        legacy = os.path.realpath(os.path.join(root, site.site_id))
+        target = RetentionService.archive_dir(site)
+        # Only plain child directories; anything else was never a valid archive
+        if os.path.dirname(legacy) != root or legacy == os.path.realpath(target):
+            continue
+        if not os.path.isdir(legacy) or os.path.exists(target):
+            continue
+        if dry_run:
+            print(f"Would move archives for site {site.site_id} to {target}")
+        else:
+            os.rename(legacy, target)
+            print(f"✓ Moved archives for site {site.site_id} to {target}")
+
+
+if __name__ == '__main__':
+    app = create_app(os.getenv('FLASK_ENV', 'production'))
+    with app.app_context():
+        migrate(dry_run='--dry-run' in sys.argv)
+        backfill_counters(dry_run='--dry-run' in sys.argv)
+        backfill_stats(dry_run='--dry-run' in sys.argv)
+        move_legacy_archives(dry_run='--dry-run' in sys.argv)
@@ -17,6 +17,11 @@ from app.models import (
     PendingNotification
 )
 from app.services.notification_service import NotificationService
+from app.services.broadcast_service import BroadcastService
+from app.services.retention_service import RetentionService
+from app.services.idempotency_service import IdempotencyService
+from app.services.stream_ticket_service import StreamTicketService
+from app.utils.query_stats import track_cycle
 
 app = create_app(os.getenv('FLASK_ENV', 'production'))
 
@@ -25,54 +30,101 @@ def dispatch_scheduled_notifications():
     """Process and dispatch pending notifications that are due."""
     with app.app_context():
         now = datetime.utcnow()
+        size = max(1, app.config['DELIVERY_BATCH_SIZE'])
+        last_id = 0
         
-        # Query pending notifications that are due and not cancelled
-        pending = PendingNotification.query.filter(
-            PendingNotification.scheduled_for <= now,
-            PendingNotification.cancelled_at == None
-        ).all()
+        # Send due, uncancelled notifications in batches; each batch is queried
+        # fresh (earlier batches' commits expire loaded rows) and its deliveries
+        # go out together, grouped by channel. Walking by ID skips rows that
+        # failed and were left pending.
+        while True:
+            pending = PendingNotification.query.filter(
+                PendingNotification.scheduled_for <= now,
+                PendingNotification.cancelled_at == None,
+                PendingNotification.id > last_id
+            ).order_by(PendingNotification.id).limit(size).all()
+            if not pending:
+                break
+            last_id = pending[-1].id
+            
+            for pending_id, keyn_user_id, error in NotificationService.dispatch_pending(pending):
+                if error:
+                    print(f"Error dispatching pending notification {pending_id}: {error}")
+                else:
+                    print(f"Dispatched pending notification {pending_id} to user {keyn_user_id}")
+            
+            if len(pending) < size:
+                break
         
-        for notif in pending:
-            try:
-                # Dispatch the notification
-                NotificationService._dispatch_notification(
-                    notif.user,
-                    notif.site,
-                    notif.title,
-                    notif.message,
-                    notif.notification_type,
-                    category_key=notif.category_key,
-                    html_message=notif.html_message
-                )
-                
-                # Remove from pending queue
-                db.session.delete(notif)
-                db.session.commit()
-                
-                print(f"Dispatched pending notification {notif.id} to user {notif.user.keyn_user_id}")
-            except Exception as e:
-                print(f"Error dispatching pending notification {notif.id}: {e}")
-                db.session.rollback()
+        # Clean up old cancelled notifications (older than 7 days), in small batches
+        RetentionService.prune_cancelled_pending(older_than_days=7)
         
-        # Clean up old cancelled notifications (older than 7 days)
-        seven_days_ago = now - timedelta(days=7)
-        PendingNotification.query.filter(
-            PendingNotification.cancelled_at != None,
-            PendingNotification.cancelled_at < seven_days_ago
-        ).delete()
-        db.session.commit()
+        # Expired Idempotency-Key records and unused stream tickets
+        IdempotencyService.purge_expired()
+        StreamTicketService.purge_expired()
+
+
+def prune_notification_history():
+    """Archive and delete notification history past each site's retention window.
+
+    Returns:
+        bool: True if everything due was pruned within the time budget
+    """
+    with app.app_context():
+        result = RetentionService.prune(time_budget=30)
+        for site_id, count in result['pruned'].items():
+            print(f"Archived and pruned {count} notifications for site {site_id}")
+        return result['complete']
+
+
+def process_broadcast_jobs():
+    """Send the next chunks of any queued or running broadcast jobs.
 
+    Returns:
+        bool: True if broadcast jobs still have recipients left
+    """
+    with app.app_context():
+        return BroadcastService.process_jobs()
 
 
 def main_loop():
-    print("Scheduler started. Checking every minute...")
+    interval = app.config['SCHEDULER_INTERVAL_SECONDS']
+    print(f"Scheduler started. Checking every {interval} seconds...")
+    last_dispatch = None
+    last_prune = None
     while True:
+        # Scheduled (and coalesced) notifications are checked every interval
+        if last_dispatch is None or time.monotonic() - last_dispatch >= interval:
+            last_dispatch = time.monotonic()
+            try:
+                with track_cycle(app, 'scheduler.dispatch') as stats:
+                    dispatch_scheduled_notifications()
+                print(f"Dispatch cycle: {stats.queries} queries, {stats.seconds * 1000:.1f}ms in the database")
+            except Exception as e:
+                print("Scheduler error:", e)
+        
+        # History retention runs hourly, and again right away until caught up
+        if last_prune is None or time.monotonic() - last_prune >= app.config['RETENTION_INTERVAL_SECONDS']:
+            last_prune = time.monotonic()
+            try:
+                with track_cycle(app, 'scheduler.retention'):
+                    complete = prune_notification_history()
+                if not complete:
+                    last_prune = None
+            except Exception as e:
+                print("Retention error:", e)
+        
+        # Broadcast jobs run in time-boxed slices between checks
+        busy = False
         try:
-            dispatch_scheduled_notifications()
+            with track_cycle(app, 'scheduler.broadcasts'):
+                busy = process_broadcast_jobs()
         except Exception as e:
-            print("Scheduler error:", e)
-        # Sleep until next minute
-        time.sleep(60)
+            print("Broadcast worker error:", e)
+        
+        # Keep going straight away while broadcasts have work left
+        if not busy:
+            time.sleep(min(5, interval))
 
 
 if __name__ == '__main__':
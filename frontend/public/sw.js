@@ -22,7 +22,8 @@ self.addEventListener('push', function(event) {
     body: data.body || 'You have a new notification',
     icon: data.icon || '/icon-192x192.png',
     badge: data.badge || '/badge-96x96.png',
-    tag: data.type || 'notification',
+    tag: data.tag || data.type || 'notification',
+    renotify: Boolean(data.tag),
     data: data,
     requireInteraction: false,
     vibrate: [200, 100, 200]
@@ -68,7 +68,7 @@ function BroadcastForm() {
       if (!res.ok) {
         setResult({ error: data.error || 'Failed to send broadcast' })
       } else {
-        setResult({ ok: true, details: data.results })
+        setResult({ ok: true, details: data.job })
         setTitle('')
         setMessage('')
         setHtmlMessage('')
@@ -153,7 +153,7 @@ function BroadcastForm() {
         <p className="text-red-500 text-sm">{result.error}</p>
       )}
       {result?.ok && (
-        <p className="text-green-500 text-sm">Broadcast sent to {result.details?.total || 'N/A'} users</p>
+        <p className="text-green-500 text-sm">Broadcast queued for {result.details?.total ?? 'N/A'} users</p>
       )}
 
       <Modal
@@ -6,10 +6,15 @@ import Input from '../components/Input'
 import Modal from '../components/Modal'
 import Toggle from '../components/Toggle'
 
+const PAGE_SIZE = 100
+const MAX_PAGE_SIZE = 500
+
 export default function AdminSites() {
   const { user } = useAuth()
   const [sites, setSites] = useState([])
+  const [totalSites, setTotalSites] = useState(0)
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [error, setError] = useState(null)
   const [showCreateModal, setShowCreateModal] = useState(false)
   const [showEditModal, setShowEditModal] = useState(false)
@@ -31,18 +36,26 @@ export default function AdminSites() {
     }
   }, [isAdmin])
 
+  const fetchSitesPage = async (offset, limit) => {
+    const token = localStorage.getItem('auth_token')
+    const response = await fetch(`/api/admin/sites?limit=${limit}&offset=${offset}`, {
+      headers: { 'Authorization': `Bearer ${token}` }
+    })
+
+    if (!response.ok) throw new Error('Failed to fetch sites')
+
+    return response.json()
+  }
+
+  // Reloads from the start, keeping as many sites loaded as before so that
+  // editing a site further down the list does not collapse it to one page.
   const fetchSites = async () => {
     try {
       setLoading(true)
-      const token = localStorage.getItem('auth_token')
-      const response = await fetch('/api/admin/sites', {
-        headers: { 'Authorization': `Bearer ${token}` }
-      })
-
-      if (!response.ok) throw new Error('Failed to fetch sites')
-
-      const data = await response.json()
+      const limit = Math.min(Math.max(PAGE_SIZE, sites.length), MAX_PAGE_SIZE)
+      const data = await fetchSitesPage(0, limit)
       setSites(data.sites)
+      setTotalSites(data.total ?? data.sites.length)
     } catch (err) {
       setError(err.message)
     } finally {
@@ -50,6 +63,19 @@ export default function AdminSites() {
     }
   }
 
+  const loadMoreSites = async () => {
+    try {
+      setLoadingMore(true)
+      const data = await fetchSitesPage(sites.length, PAGE_SIZE)
+      setSites((prev) => [...prev, ...data.sites])
+      setTotalSites(data.total ?? totalSites)
+    } catch (err) {
+      setError(err.message)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const createSite = async () => {
     try {
       const token = localStorage.getItem('auth_token')
@@ -212,7 +238,11 @@ export default function AdminSites() {
       <div className="flex justify-between items-center mb-8">
         <div>
           <h1 className="text-3xl font-bold mb-2">Manage Sites</h1>
-          <p className="text-gray-600">{sites.length} total sites</p>
+          <p className="text-gray-600">
+            {sites.length < totalSites
+              ? `Showing ${sites.length} of ${totalSites} sites`
+              : `${totalSites} total sites`}
+          </p>
         </div>
         <Button onClick={() => setShowCreateModal(true)}>
           + Create Site
@@ -250,7 +280,7 @@ export default function AdminSites() {
                 <div className="text-sm text-gray-500 space-y-1">
                   <p>Creator KeyN ID: {site.creator_keyn_id || 'N/A'}</p>
                   <p>Created: {site.created_at ? new Date(site.created_at).toLocaleDateString() : 'N/A'}</p>
-                  <p>Notifications: {site.notification_count ?? 0} | Categories: {site.category_count ?? 0}</p>
+                  <p>Notifications: {site.notification_count ?? 0} | Categories: {site.category_count ?? 0} | Pending: {site.pending_count ?? 0} | Subscribers: {site.subscriber_count ?? 0}</p>
                   <div className="flex items-center gap-2 mt-2">
                     <p className="font-mono text-xs">API Key: {site.api_key ? `${site.api_key.substring(0, 20)}...` : 'N/A'}</p>
                     {site.api_key && (
@@ -313,6 +343,14 @@ export default function AdminSites() {
         ))}
       </div>
 
+      {sites.length < totalSites && (
+        <div className="text-center mt-6">
+          <Button variant="secondary" onClick={loadMoreSites} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : `Load more (${totalSites - sites.length} remaining)`}
+          </Button>
+        </div>
+      )}
+
       {/* Create Site Modal */}
       <Modal
         isOpen={showCreateModal}
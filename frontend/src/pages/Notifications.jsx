@@ -1,11 +1,12 @@
-import { useState } from 'react'
+import { useState, useEffect } from 'react'
 import { Bell, Filter } from 'lucide-react'
 import Card, { CardBody } from '../components/Card'
 import { useApi } from '../hooks/useApi'
-import { getNotifications, getSites } from '../utils/api'
+import { getNotifications, getSites, openNotificationStream } from '../utils/api'
 
 export default function Notifications() {
   const [selectedSite, setSelectedSite] = useState('all')
+  const [liveNotifications, setLiveNotifications] = useState([])
   
   const { data: sitesData } = useApi(getSites, [])
   const { data: notificationsData, loading, error } = useApi(
@@ -15,9 +16,21 @@ export default function Notifications() {
     [selectedSite]
   )
 
+  // Prepend notifications pushed over the live stream
+  useEffect(() => {
+    setLiveNotifications([])
+    const source = openNotificationStream((notification) => {
+      if (selectedSite !== 'all' && notification.site_id !== selectedSite) return
+      setLiveNotifications(prev => [notification, ...prev.filter(n => n.id !== notification.id)])
+    })
+    return () => source.close()
+  }, [selectedSite])
+
   // Extract arrays from response
   const sites = sitesData?.sites || []
-  const notifications = notificationsData?.notifications || []
+  const fetchedNotifications = notificationsData?.notifications || []
+  const liveIds = new Set(liveNotifications.map(n => n.id))
+  const notifications = [...liveNotifications, ...fetchedNotifications.filter(n => !liveIds.has(n.id))]
 
   const siteOptions = ['all', ...(sites?.map(s => s.site_id) || [])]
 
@@ -6,7 +6,7 @@ import Button from '../components/Button'
 import Toggle from '../components/Toggle'
 import Input from '../components/Input'
 import { useApi, useMutation } from '../hooks/useApi'
-import { getSite, getSitePreferences, updateSitePreferences, resetSitePreferences, getPreferences, sendTestNotification, getSiteCategories, updateUserCategoryPreference } from '../utils/api'
+import { getSite, getSitePreferences, updateSitePreferences, resetSitePreferences, getPreferences, sendTestNotification, getSiteCategories, updateUserCategoryPreference, updateUserCategoryPreferences } from '../utils/api'
 
 export default function SitePreferences() {
   const { siteId } = useParams()
@@ -14,11 +14,12 @@ export default function SitePreferences() {
   const { data: siteInfo, loading: siteLoading } = useApi(() => getSite(siteId), [siteId])
   const { data: sitePrefs, loading: prefsLoading, refetch } = useApi(() => getSitePreferences(siteId), [siteId])
   const { data: globalPrefs, loading: globalLoading } = useApi(getPreferences, [])
-  const { data: categoriesData, loading: categoriesLoading, refetch: refetchCategories } = useApi(() => getSiteCategories(siteId), [siteId])
+  const { data: categoriesData, loading: categoriesLoading } = useApi(() => getSiteCategories(siteId), [siteId])
   const { mutate: savePrefs, loading: isSaving } = useMutation(updateSitePreferences)
   const { mutate: resetPrefs, loading: isResetting } = useMutation(resetSitePreferences)
   const { mutate: testNotification } = useMutation(sendTestNotification)
   const { mutate: saveCategoryPref } = useMutation(updateUserCategoryPreference)
+  const { mutate: saveCategoryPrefs, loading: isSavingCategories } = useMutation(updateUserCategoryPreferences)
   
   const [preferences, setPreferences] = useState({
     email: null,
@@ -123,15 +124,25 @@ export default function SitePreferences() {
       enabled: pref.enabled,
       schedule: pref.schedule
     })
+    // Local state already holds the saved values, so no re-fetch is needed
     if (result.success) {
       setSaveMessage({ type: 'success', text: `${categoryKey} preference saved!` })
-      refetchCategories()
     } else {
       setSaveMessage({ type: 'error', text: `Failed to save ${categoryKey}` })
     }
     setTimeout(() => setSaveMessage(null), 3000)
   }
   
+  const handleSaveAllCategoryPreferences = async () => {
+    const result = await saveCategoryPrefs(siteId, categoryPreferences)
+    if (result.success) {
+      setSaveMessage({ type: 'success', text: 'Category preferences saved!' })
+    } else {
+      setSaveMessage({ type: 'error', text: 'Failed to save category preferences' })
+    }
+    setTimeout(() => setSaveMessage(null), 3000)
+  }
+  
   const toggleCategoryEnabled = (categoryKey) => {
     setCategoryPreferences(prev => ({
       ...prev,
@@ -379,6 +390,15 @@ export default function SitePreferences() {
                   Choose which types of notifications you want to receive and when
                 </p>
               </div>
+              <Button
+                size="sm"
+                className="ml-auto"
+                onClick={handleSaveAllCategoryPreferences}
+                disabled={isSavingCategories}
+                icon={Save}
+              >
+                {isSavingCategories ? 'Saving...' : 'Save All'}
+              </Button>
             </div>
           </CardHeader>
           
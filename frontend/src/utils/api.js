@@ -165,6 +165,14 @@ export const updateUserCategoryPreference = async (siteId, categoryKey, payload)
   });
 };
 
+// Batch update: categories is an object keyed by category key
+export const updateUserCategoryPreferences = async (siteId, categories) => {
+  return apiRequest(`/sites/${siteId}/my-categories`, {
+    method: 'PUT',
+    body: JSON.stringify({ categories }),
+  });
+};
+
 // ============================================
 // Notifications API
 // ============================================
@@ -175,12 +183,67 @@ export const getNotifications = async (params = {}) => {
   if (params.siteId) queryString.append('site_id', params.siteId);
   if (params.read !== undefined) queryString.append('read', params.read);
   if (params.limit) queryString.append('limit', params.limit);
-  if (params.offset) queryString.append('offset', params.offset);
+  if (params.cursor) queryString.append('cursor', params.cursor);
   
   const url = `/notifications${queryString.toString() ? '?' + queryString.toString() : ''}`;
   return apiRequest(url);
 };
 
+/**
+ * Open a live notification stream (Server-Sent Events)
+ *
+ * EventSource cannot send the auth header, so each connection uses a fresh
+ * single-use ticket. Because a ticket cannot be reused, reconnects are handled
+ * here rather than by EventSource, resuming after the last event received.
+ */
+export const openNotificationStream = (onNotification) => {
+  let source = null;
+  let lastEventId = null;
+  let retryTimer = null;
+  let retryDelay = 1000;
+  let closed = false;
+
+  const reconnect = () => {
+    if (closed) return;
+    retryTimer = setTimeout(connect, retryDelay);
+    retryDelay = Math.min(retryDelay * 2, 60000);
+  };
+
+  const connect = async () => {
+    try {
+      const { ticket } = await apiRequest('/notifications/stream/ticket', { method: 'POST' });
+      if (closed) return;
+
+      const params = new URLSearchParams({ ticket });
+      if (lastEventId) params.append('last_event_id', lastEventId);
+      source = new EventSource(`${API_BASE_URL}/notifications/stream?${params}`);
+      source.onopen = () => {
+        retryDelay = 1000;
+      };
+      source.addEventListener('notification', (event) => {
+        lastEventId = event.lastEventId;
+        onNotification(JSON.parse(event.data));
+      });
+      source.onerror = () => {
+        source.close();
+        reconnect();
+      };
+    } catch (error) {
+      reconnect();
+    }
+  };
+
+  connect();
+
+  return {
+    close: () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    },
+  };
+};
+
 export const markNotificationRead = async (notificationId) => {
   return apiRequest(`/notifications/${notificationId}/read`, {
     method: 'PUT',
@@ -24,6 +24,17 @@ if [ -f "backend/gunicorn.pid" ]; then
     rm backend/gunicorn.pid
 fi
 
+# Stop stream server
+if [ -f "backend/gunicorn-stream.pid" ]; then
+    STREAM_PID=$(cat backend/gunicorn-stream.pid)
+    if ps -p $STREAM_PID > /dev/null 2>&1; then
+        echo "🛑 Stopping old stream server (PID: $STREAM_PID)..."
+        kill $STREAM_PID 2>/dev/null || true
+        sleep 2
+    fi
+    rm backend/gunicorn-stream.pid
+fi
+
 # Stop frontend
 if [ -f "frontend/frontend.pid" ]; then
     FRONTEND_PID=$(cat frontend/frontend.pid)
@@ -60,10 +71,24 @@ source venv/bin/activate
 # Create logs directory if it doesn't exist
 mkdir -p logs
 
+# Files created by the backend and scheduler stay private to this user and group
+umask 027
+
+# Gunicorn workers and the scheduler write Prometheus samples to one shared
+# directory so a single /metrics scrape includes scheduled deliveries
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-${TMPDIR:-/tmp}/nolofication-metrics}"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# Apply pending schema changes (new columns and indexes)
+python scripts/migrate.py
+
 # Start gunicorn in background
 gunicorn \
+    --config gunicorn_config.py \
     --bind 0.0.0.0:5005 \
     --workers 4 \
+    --worker-class gthread \
+    --threads ${GUNICORN_THREADS:-16} \
     --timeout 120 \
     --access-logfile logs/access.log \
     --error-logfile logs/error.log \
@@ -80,6 +105,34 @@ else
     echo "⚠️  Backend started but PID file not found"
     BACKEND_PID="unknown"
 fi
+
+# Live notification streams get their own gevent server: an open stream costs a
+# greenlet there instead of one of the API server's threads. Route
+# /api/notifications/stream to this port at the proxy (see DEPLOYMENT.md).
+echo "📡 Starting notification stream server..."
+gunicorn \
+    --config gunicorn_config.py \
+    --name nolofication-stream \
+    --bind 0.0.0.0:5006 \
+    --workers ${STREAM_WORKERS:-1} \
+    --worker-class gevent \
+    --worker-connections ${STREAM_WORKER_CONNECTIONS:-1000} \
+    --timeout 120 \
+    --env SSE_MAX_STREAMS_PER_WORKER=${STREAM_WORKER_CONNECTIONS:-1000} \
+    --access-logfile logs/stream-access.log \
+    --error-logfile logs/stream-error.log \
+    --daemon \
+    --pid gunicorn-stream.pid \
+    "app:create_app()"
+
+sleep 1
+if [ -f gunicorn-stream.pid ]; then
+    STREAM_PID=$(cat gunicorn-stream.pid)
+    echo "✅ Stream server started (PID: $STREAM_PID)"
+else
+    echo "⚠️  Stream server started but PID file not found"
+    STREAM_PID="unknown"
+fi
 cd ..
 
 # Serve frontend with a simple HTTP server
@@ -102,6 +155,7 @@ cd ..
 # Start scheduler
 echo "⏰ Starting notification scheduler..."
 cd backend
+umask 027
 nohup python scripts/scheduler.py > logs/scheduler.log 2>&1 &
 SCHEDULER_PID=$!
 echo $SCHEDULER_PID > scheduler.pid
@@ -111,11 +165,13 @@ cd ..
 echo ""
 echo "✅ Production services running:"
 echo "   Backend:   http://localhost:5005 (PID: $BACKEND_PID)"
+echo "   Streams:   http://localhost:5006/api/notifications/stream (PID: $STREAM_PID)"
 echo "   Frontend:  http://localhost:5173 (PID: $FRONTEND_PID)"
 echo "   Scheduler: Running (PID: $SCHEDULER_PID)"
 echo ""
 echo "📊 Logs:"
 echo "   Backend:   backend/logs/error.log & backend/logs/access.log"
+echo "   Streams:   backend/logs/stream-error.log & backend/logs/stream-access.log"
 echo "   Frontend:  backend/logs/frontend.log"
 echo "   Scheduler: backend/logs/scheduler.log"
 echo ""
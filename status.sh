@@ -30,6 +30,20 @@ else
 fi
 echo ""
 
+# Check stream server
+echo "📡 Stream server (Gunicorn, gevent):"
+if [ -f "backend/gunicorn-stream.pid" ]; then
+    STREAM_PID=$(cat backend/gunicorn-stream.pid)
+    if ps -p $STREAM_PID > /dev/null 2>&1; then
+        echo "   ✅ Running (PID: $STREAM_PID)"
+    else
+        echo "   ❌ Not running (stale PID file)"
+    fi
+else
+    echo "   ❌ Not running (no PID file)"
+fi
+echo ""
+
 # Check frontend
 echo "⚛️  Frontend (Serve):"
 if [ -f "frontend/frontend.pid" ]; then
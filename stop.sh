@@ -34,6 +34,29 @@ else
     echo "⚠️  No backend PID file found"
 fi
 
+# Stop stream server
+if [ -f "backend/gunicorn-stream.pid" ]; then
+    STREAM_PID=$(cat backend/gunicorn-stream.pid)
+    if ps -p $STREAM_PID > /dev/null 2>&1; then
+        echo "🛑 Stopping stream server (PID: $STREAM_PID)..."
+        kill $STREAM_PID 2>/dev/null || true
+        sleep 2
+        # Force kill if still running
+        if ps -p $STREAM_PID > /dev/null 2>&1; then
+            echo "⚠️  Stream server still running, force killing..."
+            kill -9 $STREAM_PID 2>/dev/null || true
+        fi
+        rm -f backend/gunicorn-stream.pid
+        echo "✅ Stream server stopped"
+        STOPPED=$((STOPPED + 1))
+    else
+        echo "⚠️  Stream server process not running (cleaning up PID file)"
+        rm -f backend/gunicorn-stream.pid
+    fi
+else
+    echo "⚠️  No stream server PID file found"
+fi
+
 # Stop frontend
 if [ -f "frontend/frontend.pid" ]; then
     FRONTEND_PID=$(cat frontend/frontend.pid)